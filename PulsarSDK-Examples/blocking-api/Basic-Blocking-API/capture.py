@@ -0,0 +1,279 @@
+import json
+import time
+import threading
+import numpy as np
+from binhopulsar.commands.system.definitions import *
+from basic_pulsar_blocking_api import PulsarBlockingApi
+
+# ==================================================================================
+# region Capture files
+# ==================================================================================
+
+# A capture file starts with a header made of the magic string, the format version, the total header
+# length and a JSON document with the NumPy dtype of the records and the user metadata. The header is
+# padded to a multiple of CAPTURE_HEADER_ALIGNMENT bytes and it is followed by the fixed size records.
+CAPTURE_MAGIC = b"BINHOCAP"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER_ALIGNMENT = 64
+
+class CaptureWriter:
+    """
+    Append-only writer of fixed size binary records. The records are NumPy structured values of the
+    dtype given when the file is created, so they can be read back without any parsing.
+
+    The file can be read while it is being written: the readers see the complete records written to the
+    file, that is, the ones appended before the last flush().
+    """
+
+    def __init__(self, path, dtype, metadata = None):
+        self.dtype = np.dtype(dtype)
+        self.lock = threading.Lock()
+        self.record_count = 0
+
+        header = json.dumps({"dtype": np.lib.format.dtype_to_descr(self.dtype), "metadata": metadata or dict()}).encode()
+        prefix_length = len(CAPTURE_MAGIC) + 2 + 4
+        header_length = -(-(prefix_length + len(header)) // CAPTURE_HEADER_ALIGNMENT) * CAPTURE_HEADER_ALIGNMENT
+
+        self.file = open(path, "wb")
+        self.file.write(CAPTURE_MAGIC)
+        self.file.write(np.array([CAPTURE_VERSION], dtype="<u2").tobytes())
+        self.file.write(np.array([header_length], dtype="<u4").tobytes())
+        self.file.write(header.ljust(header_length - prefix_length, b" "))
+        self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, records):
+        """
+        Appends one record, given as a tuple with the fields of the dtype, or an array of records.
+        """
+        records = np.atleast_1d(np.asarray(records, dtype=self.dtype))
+
+        with self.lock:
+            self.file.write(records.tobytes())
+            self.record_count += len(records)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class CaptureReader:
+    """
+    Reader of the files created by CaptureWriter. The records are memory-mapped, so the records
+    attribute is a NumPy structured array backed by the file that is only loaded when accessed.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            if file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                raise ValueError(f"{path} is not a capture file")
+
+            version = int(np.frombuffer(file.read(2), dtype="<u2")[0])
+            if version != CAPTURE_VERSION:
+                raise ValueError(f"Unsupported capture file version {version}")
+
+            header_length = int(np.frombuffer(file.read(4), dtype="<u4")[0])
+            header = json.loads(file.read(header_length - file.tell()))
+
+        self.path = path
+        self.header_length = header_length
+        self.dtype = np.lib.format.descr_to_dtype(self.__to_descr(header["dtype"]))
+        self.metadata = header["metadata"]
+        self.records = self.__map()
+
+    def __to_descr(self, descr):
+        # JSON turns the (name, type[, shape]) tuples of the dtype description into lists.
+        if isinstance(descr, list):
+            return [(name, self.__to_descr(field_type), *[tuple(shape) for shape in shape]) for name, field_type, *shape in descr]
+        return descr
+
+    def __map(self):
+        # A record being written when the file is opened is left out.
+        with open(self.path, "rb") as file:
+            file.seek(0, 2)
+            record_count = (file.tell() - self.header_length) // self.dtype.itemsize
+
+        if record_count == 0:
+            return np.empty(0, dtype=self.dtype)
+
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=self.header_length, shape=(record_count,))
+
+    def refresh(self):
+        """
+        Maps the records appended to the file since it was opened.
+        """
+        self.records = self.__map()
+        return self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def replay(self, speed = 1.0, time_field = "timestamp"):
+        """
+        Generator that yields the records one by one, respecting the time between them scaled by the
+        speed factor. A speed of None yields the records as fast as possible.
+        """
+        start_time = time.perf_counter()
+        first_timestamp = None
+
+        for record in self.records:
+            if speed is not None:
+                if first_timestamp is None:
+                    first_timestamp = record[time_field]
+
+                delay = (record[time_field] - first_timestamp) / speed - (time.perf_counter() - start_time)
+                if delay > 0:
+                    time.sleep(delay)
+
+            yield record
+
+# endregion
+
+# ==================================================================================
+# region Transfer capture
+# ==================================================================================
+
+# Maximum length of the payloads stored in a transfer record, longer payloads are truncated.
+MAX_CAPTURE_PAYLOAD_LENGTH = 1024
+
+def transfer_record_dtype(payload_length = MAX_CAPTURE_PAYLOAD_LENGTH):
+    """
+    Returns the dtype of the transfer records: the time.perf_counter() value at which the request was
+    sent, the same clock as the IMU captures, the time until its response arrived, the transfer id, the
+    method and result names, and the data sent and received.
+    """
+    return np.dtype([("timestamp", "<f8"),
+                     ("latency", "<f8"),
+                     ("id", "<u2"),
+                     ("method", "S48"),
+                     ("result", "S48"),
+                     ("sent_length", "<u2"),
+                     ("sent", "u1", (payload_length,)),
+                     ("received_length", "<u2"),
+                     ("received", "u1", (payload_length,))])
+
+class TransferRecorder:
+    """
+    Records the requests sent through a blocking API instance and their responses into a capture file.
+    Once attached, every call and every submit() of the recorded methods adds a record when its response
+    arrives, without changing what the methods return.
+    """
+
+    # Keyword arguments that hold the data sent by the SDK methods.
+    DATA_ARGUMENTS = ["data", "payload"]
+
+    def __init__(self, path, payload_length = MAX_CAPTURE_PAYLOAD_LENGTH, metadata = None):
+        self.payload_length = payload_length
+        self.writer = CaptureWriter(path, transfer_record_dtype(payload_length), metadata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def attach(self, blocking_api, method_names):
+        """
+        Records the given methods of the blocking API instance, for instance ["i2c_controller_read"].
+        """
+        for method_name in method_names:
+            setattr(blocking_api, method_name, self.__recorded_call(blocking_api, method_name, getattr(blocking_api, method_name)))
+
+    def __recorded_call(self, blocking_api, method_name, method):
+        def submit(*args, **kwargs):
+            start_time = time.perf_counter()
+            sent = self.__to_bytes(next((kwargs[name] for name in self.DATA_ARGUMENTS if name in kwargs), None))
+
+            future = method.submit(*args, **kwargs)
+            future.add_done_callback(lambda future: self.__record(future, method_name, start_time, sent))
+            return future
+
+        def wrapper(*args, **kwargs):
+            return blocking_api.wait_for_response(submit(*args, **kwargs))
+
+        wrapper.submit = submit
+        return wrapper
+
+    def __to_bytes(self, data):
+        if isinstance(data, str):
+            return data.encode()
+
+        # Only byte sequences are stored, other payloads like dictionaries are left out.
+        try:
+            return bytes(data) if data is not None else b""
+        except (TypeError, ValueError):
+            return b""
+
+    def __record(self, future, method_name, start_time, sent):
+        latency = time.perf_counter() - start_time
+        response = None if future.cancelled() else future.result()
+
+        received = self.__to_bytes(response.get("payload") if response is not None else None)
+        result = response.get("result", "") if response is not None else "TIMEOUT"
+
+        self.writer.append((start_time,
+                            latency,
+                            future.transfer_id,
+                            method_name.encode(),
+                            str(result).encode(),
+                            min(len(sent), self.payload_length),
+                            np.frombuffer(sent[:self.payload_length].ljust(self.payload_length, b"\0"), dtype="u1"),
+                            min(len(received), self.payload_length),
+                            np.frombuffer(received[:self.payload_length].ljust(self.payload_length, b"\0"), dtype="u1")))
+
+    def close(self):
+        self.writer.close()
+
+def transfer_record_to_response(record):
+    """
+    Converts a transfer record back into a response dictionary like the ones returned by the blocking API.
+    """
+    return {
+        "id": int(record["id"]),
+        "method": record["method"].decode(),
+        "result": record["result"].decode(),
+        "payload": record["received"][:record["received_length"]].tolist()
+    }
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    pulsar_device = PulsarBlockingApi()
+
+    # Open the device.
+    pulsar_device.open()
+
+    # Record the USB string requests.
+    with TransferRecorder("transfers.cap", payload_length=64) as recorder:
+        recorder.attach(pulsar_device, ["get_usb_string"])
+
+        for sub_command in GetUsbStringSubCommand:
+            pulsar_device.get_usb_string(subCommand=sub_command)
+
+    # Close the device.
+    pulsar_device.close()
+
+    # Read the capture back.
+    capture = CaptureReader("transfers.cap")
+    print(f"Transfers recorded: {len(capture)}, mean latency: {capture.records['latency'].mean() * 1000:.3f} ms")
+
+    for record in capture.replay(speed=None):
+        response = transfer_record_to_response(record)
+        print(f"{response['id']} {response['method']} {response['result']}: {bytes(response['payload']).decode(errors='replace')}")
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,167 @@
+import threading
+import queue
+import concurrent.futures
+import binhopulsar
+from binhopulsar.commands.system.definitions import *
+from basic_pulsar_blocking_api import PulsarBlockingApi
+
+# ==================================================================================
+# region Device pool
+# ==================================================================================
+
+class PulsarDevicePool:
+    """
+    This class opens several Pulsar devices connected to the host and runs jobs on them in parallel.
+    Every device has its own job queue and worker thread, so the jobs sent to a device are executed in
+    order while the different devices work at the same time.
+
+    A job is any function whose first parameter is the PulsarBlockingApi instance of the device,
+    for instance: def job(device, *args, **kwargs).
+    """
+
+    def __init__(self, devices = None):
+        """
+        The devices parameter is a list of dictionaries as returned by getConnectedPulsarDevicesList().
+        By default, all the Pulsar devices connected to the host are used.
+        """
+        if devices is None:
+            devices = binhopulsar.getConnectedPulsarDevicesList()
+
+        self.devices_info = {device_info["serial_number"]: device_info for device_info in devices}
+        self.devices = dict()
+        self.job_queues = dict()
+        self.workers = dict()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Opens all the devices concurrently and starts a worker per device. Returns a dictionary with
+        the response of the open() method of each device indexed by its serial number.
+        """
+        if len(self.devices_info) == 0:
+            return dict()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.devices_info)) as executor:
+            responses = dict(zip(self.devices_info.keys(), executor.map(self.__open_device, self.devices_info.values())))
+
+        return responses
+
+    def __open_device(self, device_info):
+        serial_number = device_info["serial_number"]
+
+        device = PulsarBlockingApi()
+        response = device.open(path=device_info["path"])
+
+        if response["opcode"] == 0:
+            self.devices[serial_number] = device
+            self.job_queues[serial_number] = queue.Queue()
+            self.workers[serial_number] = threading.Thread(target=self.__worker, args=(serial_number,), daemon=True)
+            self.workers[serial_number].start()
+
+        return response
+
+    def __worker(self, serial_number):
+        device = self.devices[serial_number]
+        job_queue = self.job_queues[serial_number]
+
+        while True:
+            job = job_queue.get()
+
+            # None is used to stop the worker.
+            if job is None:
+                break
+
+            future, function, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(function(device, *args, **kwargs))
+            except Exception as exception:
+                future.set_exception(exception)
+
+    def serial_numbers(self):
+        """
+        Returns the serial numbers of the devices opened successfully.
+        """
+        return list(self.devices.keys())
+
+    def submit(self, serial_number, function, *args, **kwargs):
+        """
+        Appends a job to the queue of the device identified by its serial number and returns a Future
+        that holds the value returned by the job. The device must be one of serial_numbers(), the devices
+        that could not be opened have no queue.
+        """
+        if serial_number not in self.job_queues:
+            raise ValueError(f"The device {serial_number} is not open")
+
+        future = concurrent.futures.Future()
+        self.job_queues[serial_number].put((future, function, args, kwargs))
+        return future
+
+    def submit_all(self, function, *args, **kwargs):
+        """
+        Appends the same job to the queue of every device. Returns a dictionary of Futures indexed by the
+        device serial number.
+        """
+        return {serial_number: self.submit(serial_number, function, *args, **kwargs) for serial_number in self.devices}
+
+    def run_all(self, function, *args, **kwargs):
+        """
+        Runs the same job on every device in parallel and blocks until all of them finish. Returns a
+        dictionary with the value returned by each job indexed by the device serial number.
+        """
+        futures = self.submit_all(function, *args, **kwargs)
+        return {serial_number: future.result() for serial_number, future in futures.items()}
+
+    def close(self):
+        """
+        Waits for the queued jobs to finish, stops the workers and closes all the devices.
+        """
+        for job_queue in self.job_queues.values():
+            job_queue.put(None)
+
+        for worker in self.workers.values():
+            worker.join()
+
+        for device in self.devices.values():
+            device.close()
+
+        self.devices.clear()
+        self.job_queues.clear()
+        self.workers.clear()
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def check_firmware_version(device):
+    response = device.get_usb_string(subCommand=GetUsbStringSubCommand.FW_VERSION)
+
+    if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+        return None
+
+    return response["payload"]
+
+def main():
+    with PulsarDevicePool() as pool:
+        print(f"Pulsar devices opened: {pool.serial_numbers()}")
+
+        # Check the firmware version of all the devices at once.
+        firmware_versions = pool.run_all(check_firmware_version)
+
+        for serial_number, firmware_version in firmware_versions.items():
+            print(f"{serial_number}: {firmware_version}")
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,271 @@
+import os
+import csv
+import time
+import threading
+import collections
+from binhopulsar.commands.system.definitions import *
+from basic_pulsar_blocking_api import PulsarBlockingApi
+
+# ==================================================================================
+# region Instrumentation
+# ==================================================================================
+
+# Upper bounds in seconds of the latency histogram buckets. The last bucket holds the rest of the requests.
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+# Result reported by the host adapter when the request was successful.
+SUCCESS_RESULT = "SUCCESS"
+
+class MethodMetrics:
+    """
+    Counters and latency histogram of one method of the blocking API.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.errors = collections.Counter()
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.in_flight_max = 0
+
+    def latency_percentile(self, fraction):
+        """
+        Returns the upper bound of the histogram bucket that holds the given fraction of the responses,
+        or None if there are no responses or they are in the last bucket.
+        """
+        if self.responses == 0:
+            return None
+
+        count = 0
+        for index, bucket_count in enumerate(self.latency_buckets[:-1]):
+            count += bucket_count
+            if count >= fraction * self.responses:
+                return LATENCY_BUCKETS[index]
+        return None
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "errors": dict(self.errors),
+            "latency_buckets": list(self.latency_buckets),
+            "latency_sum": self.latency_sum,
+            "latency_mean": self.latency_sum / self.responses if self.responses > 0 else None,
+            "latency_p50": self.latency_percentile(0.50),
+            "latency_p99": self.latency_percentile(0.99),
+            "latency_max": self.latency_max,
+            "in_flight_max": self.in_flight_max
+        }
+
+class Instrumentation:
+    """
+    Collects the metrics of the requests sent through a blocking API instance, per method: the number of
+    requests, responses and timeouts, the error result codes, the latency histogram and the number of
+    requests in flight. It is enabled by passing it to the wrapper, e.g.
+    PulsarBlockingApi(instrumentation=Instrumentation([PrometheusTextSink("pulsar.prom")], interval=10)).
+
+    The metrics are pushed to the sinks when export() is called, or every interval seconds if an interval
+    is given.
+
+    The latency is measured from the moment the request is handed to the SDK until its response arrives.
+    Requests that cannot be sent are reported with the error message of the SDK, which points to the USB
+    link, timeouts point to the host adapter, and error result codes like NACKs point to the target.
+    """
+
+    def __init__(self, sinks = None, interval = None):
+        self.sinks = sinks if sinks is not None else [MemorySink()]
+        self.methods = collections.defaultdict(MethodMetrics)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+        self.stop_event = threading.Event()
+        self.export_thread = None
+        if interval is not None:
+            self.export_thread = threading.Thread(target=self.__export_periodically, args=(interval,), daemon=True)
+            self.export_thread.start()
+
+    # Hooks called by the blocking API ----------------------------------------------
+
+    def request_sent(self, method_name, in_flight):
+        with self.lock:
+            metrics = self.methods[method_name]
+            metrics.requests += 1
+            metrics.in_flight_max = max(metrics.in_flight_max, in_flight)
+            self.in_flight = in_flight
+
+    def request_completed(self, method_name, latency, result):
+        bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+
+        with self.lock:
+            metrics = self.methods[method_name]
+            metrics.responses += 1
+            metrics.latency_buckets[bucket] += 1
+            metrics.latency_sum += latency
+            metrics.latency_max = max(metrics.latency_max, latency)
+            if result != SUCCESS_RESULT:
+                metrics.errors[str(result)] += 1
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def request_timed_out(self, method_name):
+        with self.lock:
+            self.methods[method_name].timeouts += 1
+            self.in_flight = max(0, self.in_flight - 1)
+
+    # Export ------------------------------------------------------------------------
+
+    def snapshot(self):
+        """
+        Returns the current metrics: the timestamp, the number of requests in flight and the metrics of
+        every method, indexed by the method name.
+        """
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "in_flight": self.in_flight,
+                "methods": {method_name: metrics.snapshot() for method_name, metrics in self.methods.items()}
+            }
+
+    def export(self):
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.write(snapshot)
+        return snapshot
+
+    def __export_periodically(self, interval):
+        while not self.stop_event.wait(interval):
+            self.export()
+
+    def close(self):
+        """
+        Stops the periodic export and exports the final metrics.
+        """
+        self.stop_event.set()
+        if self.export_thread is not None:
+            self.export_thread.join()
+        self.export()
+
+# endregion
+
+# ==================================================================================
+# region Sinks
+# ==================================================================================
+
+class MemorySink:
+    """
+    Keeps the last snapshots in memory, the newest one is the last of the snapshots list.
+    """
+
+    def __init__(self, max_snapshots = 1000):
+        self.snapshots = collections.deque(maxlen=max_snapshots)
+
+    def write(self, snapshot):
+        self.snapshots.append(snapshot)
+
+class CsvSink:
+    """
+    Appends one row per method and snapshot to a CSV file, to follow the evolution of the metrics.
+    """
+
+    FIELDS = ["timestamp", "method", "requests", "responses", "timeouts", "errors", "in_flight_max",
+              "latency_mean", "latency_p50", "latency_p99", "latency_max"]
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "w", newline="") as file:
+                csv.writer(file).writerow(self.FIELDS)
+
+    def write(self, snapshot):
+        with open(self.path, "a", newline="") as file:
+            writer = csv.writer(file)
+            for method_name, metrics in snapshot["methods"].items():
+                writer.writerow([snapshot["timestamp"],
+                                 method_name,
+                                 metrics["requests"],
+                                 metrics["responses"],
+                                 metrics["timeouts"],
+                                 sum(metrics["errors"].values()),
+                                 metrics["in_flight_max"],
+                                 metrics["latency_mean"],
+                                 metrics["latency_p50"],
+                                 metrics["latency_p99"],
+                                 metrics["latency_max"]])
+
+class PrometheusTextSink:
+    """
+    Writes the last snapshot in the Prometheus text exposition format, e.g. for the textfile collector of
+    the node exporter. The file is replaced atomically, so it is never read half written.
+    """
+
+    def __init__(self, path, prefix = "pulsar", labels = None):
+        self.path = path
+        self.prefix = prefix
+        self.labels = labels or dict()
+
+    def __labels(self, **labels):
+        labels = dict(self.labels, **labels)
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+    def write(self, snapshot):
+        prefix = self.prefix
+        lines = [f"# TYPE {prefix}_in_flight_requests gauge",
+                 f"{prefix}_in_flight_requests{self.__labels()} {snapshot['in_flight']}"]
+
+        for name, field in [("requests_total", "requests"), ("responses_total", "responses"), ("timeouts_total", "timeouts")]:
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for method_name, metrics in snapshot["methods"].items():
+                lines.append(f"{prefix}_{name}{self.__labels(method=method_name)} {metrics[field]}")
+
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for method_name, metrics in snapshot["methods"].items():
+            for result, count in metrics["errors"].items():
+                lines.append(f"{prefix}_errors_total{self.__labels(method=method_name, result=result)} {count}")
+
+        lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+        for method_name, metrics in snapshot["methods"].items():
+            count = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + ["+Inf"], metrics["latency_buckets"]):
+                count += bucket_count
+                lines.append(f"{prefix}_latency_seconds_bucket{self.__labels(method=method_name, le=bound)} {count}")
+            lines.append(f"{prefix}_latency_seconds_sum{self.__labels(method=method_name)} {metrics['latency_sum']}")
+            lines.append(f"{prefix}_latency_seconds_count{self.__labels(method=method_name)} {metrics['responses']}")
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, self.path)
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    instrumentation = Instrumentation([MemorySink(), CsvSink("pulsar_metrics.csv"), PrometheusTextSink("pulsar_metrics.prom")])
+    pulsar_device = PulsarBlockingApi(instrumentation=instrumentation)
+
+    # Open the device.
+    pulsar_device.open()
+
+    # Send some requests.
+    for _ in range(100):
+        pulsar_device.get_usb_string(subCommand=GetUsbStringSubCommand.SERIAL_NUMBER)
+
+    # Close the device.
+    pulsar_device.close()
+
+    snapshot = instrumentation.export()
+
+    for method_name, metrics in snapshot["methods"].items():
+        print(f"{method_name}: {metrics['requests']} requests, {metrics['timeouts']} timeouts, {sum(metrics['errors'].values())} errors, "
+              f"max latency {metrics['latency_max'] * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,556 @@
+import threading
+import heapq
+import random
+import time
+from binhopulsar.commands.i2c.definitions import I2cBus
+from basic_pulsar_blocking_api import PulsarBlockingApi
+
+# ==================================================================================
+# region Simulated targets
+# ==================================================================================
+
+class SimulatedI2cTarget:
+    """
+    I2C target with 256 8-bit registers. The register address is auto-incremented on reads and writes.
+    """
+
+    def __init__(self):
+        self.registers = bytearray(256)
+
+    def read(self, register_address, length):
+        return [self.read_register((register_address + i) & 0xFF) for i in range(length)]
+
+    def write(self, register_address, data):
+        for i, value in enumerate(data):
+            self.write_register((register_address + i) & 0xFF, value)
+
+    def read_register(self, register):
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        self.registers[register] = value & 0xFF
+
+class SimulatedICM42605(SimulatedI2cTarget):
+    """
+    Register map of the TDK InvenSense ICM-42605 6-axis IMU. The sensor data registers return the gravity
+    along the Z axis plus gaussian noise, scaled to the configured full scale ranges, once the sensors are
+    turned on. The FIFO is filled with packets at the accelerometer output data rate while it is in
+    stream mode.
+    """
+
+    WHO_AM_I_REGISTER = 0x75
+    WHO_AM_I_VALUE = 0x47
+    REG_BANK_SEL_REGISTER = 0x76
+    TEMP_DATA1_REGISTER = 0x1D
+    DATA_REGISTERS_LENGTH = 14
+    FIFO_CONFIG_REGISTER = 0x16
+    FIFO_COUNTH_REGISTER = 0x2E
+    FIFO_COUNTL_REGISTER = 0x2F
+    FIFO_DATA_REGISTER = 0x30
+    SIGNAL_PATH_RESET_REGISTER = 0x4B
+    PWR_MGMT0_REGISTER = 0x4E
+    GYRO_CONFIG0_REGISTER = 0x4F
+    ACCEL_CONFIG0_REGISTER = 0x50
+    FIFO_CONFIG2_REGISTER = 0x60
+    FIFO_CONFIG3_REGISTER = 0x61
+    INT_SOURCE0_REGISTER = 0x65
+    INT_SOURCE8_REGISTER = 0x4F # Bank 4
+
+    FIFO_STREAM_MODE = 0x40
+    FIFO_SIZE = 2048
+    FIFO_PACKET_LENGTH = 16
+    FIFO_PACKET_HEADER = 0x68
+    INVALID_SAMPLE = -32768
+
+    # Interrupts routed to the INT1 pin in the INT_SOURCE0 register, and to the IBIs in the INT_SOURCE8 register.
+    DATA_READY_INTERRUPT = 0x08
+    FIFO_THRESHOLD_INTERRUPT = 0x04
+    FIFO_FULL_INTERRUPT = 0x02
+
+    # Output data rates in Hz indexed by the ODR field of the ACCEL_CONFIG0 register.
+    ODR_VALUES = {0x01: 32000.0, 0x02: 16000.0, 0x03: 8000.0, 0x04: 4000.0, 0x05: 2000.0, 0x06: 1000.0, 0x07: 200.0,
+                  0x08: 100.0, 0x09: 50.0, 0x0A: 25.0, 0x0B: 12.5, 0x0C: 6.25, 0x0D: 3.125, 0x0E: 1.5625, 0x0F: 500.0}
+
+    def __init__(self, accel_noise = 0.002, gyro_noise = 0.05, seed = None):
+        self.banks = [bytearray(256) for _ in range(5)]
+        self.accel_noise = accel_noise
+        self.gyro_noise = gyro_noise
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.banks[0][self.WHO_AM_I_REGISTER] = self.WHO_AM_I_VALUE
+        self.banks[0][self.GYRO_CONFIG0_REGISTER] = 0x06
+        self.banks[0][self.ACCEL_CONFIG0_REGISTER] = 0x06
+
+        self.fifo = bytearray()
+        self.fifo_time = time.perf_counter()
+        self.sample_bytes = bytes()
+        self.interrupt_times = dict()
+
+    @property
+    def registers(self):
+        return self.banks[self.bank]
+
+    @property
+    def bank(self):
+        return self.banks[0][self.REG_BANK_SEL_REGISTER] & 0x07
+
+    def read(self, register_address, length):
+        with self.lock:
+            # The FIFO data register is not auto-incremented, every read byte is taken from the FIFO.
+            if self.bank == 0 and register_address == self.FIFO_DATA_REGISTER:
+                return self.__read_fifo(length)
+
+            # A burst read of the data registers returns the values of a single sample.
+            if self.bank == 0 and register_address < self.TEMP_DATA1_REGISTER + self.DATA_REGISTERS_LENGTH and register_address + length > self.TEMP_DATA1_REGISTER:
+                self.sample_bytes = self.__sample()
+
+            return super().read(register_address, length)
+
+    def write(self, register_address, data):
+        with self.lock:
+            super().write(register_address, data)
+
+    def read_register(self, register):
+        if self.bank == 0:
+            data_offset = register - self.TEMP_DATA1_REGISTER
+            if 0 <= data_offset < self.DATA_REGISTERS_LENGTH:
+                return self.sample_bytes[data_offset]
+            # The FIFO count is latched when its high byte is read.
+            if register == self.FIFO_COUNTH_REGISTER:
+                self.__fill_fifo()
+                return (len(self.fifo) >> 8) & 0xFF
+            if register == self.FIFO_COUNTL_REGISTER:
+                return len(self.fifo) & 0xFF
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        if register == self.REG_BANK_SEL_REGISTER:
+            self.banks[0][register] = value & 0x07
+            return
+
+        if self.bank == 0 and register == self.SIGNAL_PATH_RESET_REGISTER:
+            # The FIFO flush bit clears itself.
+            if value & 0x02:
+                self.fifo.clear()
+                self.fifo_time = time.perf_counter()
+            return
+
+        if self.bank == 0 and register == self.FIFO_CONFIG_REGISTER:
+            self.fifo_time = time.perf_counter()
+
+        self.registers[register] = value & 0xFF
+
+    def __full_scale(self):
+        accel_full_scale = 16.0 / (1 << (self.banks[0][self.ACCEL_CONFIG0_REGISTER] >> 5))
+        gyro_full_scale = 2000.0 / (1 << (self.banks[0][self.GYRO_CONFIG0_REGISTER] >> 5))
+        return accel_full_scale, gyro_full_scale
+
+    def __to_int16(self, value, full_scale):
+        return max(-32767, min(32767, int(round(value / full_scale * 32768.0))))
+
+    def __sample_values(self):
+        accel_full_scale, gyro_full_scale = self.__full_scale()
+        power = self.banks[0][self.PWR_MGMT0_REGISTER]
+
+        if power & 0x03:
+            accel = [self.__to_int16(self.random.gauss(gravity, self.accel_noise), accel_full_scale) for gravity in (0.0, 0.0, 1.0)]
+        else:
+            accel = [self.INVALID_SAMPLE] * 3
+
+        if power & 0x0C:
+            gyro = [self.__to_int16(self.random.gauss(0.0, self.gyro_noise), gyro_full_scale) for _ in range(3)]
+        else:
+            gyro = [self.INVALID_SAMPLE] * 3
+
+        return accel, gyro
+
+    def __sample(self):
+        accel, gyro = self.__sample_values()
+
+        # Temperature of 25 degrees Celsius.
+        return bytes([0, 0]) + b"".join(value.to_bytes(2, "big", signed=True) for value in accel + gyro)
+
+    def __fill_fifo(self):
+        now = time.perf_counter()
+
+        if self.banks[0][self.FIFO_CONFIG_REGISTER] & 0xC0 != self.FIFO_STREAM_MODE:
+            self.fifo_time = now
+            return
+
+        period = self.__period()
+        packets = int((now - self.fifo_time) / period)
+        self.fifo_time += packets * period
+
+        # Only the packets that fit in the FIFO are generated, the stream mode keeps the newest ones.
+        for _ in range(min(packets, self.FIFO_SIZE // self.FIFO_PACKET_LENGTH)):
+            accel, gyro = self.__sample_values()
+            self.fifo += bytes([self.FIFO_PACKET_HEADER])
+            self.fifo += b"".join(value.to_bytes(2, "big", signed=True) for value in accel + gyro)
+            self.fifo += bytes([0, 0, 0])
+
+        del self.fifo[:max(0, len(self.fifo) - self.FIFO_SIZE)]
+
+    def __read_fifo(self, length):
+        self.__fill_fifo()
+        data = self.fifo[:length]
+        del self.fifo[:length]
+
+        # Reading an empty FIFO returns the empty FIFO marker.
+        return list(data) + [0xFF] * (length - len(data))
+
+    def __period(self):
+        return 1.0 / self.ODR_VALUES.get(self.banks[0][self.ACCEL_CONFIG0_REGISTER] & 0x0F, 1000.0)
+
+    def __interrupt_due(self, output, sources):
+        """
+        Returns True when one of the interrupt sources is raised on the output: the data ready interrupt once
+        per output data rate period while the accelerometer is on, and the FIFO threshold and FIFO full interrupts
+        once per period while the FIFO holds at least the watermark, or is full.
+        """
+        with self.lock:
+            now = time.perf_counter()
+            if now - self.interrupt_times.get(output, 0.0) < self.__period():
+                return False
+            self.interrupt_times[output] = now
+
+            if sources & self.DATA_READY_INTERRUPT and self.banks[0][self.PWR_MGMT0_REGISTER] & 0x03:
+                return True
+
+            if sources & self.FIFO_THRESHOLD_INTERRUPT:
+                self.__fill_fifo()
+                watermark = self.banks[0][self.FIFO_CONFIG2_REGISTER] | (self.banks[0][self.FIFO_CONFIG3_REGISTER] << 8)
+                return len(self.fifo) >= max(1, watermark)
+
+            if sources & self.FIFO_FULL_INTERRUPT:
+                self.__fill_fifo()
+                return len(self.fifo) >= self.FIFO_SIZE
+
+            return False
+
+    def interrupt_due(self):
+        """
+        Returns True when the INT1 pin raises an interrupt.
+        """
+        return self.__interrupt_due("INT1", self.banks[0][self.INT_SOURCE0_REGISTER])
+
+    def ibi_due(self):
+        """
+        Returns True when an IBI is raised.
+        """
+        return self.__interrupt_due("IBI", self.banks[4][self.INT_SOURCE8_REGISTER])
+
+# endregion
+
+# ==================================================================================
+# region Simulator
+# ==================================================================================
+
+class PulsarSimulator:
+    """
+    In-process replacement of the Pulsar class, for running the host-side code without a host adapter.
+    It implements the same methods, and the responses and notifications are delivered to the onEvent
+    callback from a separate thread, like the SDK does.
+
+    The delivery of the responses can be tuned to stress the host-side code: every response is delayed by
+    latency plus a random jitter, out_of_order allows the responses to overtake each other when their
+    delays differ, and drop_rate is the probability of a response never being delivered.
+
+    Simulated targets: I2C targets added with add_i2c_target(), an ICM-42605 at the address 0x68 by default,
+    a UART loopback and a SPI loopback. GPIO interrupts are raised with trigger_gpio_interrupt().
+    """
+
+    # Public methods of the simulator that are not SDK requests, and must not be wrapped as such by the APIs.
+    helper_methods = ["add_i2c_target", "connect_interrupt", "trigger_gpio_interrupt"]
+
+    def __init__(self, latency = 0.0005, jitter = 0.0, out_of_order = False, drop_rate = 0.0, seed = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.out_of_order = out_of_order
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+        self.callback = None
+        self.is_open = False
+
+        # Responses waiting to be delivered, ordered by delivery time.
+        self.deliveries = []
+        self.deliveries_condition = threading.Condition()
+        self.delivery_sequence = 0
+        self.last_delivery_time = 0.0
+        self.delivery_thread = None
+
+        # Statistics
+        self.requests = 0
+        self.dropped_responses = 0
+
+        self.i2c_targets = {0x68: SimulatedICM42605(seed=seed)}
+        self.gpio_levels = dict()
+        self.gpio_interrupts = set()
+
+        # Targets connected to the GPIO pins, and the thread that raises their interrupts.
+        self.gpio_interrupt_sources = dict()
+        self.interrupt_thread = None
+
+    def add_i2c_target(self, address, target):
+        self.i2c_targets[address] = target
+
+    # Connection ------------------------------------------------------------------------
+
+    def __system_message(self, opcode = 0, message = "Success"):
+        return {"module": 0, "opcode": opcode, "message": message}
+
+    def open(self, serial = None, path = None):
+        if not self.is_open:
+            self.is_open = True
+            self.delivery_thread = threading.Thread(target=self.__deliver, daemon=True)
+            self.delivery_thread.start()
+        return self.__system_message(message="Connection with Pulsar simulator opened successfully.")
+
+    def close(self):
+        if not self.is_open:
+            return self.__system_message(2, "It is required to open connection with a Pulsar first. Invoke open() method.")
+
+        with self.deliveries_condition:
+            self.is_open = False
+            self.deliveries_condition.notify()
+        self.delivery_thread.join()
+
+        return self.__system_message(message="Communication with Pulsar simulator closed successfully.")
+
+    def onEvent(self, callback_func):
+        self.callback = callback_func
+        return self.__system_message(message="On event callback function registered successfully.")
+
+    # Delivery --------------------------------------------------------------------------
+
+    def __deliver(self):
+        while True:
+            with self.deliveries_condition:
+                while self.is_open and (len(self.deliveries) == 0 or self.deliveries[0][0] > time.perf_counter()):
+                    timeout = None if len(self.deliveries) == 0 else self.deliveries[0][0] - time.perf_counter()
+                    self.deliveries_condition.wait(timeout)
+
+                if not self.is_open:
+                    return
+
+                _, _, message = heapq.heappop(self.deliveries)
+
+            if self.callback is not None:
+                self.callback(message, None)
+
+    def __schedule(self, message):
+        delay = self.latency + (self.random.uniform(0.0, self.jitter) if self.jitter > 0 else 0.0)
+
+        with self.deliveries_condition:
+            delivery_time = time.perf_counter() + delay
+
+            # Unless out of order responses are allowed, a response never overtakes the previous one.
+            if not self.out_of_order:
+                delivery_time = max(delivery_time, self.last_delivery_time)
+            self.last_delivery_time = delivery_time
+
+            heapq.heappush(self.deliveries, (delivery_time, self.delivery_sequence, message))
+            self.delivery_sequence += 1
+            self.deliveries_condition.notify()
+
+    def __respond(self, id, command, result = "SUCCESS", **fields):
+        if not self.is_open or self.callback is None:
+            return self.__system_message(1, "Pulsar not configured appropriately, please check if connection is open and callback is set")
+
+        self.requests += 1
+
+        if self.drop_rate > 0 and self.random.random() < self.drop_rate:
+            self.dropped_responses += 1
+        else:
+            self.__schedule(dict({"id": id, "command": command, "result": result}, **fields))
+
+        return self.__system_message()
+
+    def __notify(self, command, result = "SUCCESS", **fields):
+        self.__schedule(dict({"id": 0, "command": command, "result": result}, **fields))
+
+    def __name(self, value):
+        return getattr(value, "name", value)
+
+    # System ----------------------------------------------------------------------------
+
+    def getUsbString(self, id, subCommand):
+        strings = {"MANUFACTURER": "MN-Binho LLC", "PRODUCT_NAME": "PR-Pulsar Simulator", "SERIAL_NUMBER": "SN-SIMULATOR",
+                   "FW_VERSION": "FW-0.0.0", "HW_VERSION": "HW-SIM", "BL_VERSION": "BL-0.0.0"}
+        payload = strings.get(self.__name(subCommand), "")
+        return self.__respond(id, "SYS GET USB STRING", payload_length=len(payload), payload=payload)
+
+    def setI2cSpiUartGpioVoltage(self, id, voltage_mV):
+        return self.__respond(id, "SYS SET I2C SPI UART GPIO VOLTAGE")
+
+    def resetDevice(self, id):
+        return self.__system_message()
+
+    def enterBootMode(self, id):
+        return self.__system_message()
+
+    def enterIspMode(self, id):
+        return self.__system_message()
+
+    def getDeviceInfo(self, id):
+        return self.__respond(id, "SYS GET DEVICE INFO", manufacturer="Binho LLC", product_name="Pulsar Simulator",
+                              serial_number="SIMULATOR", hardware_version="SIM", firmware_version="0.0.0",
+                              capabilities={"supported_groups": ["SYS", "I2C", "SPI", "UART", "GPIO"]})
+
+    def getAnalogMeasurements(self, id):
+        return self.__respond(id, "SYS GET ANALOG MEASUREMENTS",
+                              i2c_spi_uart_gpio_vtarg={"internal_mV": 3300, "external_mV": 0},
+                              i3c_low_voltage_vtarg={"internal_mV": 1200, "external_mV": 0},
+                              i3c_high_voltage_vtarg={"internal_mV": 3300, "external_mV": 0})
+
+    def useExternalI2cSpiUartGpioVoltage(self, id):
+        return self.__respond(id, "SYS USE EXTERNAL I2C SPI UART GPIO VOLTAGE")
+
+    # I2C -------------------------------------------------------------------------------
+
+    def i2cControllerInit(self, id, busId, frequency, pullUpResistorsValue):
+        return self.__respond(id, "I2C CONTROLLER INIT", i2c_bus=self.__name(busId))
+
+    def i2cControllerSetParameters(self, id, busId, frequency, pullUpResistorsValue):
+        return self.__respond(id, "I2C CONTROLLER SET PARAMETERS", i2c_bus=self.__name(busId))
+
+    def i2cSetPullUpResistors(self, id, busId, pullUpResistorsValue):
+        return self.__respond(id, "I2C SET PULLUP RESISTORS", i2c_bus=self.__name(busId))
+
+    def i2cControllerWrite(self, id, busId, targetAddress, registerAddress, data, isNonStop = False, is10BitTargetAddress = False):
+        target = self.i2c_targets.get(targetAddress)
+        if target is None:
+            return self.__respond(id, "I2C CONTROLLER WRITE", "I2C_NACK_ADDRESS", i2c_bus=self.__name(busId), payload_length=0)
+
+        target.write(registerAddress[0] if len(registerAddress) > 0 else 0, data)
+        return self.__respond(id, "I2C CONTROLLER WRITE", i2c_bus=self.__name(busId), payload_length=len(registerAddress) + len(data))
+
+    def i2cControllerRead(self, id, busId, targetAddress, requestDataLength, registerAddress = [], is10BitTargetAddress = False):
+        target = self.i2c_targets.get(targetAddress)
+        if target is None:
+            return self.__respond(id, "I2C CONTROLLER READ", "I2C_NACK_ADDRESS", i2c_bus=self.__name(busId), payload_length=0, payload=[])
+
+        payload = target.read(registerAddress[0] if len(registerAddress) > 0 else 0, requestDataLength)
+        return self.__respond(id, "I2C CONTROLLER READ", i2c_bus=self.__name(busId), payload_length=len(payload), payload=payload)
+
+    def i2cControllerScanBus(self, id, busId, include10BitAddresses = False):
+        return self.__respond(id, "I2C CONTROLLER SCAN BUS", i2c_bus=self.__name(busId), detected_7_bit_addresses=sorted(self.i2c_targets.keys()), detected_10_bit_addresses=[])
+
+    # UART ------------------------------------------------------------------------------
+
+    def uartInit(self, id, baudrate, hardwareHandshake, parityMode, dataSize, stopBit):
+        return self.__respond(id, "UART INIT")
+
+    def uartSetParameters(self, id, baudrate, hardwareHandshake, parityMode, dataSize, stopBit):
+        return self.__respond(id, "UART SET PARAMETERS")
+
+    def uartSendMessage(self, id, data):
+        response = self.__respond(id, "UART SEND")
+
+        # The data sent is received back as in a TX to RX loopback.
+        if response["opcode"] == 0:
+            self.__notify("UART RECEIVE NOTIFICATION", payload_length=len(data), payload=list(data))
+
+        return response
+
+    # SPI -------------------------------------------------------------------------------
+
+    def spiControllerInit(self, id, *args, **kwargs):
+        return self.__respond(id, "SPI CONTROLLER INIT")
+
+    def spiControllerSetParameters(self, id, *args, **kwargs):
+        return self.__respond(id, "SPI CONTROLLER SET PARAMETERS")
+
+    def spiControllerTransfer(self, id, transferLength, payload):
+        # The data sent is received back as in a MOSI to MISO loopback.
+        data = (list(payload) + [0] * transferLength)[:transferLength]
+        return self.__respond(id, "SPI CONTROLLER TRANSFER", payload_length=len(data), payload=data)
+
+    # GPIO ------------------------------------------------------------------------------
+
+    def gpioConfigurePin(self, id, pinNumber, functionality, initialOutputLogicLevel = None):
+        self.gpio_levels[self.__name(pinNumber)] = self.__name(initialOutputLogicLevel) or "LOW"
+        return self.__respond(id, "GPIO CONFIGURE PIN")
+
+    def gpioDigitalWrite(self, id, pinNumber, logicLevel):
+        self.gpio_levels[self.__name(pinNumber)] = self.__name(logicLevel)
+        return self.__respond(id, "GPIO DIGITAL WRITE")
+
+    def gpioDigitalRead(self, id, pinNumber):
+        return self.__respond(id, "GPIO DIGITAL READ", logic_level=self.gpio_levels.get(self.__name(pinNumber), "LOW"))
+
+    def gpioSetInterrupt(self, id, pinNumber, trigger):
+        self.gpio_interrupts.add(self.__name(pinNumber))
+        if self.__name(pinNumber) in self.gpio_interrupt_sources:
+            self.__start_interrupts()
+        return self.__respond(id, "GPIO SET INTERRUPT")
+
+    def gpioDisableInterrupt(self, id, pinNumber):
+        self.gpio_interrupts.discard(self.__name(pinNumber))
+        return self.__respond(id, "GPIO DISABLE INTERRUPT")
+
+    def trigger_gpio_interrupt(self, pinNumber):
+        """
+        Sends a GPIO interrupt notification if the interrupt of the pin is enabled.
+        """
+        if self.__name(pinNumber) in self.gpio_interrupts:
+            self.__notify("GPIO INTERRUPT NOTIFICATION", pin_number=self.__name(pinNumber))
+
+    def connect_interrupt(self, pinNumber, target):
+        """
+        Connects the interrupt output of a simulated target, like the INT1 pin of the SimulatedICM42605, to a
+        GPIO pin. The target raises the GPIO interrupts when its interrupt_due() method returns True.
+        """
+        self.gpio_interrupt_sources[self.__name(pinNumber)] = target
+
+    # Interrupts ------------------------------------------------------------------------
+
+    def __start_interrupts(self):
+        # The interrupts of the targets are raised from their own thread, only started when they are first enabled.
+        if self.interrupt_thread is None:
+            self.interrupt_thread = threading.Thread(target=self.__raise_interrupts, daemon=True)
+            self.interrupt_thread.start()
+
+    def __raise_interrupts(self):
+        while self.is_open:
+            for pin_number, target in list(self.gpio_interrupt_sources.items()):
+                if pin_number in self.gpio_interrupts and target.interrupt_due():
+                    self.__notify("GPIO INTERRUPT NOTIFICATION", pin_number=pin_number)
+
+            time.sleep(0.0001)
+
+        self.interrupt_thread = None
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    # Simulated host adapter with 1 ms +/- 0.5 ms response time.
+    pulsar_device = PulsarBlockingApi(device=PulsarSimulator(latency=0.0005, jitter=0.001, out_of_order=True))
+
+    pulsar_device.open()
+
+    # Read the ICM-42605 WHO_AM_I register 1000 times, first one request after the other and then pipelined.
+    start_time = time.perf_counter()
+    for _ in range(1000):
+        pulsar_device.i2c_controller_read(busId=I2cBus.I2C_BUS_A, targetAddress=0x68, requestDataLength=1, registerAddress=[0x75])
+    sequential_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    futures = [pulsar_device.i2c_controller_read.submit(busId=I2cBus.I2C_BUS_A, targetAddress=0x68, requestDataLength=1, registerAddress=[0x75]) for _ in range(1000)]
+    responses = [pulsar_device.wait_for_response(future) for future in futures]
+    pipelined_time = time.perf_counter() - start_time
+
+    print(f"Sequential: {1000 / sequential_time:.0f} requests/s")
+    print(f"Pipelined: {1000 / pipelined_time:.0f} requests/s, {sum(response['payload'] == [0x47] for response in responses)} valid responses")
+
+    pulsar_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -1,9 +1,32 @@
-import ctypes
+import json
+import time
+import numpy as np
+from binhopulsar.commands.system.definitions import GetUsbStringSubCommand
+from binhopulsar.commands.gpio.definitions import GpioPinNumber, GpioFunctionality, GpioTriggerType
 from IMU14CLICK_definitions import *
+from register_map import RegisterMap, RegisterDevice
+from pulsar_blocking_api import NotificationSource, NotificationQueue
+
+# Layout of the data registers, from TEMP_DATA1 to GYRO_DATA_Z0, as big-endian signed 16-bit values.
+RAW_DATA_DTYPE = np.dtype([("temp", ">i2"), ("accel", ">i2", (3,)), ("gyro", ">i2", (3,))])
+
+# Layout of a FIFO packet: header, accelerometer xyz, gyroscope xyz, temperature and timestamp.
+FIFO_PACKET_DTYPE = np.dtype([("header", "u1"), ("accel", ">i2", (3,)), ("gyro", ">i2", (3,)), ("temp", "i1"), ("timestamp", ">u2")])
+
+# Scaled samples: temperature in degrees Celsius, acceleration in g and angular velocity in dps.
+SAMPLE_DTYPE = np.dtype([("temp", "f8"), ("accel", "f8", (3,)), ("gyro", "f8", (3,))])
+
+IMU14CLICK_REGISTER_MAP = RegisterMap(IMU14CLICK_REGISTERS)
+
+# Data registers, from TEMP_DATA1 to GYRO_DATA_Z0, read with a single transfer and decoded into 7 values.
+DATA_BLOCK = IMU14CLICK_REGISTER_MAP.block("TEMP_DATA", "ACCEL_DATA", "GYRO_DATA")
 
 class IMU14CLICK:
     address = 0x68
 
+    # Pulsar GPIO connected to the INT1 pin of the sensor
+    interrupt_pin = GpioPinNumber.GPIO_1
+
     # Sensor resolutions
     a_scale = IMU14CLICK_ACCEL_FS.FS_2g.value # 2g full scale
     g_scale = IMU14CLICK_GYRO_FS.FS_250dps.value # 250 dps full scale
@@ -15,149 +38,382 @@ class IMU14CLICK:
     # Calibration
     accel_bias = None
     gyro_bias = None
+    calibration_quality = None
 
-    def __init__(self, pulsar_blocking_api, i2c_bus):
+    # Default file where the calibration biases are stored when the cache is enabled, indexed by the Pulsar serial number.
+    calibration_cache_file = "IMU14CLICK_calibration.json"
+
+    def __init__(self, pulsar_blocking_api, i2c_bus, use_shadow_registers = False):
         self.pulsar = pulsar_blocking_api
         self.i2c_bus = i2c_bus
         self.imu_data = [0,0,0,0,0,0,0]
 
+        # Host-side copy of the configuration registers, used to skip the register reads once synchronized.
+        self.use_shadow_registers = use_shadow_registers
+        self.registers = RegisterDevice(IMU14CLICK_REGISTER_MAP, self.pulsar, self.i2c_bus, self.address, use_shadow_registers)
+
         self.__check_device_connection()
         print("Device found")
 
     def __check_device_connection(self):
-        response = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        requestDataLength=WHO_AM_I_length,
-                                        registerAddress=[WHO_AM_I_register])
-        if response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name or response['payload'][0] != WHO_AM_I_value:
+        if self.registers.read("WHO_AM_I") != WHO_AM_I_value:
             print("Error: Device not found")
             exit(1)
     
     def init_device(self):
-        # Enable gyro and accel in low noise mode
-        power_management_register = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        requestDataLength=PWR_MGMT0_length,
-                                        registerAddress=[PWR_MGMT0_register]).get('payload', [])
-
-        response = self.pulsar.i2c_controller_write(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        registerAddress=[PWR_MGMT0_register],
-                                        data=[power_management_register[0] | IMU14CLICK_ACCEL_MODE.LOW_NOISE.value | IMU14CLICK_GYRO_MODE.LOW_NOISE.value])
-        
-        if response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
-            print("Error: Could not initialize the device")
-            exit(1)
+        """
+        Configures the sensor with a single register transaction: the configuration registers, which are
+        consecutive, are read with one transfer and only the ones that change are written. When shadow
+        registers are used, the registers are only read the first time.
+        """
+        transaction = self.registers.transaction()
 
         # Gyro full scale and data rate
-        gyro_config_register0 = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        requestDataLength=GYRO_CONFIG0_length,
-                                        registerAddress=[GYRO_CONFIG0_register]).get('payload', [])
-        
-        response = self.pulsar.i2c_controller_write(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        registerAddress=[GYRO_CONFIG0_register],
-                                        data=[gyro_config_register0[0] | self.g_scale | self.g_odr])
-        
-        if response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
-            print("Error: Could not initialize the device")
-            exit(1)
+        transaction.write_fields("GYRO_CONFIG0", fs=IMU14CLICK_GYRO_FS(self.g_scale), odr=IMU14CLICK_GYRO_ODR(self.g_odr))
 
         # Set accel full scale and data rate
-        accel_config_register0 = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        requestDataLength=ACCEL_CONFIG0_length,
-                                        registerAddress=[ACCEL_CONFIG0_register]).get('payload', [])
-        
-        response = self.pulsar.i2c_controller_write(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        registerAddress=[ACCEL_CONFIG0_register],
-                                        data=[accel_config_register0[0] | self.a_scale | self.a_odr])
-        
-        if response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
-            print("Error: Could not initialize the device")
-            exit(1)
+        transaction.write_fields("ACCEL_CONFIG0", fs=IMU14CLICK_ACCEL_FS(self.a_scale), odr=IMU14CLICK_ACCEL_ODR(self.a_odr))
 
         # Set temperature sensor low pass filter to 5Hz, use first order gyro filter
-        gyro_config_register1 = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        requestDataLength=GYRO_CONFIG1_length,
-                                        registerAddress=[GYRO_CONFIG1_register]).get('payload', [])
-        
-        response = self.pulsar.i2c_controller_write(busId=self.i2c_bus,
-                                        targetAddress=self.address,
-                                        registerAddress=[GYRO_CONFIG1_register],
-                                        data=[gyro_config_register1[0] | TEMP_FILT_BW_5Hz])
-        
-        if response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+        transaction.set_bits("GYRO_CONFIG1", TEMP_FILT_BW_5Hz)
+
+        # Enable gyro and accel in low noise mode. The sensors are turned on last, since no register
+        # must be written during the 200 us after turning them on.
+        transaction.write_fields("PWR_MGMT0", accel_mode=IMU14CLICK_ACCEL_MODE.LOW_NOISE, gyro_mode=IMU14CLICK_GYRO_MODE.LOW_NOISE)
+
+        if transaction.submit() is None:
             print("Error: Could not initialize the device")
             exit(1)
 
-    def _read_data(self):
-        response = self.pulsar.i2c_controller_read(busId=self.i2c_bus,
-                                                   targetAddress=self.address,
-                                                   requestDataLength=READ_LENGTH,
-                                                   registerAddress=[TEMP_DATA1_register])
+    def init_data_ready_interrupt(self, interrupt_pin = None):
+        """
+        Routes the data ready interrupt of the sensor to its INT1 pin, as a short pulse for every new sample,
+        and configures the Pulsar GPIO connected to it as an input. The GPIO interrupt is only enabled by
+        enable_data_ready_interrupt(), and the samples are then read with read_next() or IMU14CLICKInterruptStream.
+        """
+        if interrupt_pin is not None:
+            self.interrupt_pin = interrupt_pin
+
+        transaction = self.registers.transaction()
+
+        transaction.write("INT_CONFIG", INT1_PULSED_PUSH_PULL_ACTIVE_HIGH)
+        transaction.write_fields("INT_CONFIG1", async_reset=0, tpulse_duration=0)
+        transaction.write_fields("INT_SOURCE0", ui_drdy_int1_en=1)
+
+        if transaction.submit() is None:
+            print("Error: Could not configure the data ready interrupt")
+            exit(1)
+
+        response = self.pulsar.gpio_configure_pin(pinNumber=self.interrupt_pin, functionality=GpioFunctionality.DIGITAL_INPUT)
 
-        if response == None or response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+        if response is None or response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+            print("Error: Could not configure the interrupt pin: ", response)
+            exit(1)
+
+        # The interrupts are timestamped as soon as their notifications are routed, and the samples read later.
+        self.interrupt_queue = NotificationQueue()
+        self.pulsar.notifications.set_listener(NotificationSource.GPIO, self.interrupt_pin, self._on_data_ready)
+
+    def _on_data_ready(self, message):
+        # Called from the SDK receiving thread, so only the arrival time is recorded.
+        self.interrupt_queue.put(time.perf_counter())
+
+    def enable_data_ready_interrupt(self):
+        # The interrupts received while they were disabled are stale.
+        self.interrupt_queue.get_all()
+
+        response = self.pulsar.gpio_set_interrupt(pinNumber=self.interrupt_pin, trigger=GpioTriggerType.TRIGGER_RISING_EDGE)
+        return response is not None and response['result'] == self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name
+
+    def disable_data_ready_interrupt(self):
+        response = self.pulsar.gpio_disable_interrupt(pinNumber=self.interrupt_pin)
+        return response is not None and response['result'] == self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name
+
+    def read_next(self, timeout = None):
+        """
+        Waits for the next data ready interrupt and reads the new sample. Returns a tuple with the time at
+        which the interrupt was received, the acceleration and the angular velocity, or None on timeout. The
+        interrupts that were already queued are skipped, only the newest sample can be read.
+        """
+        timestamp = self.interrupt_queue.get(timeout)
+        if timestamp is None:
+            return None
+
+        # Only the newest sample can be read, so it is timestamped with the newest interrupt.
+        timestamps = self.interrupt_queue.get_all()
+        if len(timestamps) > 0:
+            timestamp = timestamps[-1]
+
+        imu_data = self._decode_data(self.pulsar.wait_for_response(self._submit_read_data()))
+        if imu_data is None:
+            return None
+
+        return (timestamp,) + self._scale_data(imu_data)
+
+    def _submit_read_data(self):
+        """
+        Sends the request to read the sensor data registers and returns its Future without waiting for
+        the response, so that several reads can be in flight at once.
+        """
+        return self.registers.submit_block(DATA_BLOCK)
+
+    def _decode_data(self, response):
+        # Convert data to signed 16-bit integers
+        imu_data = self.registers.unpack_block(DATA_BLOCK, response)
+
+        if imu_data is None:
             print("Error: Could not read data: ", response)
 
-        else:
-            raw_data = response['payload']
+        return imu_data
+
+    def decode_samples(self, payloads):
+        """
+        Converts one or many payloads of the data registers into a structured array of raw samples with
+        the fields temp, accel and gyro. The payloads are given as a bytes-like object holding a whole
+        number of READ_LENGTH bytes samples, or as a list of them.
+        """
+        if isinstance(payloads, list) and len(payloads) > 0 and not isinstance(payloads[0], int):
+            payloads = b"".join(bytes(payload) for payload in payloads)
+
+        raw_data = bytes(payloads)
+        return np.frombuffer(raw_data, dtype=RAW_DATA_DTYPE, count=len(raw_data) // READ_LENGTH)
+
+    def scale_samples(self, raw_samples, temp_sensitivity = IMU14CLICK_TEMP_SENSITIVITY):
+        """
+        Converts a structured array of raw samples into a SAMPLE_DTYPE array, applying the sensor
+        resolutions and removing the calibration biases.
+        """
+        samples = np.empty(len(raw_samples), dtype=SAMPLE_DTYPE)
+        samples["temp"] = raw_samples["temp"] / temp_sensitivity + IMU14CLICK_TEMP_OFFSET
+        samples["accel"] = raw_samples["accel"] * self.a_res
+        samples["gyro"] = raw_samples["gyro"] * self.g_res
+
+        # The biases are only removed once the sensor is calibrated.
+        if self.accel_bias is not None:
+            samples["accel"] -= self.accel_bias
+        if self.gyro_bias is not None:
+            samples["gyro"] -= self.gyro_bias
+
+        return samples
+
+    def init_fifo(self):
+        """
+        Enables the FIFO in stream mode, storing packets with accelerometer, gyroscope and temperature
+        data, and flushes its content.
+        """
+        transaction = self.registers.transaction()
+
+        transaction.write("FIFO_CONFIG1", FIFO_ACCEL_EN | FIFO_GYRO_EN | FIFO_TEMP_EN)
+        transaction.write("FIFO_CONFIG", IMU14CLICK_FIFO_MODE.STREAM_TO_FIFO.value)
+
+        # The flush bit clears itself, so the register is volatile and always written.
+        transaction.write("SIGNAL_PATH_RESET", FIFO_FLUSH)
 
-            # Convert data to signed 16-bit integers
-            for i in range(len(self.imu_data)):
-                self.imu_data[i] = ctypes.c_int16((raw_data[2*i] << 8) | raw_data[2*i + 1]).value
+        if transaction.submit() is None:
+            print("Error: Could not initialize the FIFO")
+            exit(1)
+
+    def _read_fifo_data(self):
+        fifo_count = self.registers.read("FIFO_COUNT")
+
+        if fifo_count is None:
+            print("Error: Could not read the FIFO count")
+            return bytes()
+
+        fifo_count -= fifo_count % FIFO_PACKET_LENGTH
+
+        # Drain the whole FIFO at once, using as many maximum length reads as needed.
+        read_lengths = [min(FIFO_MAX_READ_LENGTH, fifo_count - offset) for offset in range(0, fifo_count, FIFO_MAX_READ_LENGTH)]
+        futures = [self.pulsar.i2c_controller_read.submit(busId=self.i2c_bus,
+                                                          targetAddress=self.address,
+                                                          requestDataLength=read_length,
+                                                          registerAddress=[FIFO_DATA_register])
+                   for read_length in read_lengths]
+
+        fifo_data = bytearray()
+        for future in futures:
+            response = self.pulsar.wait_for_response(future)
+            if response == None or response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+                print("Error: Could not read the FIFO data: ", response)
+                break
+            fifo_data += bytes(response['payload'])
+
+        return fifo_data
+
+    def _decode_fifo_data(self, fifo_data):
+        """
+        Converts the FIFO content into a structured array of raw samples, skipping the empty FIFO markers
+        and the packets whose sensor data is not valid yet.
+        """
+        packets = np.frombuffer(bytes(fifo_data), dtype=FIFO_PACKET_DTYPE, count=len(fifo_data) // FIFO_PACKET_LENGTH)
+
+        valid = (packets["header"] & FIFO_HEADER_EMPTY) == 0
+        valid &= (packets["accel"][:, 0] != FIFO_INVALID_SAMPLE) & (packets["gyro"][:, 0] != FIFO_INVALID_SAMPLE)
+
+        return packets[valid]
+
+    def read_fifo(self):
+        """
+        Reads all the samples stored in the FIFO. Returns a SAMPLE_DTYPE structured array ordered from the
+        oldest to the newest sample.
+        """
+        return self.scale_samples(self._decode_fifo_data(self._read_fifo_data()), IMU14CLICK_FIFO_TEMP_SENSITIVITY)
+
+    def _read_data(self):
+        response = self.pulsar.wait_for_response(self._submit_read_data())
+
+        imu_data = self._decode_data(response)
+        if imu_data is not None:
+            self.imu_data = imu_data
 
         return self.imu_data
 
-    def calibrate(self):
+    def read_samples(self, count):
+        """
+        Reads count samples from the data registers with all the reads in flight at once, and returns them
+        as a structured array of raw samples. The failed reads are left out of the array.
+        """
+        futures = [self._submit_read_data() for _ in range(count)]
+
+        payloads = []
+        for future in futures:
+            response = self.pulsar.wait_for_response(future)
+            if response is not None and response['result'] == self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+                payloads.append(bytes(response['payload'][:READ_LENGTH]))
+
+        return self.decode_samples(payloads)
+
+    def __get_serial_number(self):
+        response = self.pulsar.get_usb_string(subCommand=GetUsbStringSubCommand.SERIAL_NUMBER)
+
+        if response is None or response['result'] != self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name:
+            return None
+
+        return response['payload']
+
+    def __load_calibration(self, cache_file, serial_number):
+        try:
+            with open(cache_file, "r") as file:
+                return json.load(file).get(serial_number)
+        except (OSError, ValueError):
+            return None
+
+    def __save_calibration(self, cache_file, serial_number):
+        try:
+            with open(cache_file, "r") as file:
+                calibrations = json.load(file)
+        except (OSError, ValueError):
+            calibrations = dict()
+
+        calibrations[serial_number] = {
+            "accel_bias": self.accel_bias,
+            "gyro_bias": self.gyro_bias,
+            "quality": self.calibration_quality
+        }
+
+        try:
+            with open(cache_file, "w") as file:
+                json.dump(calibrations, file, indent=4)
+        except OSError as error:
+            print("Warning: Could not save the calibration: ", error)
+
+    def __robust_mean(self, values, threshold):
+        """
+        Returns the mean of every column of values, leaving out the outliers, and the mask of the samples
+        used. A sample is an outlier when any of its values is further from the column median than
+        threshold times the robust standard deviation, estimated from the median absolute deviation.
+        """
+        median = np.median(values, axis=0)
+        sigma = 1.4826 * np.median(np.abs(values - median), axis=0)
+
+        # A zero deviation means that most samples are equal, only those are kept.
+        inliers = np.all(np.abs(values - median) <= np.maximum(threshold * sigma, np.finfo(np.float64).eps), axis=1)
+
+        return values[inliers].mean(axis=0), inliers
+
+    def calibrate(self, max_samples = 1024, min_samples = 128, batch_size = 32,
+                  accel_tolerance = 1e-4, gyro_tolerance = 5e-3, outlier_threshold = 3.5, use_cache = False,
+                  cache_file = None):
+        """
+        Estimates the accelerometer and gyroscope biases with the sensor at rest. The samples are read in
+        pipelined batches of batch_size reads. After every batch the biases are estimated from the samples
+        collected so far, leaving out the outliers, and the calibration stops once at least min_samples
+        were collected and both the standard error of the biases and their change since the previous batch
+        are below the tolerances, in g and dps. The gravity is removed from the axis aligned with it.
+
+        The result is summarized in calibration_quality. When use_cache is True, the biases are stored in
+        cache_file, calibration_cache_file in the working directory by default, and loaded instead of
+        calibrating the next time the same Pulsar is used. The cache is indexed by the Pulsar serial number,
+        not by the sensor, so it must be deleted when the sensor is swapped or its orientation changes.
+        """
+        cache_file = cache_file if cache_file is not None else self.calibration_cache_file
+        serial_number = self.__get_serial_number() if use_cache else None
+
+        if serial_number is not None:
+            calibration = self.__load_calibration(cache_file, serial_number)
+            if calibration is not None:
+                self.accel_bias = calibration["accel_bias"]
+                self.gyro_bias = calibration["gyro_bias"]
+                self.calibration_quality = calibration["quality"]
+                print("Calibration loaded")
+                return
+
         print("Calibrating...")
-        sum_values = [0, 0, 0, 0, 0, 0, 0]
-        accel_bias = [0, 0, 0]
-        gyro_bias = [0, 0, 0]
-
-        for i in range(128):
-            # Read data
-            imu_data = self._read_data()
-            for j in range(len(imu_data)):          
-                sum_values[j] += imu_data[j]
-
-        accel_bias[0] = sum_values[1] * self.a_res / 128.0
-        accel_bias[1] = sum_values[2] * self.a_res / 128.0
-        accel_bias[2] = sum_values[3] * self.a_res / 128.0
-        gyro_bias[0] = sum_values[4] * self.g_res / 128.0
-        gyro_bias[1] = sum_values[5] * self.g_res / 128.0
-        gyro_bias[2] = sum_values[6] * self.g_res / 128.0
-
-        if accel_bias[0] > 0.8:
-            accel_bias[0] -= 1.0  # Remove gravity from the x-axis accelerometer bias calculation
-        if accel_bias[0] < -0.8:
-            accel_bias[0] += 1.0  # Remove gravity from the x-axis accelerometer bias calculation
-        if accel_bias[1] > 0.8:
-            accel_bias[1] -= 1.0  # Remove gravity from the y-axis accelerometer bias calculation
-        if accel_bias[1] < -0.8:
-            accel_bias[1] += 1.0  # Remove gravity from the y-axis accelerometer bias calculation
-        if accel_bias[2] > 0.8:
-            accel_bias[2] -= 1.0  # Remove gravity from the z-axis accelerometer bias calculation
-        if accel_bias[2] < -0.8:
-            accel_bias[2] += 1.0  # Remove gravity from the z-axis accelerometer bias calculation 
-
-        self.accel_bias = accel_bias
-        self.gyro_bias = gyro_bias
-
-        print("Calibration done")
-    
-    def read(self):
-        imu_data = self._read_data()
+        tolerances = np.array([accel_tolerance] * 3 + [gyro_tolerance] * 3)
+        resolutions = np.array([self.a_res] * 3 + [self.g_res] * 3)
+
+        batches = []
+        bias = None
+        converged = False
 
-        ax = imu_data[1]*self.a_res - self.accel_bias[0]
-        ay = imu_data[2]*self.a_res - self.accel_bias[1]
-        az = imu_data[3]*self.a_res - self.accel_bias[2]
+        while sum(len(batch) for batch in batches) < max_samples:
+            raw_samples = self.read_samples(min(batch_size, max_samples - sum(len(batch) for batch in batches)))
+            if len(raw_samples) == 0:
+                print("Error: Could not read data")
+                exit(1)
 
-        gx = imu_data[4]*self.g_res - self.gyro_bias[0]
-        gy = imu_data[5]*self.g_res - self.gyro_bias[1]
-        gz = imu_data[6]*self.g_res - self.gyro_bias[2]
+            batches.append(np.hstack((raw_samples["accel"], raw_samples["gyro"])) * resolutions)
+            values = np.vstack(batches)
 
-        return ((ax, ay, az), (gx, gy, gz))
\ No newline at end of file
+            previous_bias = bias
+            bias, inliers = self.__robust_mean(values, outlier_threshold)
+            standard_error = values[inliers].std(axis=0) / np.sqrt(np.count_nonzero(inliers))
+
+            if len(values) >= min_samples and previous_bias is not None:
+                if np.all(standard_error < tolerances) and np.all(np.abs(bias - previous_bias) < tolerances):
+                    converged = True
+                    break
+
+        # Remove the gravity from the accelerometer axes that measure it.
+        accel_bias = bias[:3] - np.where(np.abs(bias[:3]) > 0.8, np.sign(bias[:3]), 0.0)
+
+        self.accel_bias = accel_bias.tolist()
+        self.gyro_bias = bias[3:].tolist()
+        self.calibration_quality = {
+            "samples": len(values),
+            "rejected_samples": int(len(values) - np.count_nonzero(inliers)),
+            "accel_std": values[inliers, :3].std(axis=0).tolist(),
+            "gyro_std": values[inliers, 3:].std(axis=0).tolist(),
+            "accel_standard_error": standard_error[:3].tolist(),
+            "gyro_standard_error": standard_error[3:].tolist(),
+            "converged": converged
+        }
+
+        if serial_number is not None:
+            self.__save_calibration(cache_file, serial_number)
+
+        print(f"Calibration done with {len(values)} samples{'' if converged else ', the biases did not converge'}")
+
+    def _scale_data(self, imu_data):
+        # Use a zero bias until the sensor is calibrated.
+        accel_bias = self.accel_bias if self.accel_bias is not None else [0, 0, 0]
+        gyro_bias = self.gyro_bias if self.gyro_bias is not None else [0, 0, 0]
+
+        raw_data = np.asarray(imu_data, dtype=np.float64)
+        accel = raw_data[1:4] * self.a_res - accel_bias
+        gyro = raw_data[4:7] * self.g_res - gyro_bias
+
+        return (tuple(accel.tolist()), tuple(gyro.tolist()))
+
+    def read(self):
+        return self._scale_data(self._read_data())
\ No newline at end of file
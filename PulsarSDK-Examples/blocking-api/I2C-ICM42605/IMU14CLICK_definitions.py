@@ -1,4 +1,5 @@
 from enum import Enum
+from register_map import Register, Field
 
 WHO_AM_I_register = 0x75
 WHO_AM_I_length = 1
@@ -103,8 +104,106 @@ class IMU14CLICK_ACCEL_ODR(Enum):
     ODR_1_5625Hz= 0x0E
     ODR_500Hz   = 0x0F
 
+# Output data rates in Hz, valid for both the accelerometer and the gyroscope ODR values
+IMU14CLICK_ODR_VALUES = {
+    IMU14CLICK_ACCEL_ODR.ODR_32kHz.value:    32000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_16kHz.value:    16000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_8kHz.value:     8000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_4kHz.value:     4000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_2kHz.value:     2000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_1kHz.value:     1000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_200Hz.value:    200.0,
+    IMU14CLICK_ACCEL_ODR.ODR_100Hz.value:    100.0,
+    IMU14CLICK_ACCEL_ODR.ODR_50Hz.value:     50.0,
+    IMU14CLICK_ACCEL_ODR.ODR_25Hz.value:     25.0,
+    IMU14CLICK_ACCEL_ODR.ODR_12_5Hz.value:   12.5,
+    IMU14CLICK_ACCEL_ODR.ODR_6_25Hz.value:   6.25,
+    IMU14CLICK_ACCEL_ODR.ODR_3_125Hz.value:  3.125,
+    IMU14CLICK_ACCEL_ODR.ODR_1_5625Hz.value: 1.5625,
+    IMU14CLICK_ACCEL_ODR.ODR_500Hz.value:    500.0
+}
+
 # Accelerometer 16 bits symmetric resolution
 IMU14CLICK_ACCEL_RESOLUTION = 32768.0
 
 TEMP_DATA1_register = 0x1D
-READ_LENGTH = 14 # 14 bytes to read all data (6 bytes for accelerometer, 6 bytes for gyroscope, 2 bytes for temperature)
\ No newline at end of file
+ACCEL_DATA_X1_register = 0x1F
+GYRO_DATA_X1_register = 0x25
+READ_LENGTH = 14 # 14 bytes to read all data (6 bytes for accelerometer, 6 bytes for gyroscope, 2 bytes for temperature)
+
+# Temperature in degrees Celsius = raw value / sensitivity + offset
+IMU14CLICK_TEMP_SENSITIVITY = 132.48
+IMU14CLICK_FIFO_TEMP_SENSITIVITY = 2.07 # The FIFO stores an 8-bit temperature value
+IMU14CLICK_TEMP_OFFSET = 25.0
+
+SIGNAL_PATH_RESET_register = 0x4B
+FIFO_FLUSH = 0x02
+
+FIFO_CONFIG_register = 0x16
+FIFO_CONFIG_length = 1
+
+class IMU14CLICK_FIFO_MODE(Enum):
+    """FIFO modes"""
+    BYPASS          = 0x00
+    STREAM_TO_FIFO  = 0x40
+    STOP_ON_FULL    = 0x80
+
+FIFO_CONFIG1_register = 0x5F
+FIFO_CONFIG1_length = 1
+FIFO_ACCEL_EN = 0x01
+FIFO_GYRO_EN = 0x02
+FIFO_TEMP_EN = 0x04
+
+FIFO_COUNTH_register = 0x2E
+FIFO_COUNT_length = 2 # FIFO count in bytes, big endian
+
+FIFO_DATA_register = 0x30
+
+# FIFO packet with accelerometer, gyroscope and temperature data: header (1 byte), accelerometer (6 bytes),
+# gyroscope (6 bytes), temperature (1 byte) and timestamp (2 bytes).
+FIFO_PACKET_LENGTH = 16
+FIFO_HEADER_EMPTY = 0x80 # Header bit set when the FIFO is empty
+FIFO_INVALID_SAMPLE = -32768
+
+# Maximum length of an I2C transfer, rounded down to a whole number of FIFO packets
+FIFO_MAX_READ_LENGTH = (1024 // FIFO_PACKET_LENGTH) * FIFO_PACKET_LENGTH
+
+# INT1 pin configuration: pulsed, push-pull and active high, so every interrupt is a rising edge
+INT_CONFIG_register = 0x14
+INT_CONFIG_length = 1
+INT1_PULSED_PUSH_PULL_ACTIVE_HIGH = 0x03
+
+INT_CONFIG1_register = 0x64
+INT_CONFIG1_length = 1
+INT_ASYNC_RESET = 0x10 # Must be cleared for the INT1 pin to work properly
+INT_TPULSE_DURATION_8us = 0x40 # 100 us pulses when cleared
+
+INT_SOURCE0_register = 0x65
+INT_SOURCE0_length = 1
+UI_DRDY_INT1_EN = 0x08 # Route the data ready interrupt to the INT1 pin
+
+# Declarative description of the registers used by the driver, compiled into a RegisterMap by the driver.
+# The fields with Enum values take the members of the Enums above, the rest take plain integers.
+IMU14CLICK_REGISTERS = [
+    Register("WHO_AM_I", WHO_AM_I_register),
+    Register("INT_CONFIG", INT_CONFIG_register),
+    Register("SIGNAL_PATH_RESET", SIGNAL_PATH_RESET_register, fields=[Field("fifo_flush", FIFO_FLUSH)], volatile=True),
+    Register("FIFO_CONFIG", FIFO_CONFIG_register, fields=[Field("mode", 0xC0, IMU14CLICK_FIFO_MODE)]),
+    Register("TEMP_DATA", TEMP_DATA1_register, length=2, format="h", volatile=True),
+    Register("ACCEL_DATA", ACCEL_DATA_X1_register, length=6, format="3h", volatile=True),
+    Register("GYRO_DATA", GYRO_DATA_X1_register, length=6, format="3h", volatile=True),
+    Register("FIFO_COUNT", FIFO_COUNTH_register, length=FIFO_COUNT_length, volatile=True),
+    Register("PWR_MGMT0", PWR_MGMT0_register, fields=[Field("gyro_mode", 0x0C, IMU14CLICK_GYRO_MODE),
+                                                      Field("accel_mode", 0x03, IMU14CLICK_ACCEL_MODE)]),
+    Register("GYRO_CONFIG0", GYRO_CONFIG0_register, fields=[Field("fs", 0xE0, IMU14CLICK_GYRO_FS),
+                                                            Field("odr", 0x0F, IMU14CLICK_GYRO_ODR)]),
+    Register("ACCEL_CONFIG0", ACCEL_CONFIG0_register, fields=[Field("fs", 0xE0, IMU14CLICK_ACCEL_FS),
+                                                              Field("odr", 0x0F, IMU14CLICK_ACCEL_ODR)]),
+    Register("GYRO_CONFIG1", GYRO_CONFIG1_register, fields=[Field("temp_filt_bw", 0xE0)]),
+    Register("FIFO_CONFIG1", FIFO_CONFIG1_register, fields=[Field("accel_en", FIFO_ACCEL_EN),
+                                                            Field("gyro_en", FIFO_GYRO_EN),
+                                                            Field("temp_en", FIFO_TEMP_EN)]),
+    Register("INT_CONFIG1", INT_CONFIG1_register, fields=[Field("tpulse_duration", INT_TPULSE_DURATION_8us),
+                                                          Field("async_reset", INT_ASYNC_RESET)]),
+    Register("INT_SOURCE0", INT_SOURCE0_register, fields=[Field("ui_drdy_int1_en", UI_DRDY_INT1_EN)])
+]
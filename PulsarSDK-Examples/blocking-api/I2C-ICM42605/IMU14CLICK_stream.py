@@ -0,0 +1,255 @@
+import threading
+import collections
+import concurrent.futures
+import time
+import numpy as np
+from IMU14CLICK_definitions import *
+from capture import CaptureReader
+from IMU14CLICK import IMU14CLICK
+from pulsar_blocking_api import NotificationSource
+
+# Records of the IMU captures: the sample timestamp, the acceleration in g and the angular velocity in dps.
+IMU_CAPTURE_DTYPE = np.dtype([("timestamp", "<f8"), ("accel", "<f8", (3,)), ("gyro", "<f8", (3,))])
+
+def output_data_period(imu):
+    """
+    Returns the time in seconds between two samples of the sensor, at the fastest of its output data rates.
+    """
+    return 1.0 / max(IMU14CLICK_ODR_VALUES[imu.a_odr], IMU14CLICK_ODR_VALUES[imu.g_odr])
+
+class IMU14CLICKStream:
+    """
+    Continuous acquisition of the IMU14CLICK data. A background producer thread keeps several data reads
+    in flight, paced at the sensor output data rate, and pushes the timestamped samples into a bounded
+    ring buffer. The samples are consumed by iterating over the stream.
+
+    Each sample is a tuple (timestamp, (ax, ay, az), (gx, gy, gz)), where the timestamp is the
+    time.perf_counter() value at which the response of the read was received. When the consumer falls
+    behind and the buffer is full, the oldest samples are dropped and counted in dropped_samples.
+
+    When a recorder is given, a CaptureWriter created with IMU_CAPTURE_DTYPE, every sample is also
+    appended to it, so the stream can be replayed later with IMU14CLICKReplay.
+
+    The period of the samples defaults to the output data rate of the sensor. The streams that do not read
+    a sensor, like IMU14CLICKReplay, are created without imu and give their period instead.
+    """
+
+    def __init__(self, imu = None, buffer_size = 4096, pipeline_depth = 4, recorder = None, period = None):
+        self.imu = imu
+        self.recorder = recorder
+        self.pipeline_depth = pipeline_depth
+        self.period = period if period is not None else output_data_period(imu)
+
+        self.buffer = collections.deque(maxlen=buffer_size)
+        self.buffer_condition = threading.Condition()
+
+        # Statistics
+        self.produced_samples = 0
+        self.dropped_samples = 0
+        self.failed_reads = 0
+
+        self.running = False
+        self.producer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        return self.samples()
+
+    def start(self):
+        self.running = True
+        self.producer = threading.Thread(target=self._produce, daemon=True)
+        self.producer.start()
+
+    def stop(self):
+        self.running = False
+        if self.producer is not None:
+            self.producer.join()
+            self.producer = None
+
+        with self.buffer_condition:
+            self.buffer_condition.notify_all()
+
+    def _produce(self):
+        in_flight = collections.deque()
+        next_read_time = time.perf_counter()
+
+        while self.running or len(in_flight) > 0:
+            now = time.perf_counter()
+
+            # Restart the schedule after a stall instead of sending a burst of late reads.
+            if now - next_read_time > self.pipeline_depth * self.period:
+                next_read_time = now
+
+            # Keep the pipeline full with the reads that are due.
+            while self.running and len(in_flight) < self.pipeline_depth and next_read_time <= now:
+                future = self.imu._submit_read_data()
+                future.add_done_callback(self.__timestamp)
+                in_flight.append(future)
+                next_read_time += self.period
+
+            if len(in_flight) == 0:
+                time.sleep(max(0.0, next_read_time - time.perf_counter()))
+                continue
+
+            if len(in_flight) == self.pipeline_depth or not self.running:
+                # Nothing else can be sent, wait for the oldest read. It is given up after the response timeout.
+                self.__push(in_flight.popleft())
+            else:
+                # Wait for the oldest read, but not beyond the time the next read is due.
+                concurrent.futures.wait([in_flight[0]], timeout=max(0.0, next_read_time - time.perf_counter()))
+
+            while len(in_flight) > 0 and in_flight[0].done():
+                self.__push(in_flight.popleft())
+
+    def __timestamp(self, future):
+        future.timestamp = time.perf_counter()
+
+    def __push(self, future):
+        response = self.imu.pulsar.wait_for_response(future)
+        imu_data = self.imu._decode_data(response)
+
+        if imu_data is None:
+            self.failed_reads += 1
+            return
+
+        # The done callback might not have run yet when the future is seen as done.
+        timestamp = getattr(future, "timestamp", time.perf_counter())
+        self._buffer_sample((timestamp,) + self.imu._scale_data(imu_data))
+
+    def _buffer_sample(self, sample):
+        if self.recorder is not None:
+            self.recorder.append(sample)
+
+        with self.buffer_condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped_samples += 1
+            self.buffer.append(sample)
+            self.produced_samples += 1
+            self.buffer_condition.notify()
+
+    def read_available(self):
+        """
+        Returns all the samples stored in the buffer without blocking.
+        """
+        with self.buffer_condition:
+            samples = list(self.buffer)
+            self.buffer.clear()
+        return samples
+
+    def samples(self, timeout = None):
+        """
+        Generator that yields the samples as they are acquired. It finishes when the stream is stopped
+        and the buffer is empty, or when no sample arrives within the timeout.
+        """
+        while True:
+            with self.buffer_condition:
+                self.buffer_condition.wait_for(lambda: len(self.buffer) > 0 or not self.running, timeout=timeout)
+
+                if len(self.buffer) == 0:
+                    return
+
+                sample = self.buffer.popleft()
+
+            yield sample
+
+class IMU14CLICKInterruptStream(IMU14CLICKStream):
+    """
+    Continuous acquisition of the IMU14CLICK data driven by the data ready interrupt of the sensor, instead
+    of reads paced at the output data rate. The sensor must be configured with init_data_ready_interrupt().
+
+    Every rising edge of the interrupt pin triggers a single data read, and the sample is timestamped with the
+    time.perf_counter() value at which the interrupt notification was received. The edges received while a
+    read is in flight belong to samples that the pending read already misses, so they are coalesced into one
+    read of the newest sample and counted in coalesced_interrupts.
+    """
+
+    def __init__(self, imu, buffer_size = 4096, recorder = None):
+        super().__init__(imu, buffer_size, pipeline_depth=1, recorder=recorder)
+
+        self.interrupts = collections.deque()
+        self.interrupt_condition = threading.Condition()
+
+        # Statistics
+        self.received_interrupts = 0
+        self.coalesced_interrupts = 0
+
+    def start(self):
+        self.imu.pulsar.notifications.set_listener(NotificationSource.GPIO, self.imu.interrupt_pin, self.__on_interrupt)
+
+        if not self.imu.enable_data_ready_interrupt():
+            print("Error: Could not enable the data ready interrupt")
+
+        super().start()
+
+    def stop(self):
+        self.imu.disable_data_ready_interrupt()
+        self.imu.pulsar.notifications.set_listener(NotificationSource.GPIO, self.imu.interrupt_pin, self.imu._on_data_ready)
+
+        self.running = False
+        with self.interrupt_condition:
+            self.interrupt_condition.notify_all()
+
+        super().stop()
+
+    def __on_interrupt(self, message):
+        # Called from the SDK receiving thread, so the read is left to the producer thread.
+        with self.interrupt_condition:
+            self.interrupts.append(time.perf_counter())
+            self.received_interrupts += 1
+            self.interrupt_condition.notify()
+
+    def _produce(self):
+        while self.running:
+            with self.interrupt_condition:
+                self.interrupt_condition.wait_for(lambda: len(self.interrupts) > 0 or not self.running)
+
+                if len(self.interrupts) == 0:
+                    return
+
+                timestamp = self.interrupts.pop()
+                self.coalesced_interrupts += len(self.interrupts)
+                self.interrupts.clear()
+
+            imu_data = self.imu._decode_data(self.imu.pulsar.wait_for_response(self.imu._submit_read_data()))
+
+            if imu_data is None:
+                self.failed_reads += 1
+                continue
+
+            self._buffer_sample((timestamp,) + self.imu._scale_data(imu_data))
+
+class IMU14CLICKReplay(IMU14CLICKStream):
+    """
+    Replays an IMU capture file through the same interface as IMU14CLICKStream, so the consumers of a live
+    stream can process a recorded one. The samples keep the time between them, scaled by the speed factor,
+    and their original timestamps. A speed of None replays the samples as fast as possible.
+
+    The period of the stream is the median time between the samples, or the period of the default output data
+    rate of the sensor when the capture has fewer than 2 samples.
+    """
+
+    def __init__(self, path, buffer_size = 4096, speed = 1.0):
+        self.capture = CaptureReader(path)
+        self.speed = speed
+
+        timestamps = self.capture.records["timestamp"]
+        period = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 0.0
+
+        super().__init__(None, buffer_size, recorder=None, period=period if period > 0 else output_data_period(IMU14CLICK))
+
+    def _produce(self):
+        for record in self.capture.replay(self.speed):
+            if not self.running:
+                break
+
+            self._buffer_sample((float(record["timestamp"]), tuple(record["accel"].tolist()), tuple(record["gyro"].tolist())))
+
+        self.running = False
+        with self.buffer_condition:
+            self.buffer_condition.notify_all()
@@ -0,0 +1,387 @@
+import struct
+
+# Formats of the registers that hold a single unsigned value, by length in bytes.
+UNSIGNED_FORMATS = {1: "B", 2: "H", 4: "I"}
+
+class Field:
+    """
+    Bit field of a register, given by its mask. When the values are given as an Enum, its members hold the
+    field value already in position in the register, as in the sensor definitions, and the field is read
+    back as a member of the Enum. Otherwise the field is written and read as a plain integer, shifted to
+    the position of the mask.
+    """
+
+    def __init__(self, name, mask, values = None):
+        self.name = name
+        self.mask = mask
+        self.values = values
+
+class Register:
+    """
+    Declarative description of a register, or of a group of consecutive registers read as a single value.
+    The format is a struct format without byte order, e.g. "3h" for three signed 16-bit values, and
+    defaults to an unsigned integer of the register length. Volatile registers, like the data registers
+    or the self-clearing ones, are never taken from the shadow registers.
+    """
+
+    def __init__(self, name, address, length = 1, fields = (), format = None, byteorder = "big", volatile = False):
+        self.name = name
+        self.address = address
+        self.length = length
+        self.fields = fields
+        self.format = format if format is not None else UNSIGNED_FORMATS[length]
+        self.byteorder = byteorder
+        self.volatile = volatile
+
+class CompiledField:
+    def __init__(self, field):
+        self.mask = field.mask
+        self.shift = (field.mask & -field.mask).bit_length() - 1
+
+        # Lookup tables between the Enum members and the register bits, so no Enum is accessed per call.
+        if field.values is not None:
+            self.encoding = {member: member.value & field.mask for member in field.values}
+            self.decoding = {member.value & field.mask: member for member in field.values}
+        else:
+            self.encoding = None
+            self.decoding = None
+
+    def encode(self, value):
+        if self.encoding is not None and value in self.encoding:
+            return self.encoding[value]
+        return (value << self.shift) & self.mask
+
+    def decode(self, register_value):
+        bits = register_value & self.mask
+        if self.decoding is not None:
+            return self.decoding.get(bits, bits)
+        return bits >> self.shift
+
+class CompiledRegister:
+    def __init__(self, register):
+        self.name = register.name
+        self.address = register.address
+        self.length = register.length
+        self.volatile = register.volatile
+        self.struct = struct.Struct((">" if register.byteorder == "big" else "<") + register.format)
+        self.fields = {field.name: CompiledField(field) for field in register.fields}
+
+        if self.struct.size != self.length:
+            raise ValueError(f"The format of the register {self.name} is {self.struct.size} bytes long instead of {self.length}")
+
+    def unpack(self, payload, offset = 0):
+        values = self.struct.unpack_from(payload, offset)
+        return values[0] if len(values) == 1 else values
+
+    def pack(self, value):
+        return self.struct.pack(*value) if isinstance(value, tuple) else self.struct.pack(value)
+
+class RegisterBlock:
+    """
+    Consecutive registers read with a single transfer. The block is decoded with one precompiled struct,
+    into a flat tuple with the values of all its registers, or into a dictionary by register name.
+    """
+
+    def __init__(self, registers):
+        self.registers = sorted(registers, key=lambda register: register.address)
+        self.address = self.registers[0].address
+        self.length = self.registers[-1].address + self.registers[-1].length - self.address
+
+        # The bytes between the registers are skipped with pad bytes, all the registers share the byte order.
+        format = self.registers[0].struct.format[0]
+        position = self.address
+        for register in self.registers:
+            if register.struct.format[0] != format[0]:
+                raise ValueError(f"The register {register.name} has a different byte order than the previous registers of the block")
+            if register.address < position:
+                raise ValueError(f"The register {register.name} overlaps the previous register of the block")
+            format += "x" * (register.address - position) + register.struct.format[1:]
+            position = register.address + register.length
+
+        self.struct = struct.Struct(format)
+        self.offsets = [(register, register.address - self.address) for register in self.registers]
+
+    def unpack(self, payload):
+        return self.struct.unpack_from(payload)
+
+    def decode(self, payload):
+        return {register.name: register.unpack(payload, offset) for register, offset in self.offsets}
+
+class RegisterMap:
+    """
+    Register map of a device, compiled once from its declarative description: the masks and shifts of
+    the fields, the Enum lookup tables and the struct decoders are computed here, so accessing the
+    registers only costs dictionary lookups.
+    """
+
+    def __init__(self, registers):
+        self.registers = {register.name: CompiledRegister(register) for register in registers}
+        self.by_address = {register.address: register for register in self.registers.values()}
+
+        # Blocks returned by merge(), indexed by the names of the registers, so each group is only compiled once.
+        self.merged_blocks = dict()
+
+    def __getitem__(self, name):
+        return self.registers[name]
+
+    def __contains__(self, name):
+        return name in self.registers
+
+    def block(self, *names):
+        return RegisterBlock([self.registers[name] for name in names])
+
+    def merge(self, names):
+        """
+        Groups the registers into blocks of consecutive registers, so each block is read with one transfer.
+        Only the given registers are read, so the gaps between them are never read.
+        """
+        names = tuple(names)
+        blocks = self.merged_blocks.get(names)
+        if blocks is None:
+            blocks = self.__merge(names)
+            self.merged_blocks[names] = blocks
+        return blocks
+
+    def __merge(self, names):
+        registers = sorted({self.registers[name] for name in names}, key=lambda register: register.address)
+
+        groups = []
+        for register in registers:
+            previous = groups[-1][-1] if len(groups) > 0 else None
+            if previous is not None and previous.address + previous.length == register.address and previous.struct.format[0] == register.struct.format[0]:
+                groups[-1].append(register)
+            else:
+                groups.append([register])
+
+        return [RegisterBlock(group) for group in groups]
+
+class RegisterDevice:
+    """
+    Access to the registers of an I2C target through a Pulsar blocking API instance, following a compiled
+    register map. The values read and written are kept in a host-side shadow copy of the non-volatile
+    registers, so the configuration registers are only read once, and the writes that would not change
+    a register are skipped.
+
+    Other buses or host adapters are supported by overriding _submit_read() and _submit_write().
+    """
+
+    def __init__(self, register_map, pulsar_blocking_api, i2c_bus, target_address, use_shadow_registers = True):
+        self.map = register_map
+        self.pulsar = pulsar_blocking_api
+        self.i2c_bus = i2c_bus
+        self.target_address = target_address
+        self.use_shadow_registers = use_shadow_registers
+        self.shadow_registers = dict()
+
+        # Statistics
+        self.read_transfers = 0
+        self.write_transfers = 0
+        self.skipped_writes = 0
+        self.shadow_hits = 0
+
+    def _submit_read(self, address, length):
+        return self.pulsar.i2c_controller_read.submit(busId=self.i2c_bus,
+                                                      targetAddress=self.target_address,
+                                                      requestDataLength=length,
+                                                      registerAddress=[address])
+
+    def _submit_write(self, address, data):
+        return self.pulsar.i2c_controller_write.submit(busId=self.i2c_bus,
+                                                       targetAddress=self.target_address,
+                                                       registerAddress=[address],
+                                                       data=list(data))
+
+    def _is_success(self, response):
+        return response is not None and response['result'] == self.pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name
+
+    # Reads ------------------------------------------------------------------------
+
+    def submit_block(self, block):
+        """
+        Sends the read of a block and returns its Future without waiting for the response.
+        """
+        self.read_transfers += 1
+        return self._submit_read(block.address, block.length)
+
+    def unpack_block(self, block, response):
+        """
+        Returns the flat tuple of values of the block read, or None if the read failed.
+        """
+        if not self._is_success(response) or len(response['payload']) < block.length:
+            return None
+        return block.unpack(bytes(response['payload']))
+
+    def read_registers(self, names):
+        """
+        Reads the registers with as few transfers as possible: the registers in the shadow copy are not read,
+        and the rest are merged into blocks of consecutive registers, all of them in flight at once. Returns a
+        dictionary with the value of every register, or None if any read failed.
+        """
+        values = dict()
+        names_to_read = []
+
+        for name in names:
+            if self.use_shadow_registers and name in self.shadow_registers:
+                values[name] = self.shadow_registers[name]
+                self.shadow_hits += 1
+            else:
+                names_to_read.append(name)
+
+        futures = [(block, self.submit_block(block)) for block in self.map.merge(names_to_read)]
+
+        for block, future in futures:
+            response = self.pulsar.wait_for_response(future)
+            if not self._is_success(response):
+                print("Error: Could not read the registers: ", response)
+                return None
+
+            block_values = block.decode(bytes(response['payload']))
+            values.update(block_values)
+            self.__update_shadow(block_values)
+
+        return values
+
+    def read(self, name):
+        values = self.read_registers([name])
+        return None if values is None else values[name]
+
+    def read_field(self, name, field):
+        value = self.read(name)
+        return None if value is None else self.map[name].fields[field].decode(value)
+
+    def __update_shadow(self, values):
+        for name, value in values.items():
+            if not self.map[name].volatile:
+                self.shadow_registers[name] = value
+
+    def invalidate(self):
+        """
+        Forgets the shadow copy, e.g. after a reset of the device.
+        """
+        self.shadow_registers.clear()
+
+    # Writes -----------------------------------------------------------------------
+
+    def transaction(self):
+        return RegisterTransaction(self)
+
+    def write(self, name, value):
+        return self.transaction().write(name, value).submit() is not None
+
+    def write_fields(self, name, **fields):
+        return self.transaction().write_fields(name, **fields).submit() is not None
+
+    def _write_registers(self, writes):
+        """
+        Sends the register writes, all of them in flight at once and in the given order. Returns False if
+        any write failed.
+        """
+        futures = []
+        for name, value in writes:
+            register = self.map[name]
+            futures.append((name, value, self._submit_write(register.address, register.pack(value))))
+            self.write_transfers += 1
+
+        success = True
+        for name, value, future in futures:
+            if self._is_success(self.pulsar.wait_for_response(future)):
+                self.__update_shadow({name: value})
+            else:
+                # The value of a register that could not be written is unknown.
+                self.shadow_registers.pop(name, None)
+                success = False
+
+        return success
+
+    def statistics(self):
+        return {"read_transfers": self.read_transfers, "write_transfers": self.write_transfers,
+                "skipped_writes": self.skipped_writes, "shadow_hits": self.shadow_hits}
+
+class RegisterTransaction:
+    """
+    Batch of register operations on a RegisterDevice. The current values needed by the read-modify-write
+    operations are read with the fewest block reads, the new values are computed on the host, and only the
+    registers whose value changes are written, in the order of the operations. Volatile registers are
+    always written.
+    """
+
+    WRITE = 0
+    SET_BITS = 1
+    CLEAR_BITS = 2
+    WRITE_FIELDS = 3
+
+    def __init__(self, device):
+        self.device = device
+        self.operations = []
+
+    def write(self, name, value):
+        self.operations.append((name, self.WRITE, value))
+        return self
+
+    def set_bits(self, name, mask):
+        self.operations.append((name, self.SET_BITS, mask))
+        return self
+
+    def clear_bits(self, name, mask):
+        self.operations.append((name, self.CLEAR_BITS, mask))
+        return self
+
+    def write_fields(self, name, **fields):
+        register = self.device.map[name]
+
+        mask = 0
+        bits = 0
+        for field_name, value in fields.items():
+            field = register.fields[field_name]
+            mask |= field.mask
+            bits |= field.encode(value)
+
+        self.operations.append((name, self.WRITE_FIELDS, (mask, bits)))
+        return self
+
+    def submit(self):
+        """
+        Executes the queued operations. Returns a dictionary with the final value of every register used
+        in the transaction, or None if any of the transfers failed.
+        """
+        # Only the registers whose current value is needed before they are written are read.
+        written = set()
+        names_to_read = []
+        for name, operation, _ in self.operations:
+            if operation == self.WRITE:
+                written.add(name)
+            elif name not in written and name not in names_to_read:
+                names_to_read.append(name)
+
+        values = self.device.read_registers(names_to_read)
+        if values is None:
+            return None
+
+        # Compute the new register values in the same order the operations were queued.
+        writes = []
+        for name, operation, value in self.operations:
+            if operation == self.WRITE:
+                new_value = value
+            elif operation == self.SET_BITS:
+                new_value = values[name] | value
+            elif operation == self.CLEAR_BITS:
+                new_value = values[name] & ~value
+            else:
+                mask, bits = value
+                new_value = (values[name] & ~mask) | bits
+
+            register = self.device.map[name]
+            current_value = values.get(name, self.device.shadow_registers.get(name) if self.device.use_shadow_registers else None)
+
+            if new_value == current_value and not register.volatile:
+                self.device.skipped_writes += 1
+            else:
+                writes.append((name, new_value))
+
+            values[name] = new_value
+
+        if not self.device._write_registers(writes):
+            return None
+
+        self.operations = []
+        return values
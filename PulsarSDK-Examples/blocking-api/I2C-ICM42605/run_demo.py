@@ -1,10 +1,83 @@
-import time
+import argparse
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
 from pulsar_blocking_api import PulsarBlockingApi
+from pulsar_simulator import PulsarSimulator
 from IMU14CLICK import IMU14CLICK
+from IMU14CLICK_stream import IMU14CLICKStream, IMU14CLICKInterruptStream, IMU14CLICKReplay, IMU_CAPTURE_DTYPE
+from capture import CaptureWriter
+from IMU14CLICK_definitions import *
 
-def main():
-    pulsar = PulsarBlockingApi()
+# Time window shown in the plots, in seconds
+WINDOW_SECONDS = 10.0
+
+# Plots refresh rate, in frames per second
+FRAME_RATE = 30
+
+# Number of min/max pairs drawn per series, regardless of the number of samples in the window
+PLOT_BUCKETS = 500
+
+class SampleRingBuffer:
+    """
+    Fixed size storage of the last samples, with the timestamps and the six sensor channels in
+    preallocated NumPy arrays. Appending never reallocates nor moves the stored samples.
+    """
+
+    def __init__(self, capacity, channels = 6):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((capacity, channels))
+        self.index = 0
+        self.count = 0
+
+    def extend(self, times, values):
+        # Only the newest samples fit in the buffer.
+        times = times[-self.capacity:]
+        values = values[-self.capacity:]
+
+        positions = (self.index + np.arange(len(times))) % self.capacity
+        self.times[positions] = times
+        self.values[positions] = values
+
+        self.index = (self.index + len(times)) % self.capacity
+        self.count = min(self.count + len(times), self.capacity)
+
+    def ordered(self):
+        """
+        Returns the stored timestamps and values from the oldest to the newest sample.
+        """
+        start = (self.index - self.count) % self.capacity
+        positions = (start + np.arange(self.count)) % self.capacity
+        return self.times[positions], self.values[positions]
+
+def decimate_min_max(times, values, buckets):
+    """
+    Reduces the samples to the minimum and the maximum of every channel in each of the buckets, so that
+    the peaks are kept while drawing a fixed number of points.
+    """
+    if len(times) <= 2 * buckets:
+        return times, values
+
+    size = len(times) // buckets
+    length = size * buckets
+
+    bucket_times = times[-length:].reshape(buckets, size)
+    bucket_values = values[-length:].reshape(buckets, size, values.shape[1])
+
+    decimated_times = np.empty(2 * buckets)
+    decimated_times[0::2] = bucket_times[:, 0]
+    decimated_times[1::2] = bucket_times[:, -1]
+
+    decimated_values = np.empty((2 * buckets, values.shape[1]))
+    decimated_values[0::2] = bucket_values.min(axis=1)
+    decimated_values[1::2] = bucket_values.max(axis=1)
+
+    return decimated_times, decimated_values
+
+
+def init_imu(device = None, calibration_cache = None):
+    pulsar = PulsarBlockingApi(device)
 
     response = pulsar.open()
 
@@ -26,7 +99,7 @@ def main():
                                           frequency=frequency,
                                           pullUpResistorsValue=pullUpResistorsValue)
 
-    if not response['result'] in [pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name, pulsar.i2c_definitions.CommonResultCodes.BUS_ALREADY_INITIALIZED.name]:
+    if not response['result'] in [pulsar.i2c_definitions.CommonResultCodes.SUCCESS.name, pulsar.i2c_definitions.CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
         print("Error initializing the I2C bus")
         exit(1)
 
@@ -34,79 +107,108 @@ def main():
 
     imu.init_device()
 
-    imu.calibrate()
+    imu.calibrate(use_cache=calibration_cache is not None, cache_file=calibration_cache)
 
-    # Setup the matplotlib figure and axes
-    plt.ion()
+    return pulsar, imu
+
+def main():
+    parser = argparse.ArgumentParser(description="Pulsar with Mikroe IMU 14 Click Demo")
+    parser.add_argument("--record", help="capture file where the acquired samples are recorded")
+    parser.add_argument("--replay", help="capture file replayed instead of reading the sensor")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Pulsar and IMU instead of the hardware")
+    parser.add_argument("--interrupt", action="store_true", help="read the sensor on its data ready interrupt, wired to GPIO 1")
+    parser.add_argument("--calibration-cache", help="file where the calibration is stored and loaded from, delete it when the sensor is moved")
+    args = parser.parse_args()
+
+    # The acquisition runs in its own thread, the plots only read the samples acquired since the last frame.
+    pulsar = None
+    recorder = None
+
+    if args.replay is not None:
+        stream = IMU14CLICKReplay(args.replay)
+        accel_range = stream.capture.metadata["accel_range"]
+        gyro_range = stream.capture.metadata["gyro_range"]
+    else:
+        simulator = PulsarSimulator() if args.simulate else None
+        pulsar, imu = init_imu(simulator, args.calibration_cache)
+        accel_range = IMU14CLICK_ACCEL_FS_VALUES[imu.a_scale]
+        gyro_range = IMU14CLICK_GYRO_FS_VALUES[imu.g_scale]
+
+        if args.record is not None:
+            recorder = CaptureWriter(args.record, IMU_CAPTURE_DTYPE, {"accel_range": accel_range, "gyro_range": gyro_range})
+
+        if args.interrupt:
+            imu.init_data_ready_interrupt()
+
+            if simulator is not None:
+                simulator.connect_interrupt(imu.interrupt_pin, simulator.i2c_targets[imu.address])
+
+            stream = IMU14CLICKInterruptStream(imu, recorder=recorder)
+        else:
+            stream = IMU14CLICKStream(imu, recorder=recorder)
+
+    buffer = SampleRingBuffer(int(WINDOW_SECONDS / stream.period))
+
+    # Setup the matplotlib figure and axes. The axes limits are fixed so that only the lines are redrawn.
     fig, (ax1, ax2) = plt.subplots(2, 1)
     fig.subplots_adjust(hspace=0.5)
     fig.suptitle('Pulsar with Mikroe IMU 14 Click Demo', fontsize=16)
     plt.get_current_fig_manager().set_window_title("Sensor Data Visualization")
 
-    # Initialize lists to store the data
-    times = []
-    acc_data = {'x': [], 'y': [], 'z': []}
-    gyro_data = {'x': [], 'y': [], 'z': []}
+    ax1.set_xlim(-WINDOW_SECONDS, 0)
+    ax1.set_ylim(-accel_range, accel_range)
+    ax1.set_title('Accelerometer Data')
+    ax1.set_ylabel('Acceleration (g)')
+
+    ax2.set_xlim(-WINDOW_SECONDS, 0)
+    ax2.set_ylim(-gyro_range, gyro_range)
+    ax2.set_title('Gyroscope Data')
+    ax2.set_ylabel('Angular Velocity (dps)')
+    ax2.set_xlabel('Time (s)')
+
+    lines = [ax.plot([], [], label=label, animated=True)[0] for ax in (ax1, ax2) for label in ('X', 'Y', 'Z')]
+    ax1.legend(loc='upper left')
+    ax2.legend(loc='upper left')
+
+    def update(frame):
+        samples = stream.read_available()
+
+        if len(samples) > 0:
+            times = np.array([sample[0] for sample in samples])
+            values = np.array([sample[1] + sample[2] for sample in samples])
+            buffer.extend(times, values)
 
-    start_time = time.time()
+        times, values = decimate_min_max(*buffer.ordered(), PLOT_BUCKETS)
 
-    keep_running = True
+        # Show the time relative to the newest sample.
+        if len(times) > 0:
+            times = times - times[-1]
+
+        for channel, line in enumerate(lines):
+            line.set_data(times, values[:, channel])
+
+        return lines
 
     def on_key(event):
-        nonlocal keep_running
         if event.key == 'q':
-            keep_running = False
+            plt.close(fig)
 
     fig.canvas.mpl_connect('key_press_event', on_key)
 
-    while keep_running:
-        current_time = time.time() - start_time
-        times.append(current_time)
-
-        # Read data from sensor
-        (acc, gyro) = imu.read()
-
-        # Update accelerometer data
-        acc_data['x'].append(acc[0])
-        acc_data['y'].append(acc[1])
-        acc_data['z'].append(acc[2])
-
-        # Update gyroscope data
-        gyro_data['x'].append(gyro[0])
-        gyro_data['y'].append(gyro[1])
-        gyro_data['z'].append(gyro[2])
-
-        # Plot accelerometer data
-        ax1.cla()
-        ax1.plot(times, acc_data['x'], label='X')
-        ax1.plot(times, acc_data['y'], label='Y')
-        ax1.plot(times, acc_data['z'], label='Z')
-        ax1.legend()
-        ax1.set_title('Accelerometer Data')
-        ax1.set_ylabel('Acceleration (g)')
-
-        # Plot gyroscope data
-        ax2.cla()
-        ax2.plot(times, gyro_data['x'], label='X')
-        ax2.plot(times, gyro_data['y'], label='Y')
-        ax2.plot(times, gyro_data['z'], label='Z')
-        ax2.legend()
-        ax2.set_title('Gyroscope Data')
-        ax2.set_ylabel('Angular Velocity (dps)')
-
-        plt.pause(0.1)
-
-        # Limit the size of the data lists
-        if len(times) > 50:
-            times.pop(0)
-            for data_list in acc_data.values():
-                data_list.pop(0)
-            for data_list in gyro_data.values():
-                data_list.pop(0)
-
-    plt.close(fig)
-
-    pulsar.close()
+    stream.start()
+
+    animation = FuncAnimation(fig, update, interval=1000 / FRAME_RATE, blit=True, cache_frame_data=False)
+    plt.show()
+
+    stream.stop()
+
+    print(f"Samples acquired: {stream.produced_samples}, dropped: {stream.dropped_samples}, failed reads: {stream.failed_reads}")
+
+    if recorder is not None:
+        recorder.close()
+
+    if pulsar is not None:
+        pulsar.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,410 @@
+import time
+import threading
+import collections
+import numpy as np
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i3c.definitions import *
+from IMU14CLICK_definitions import *
+from supernova_blocking_api import SupernovaBlockingApi, NotificationSource
+
+# ==================================================================================
+# region IMU14CLICK over I3C
+# ==================================================================================
+
+# Layout of a FIFO packet: header, accelerometer xyz, gyroscope xyz, temperature and timestamp.
+FIFO_PACKET_DTYPE = np.dtype([("header", "u1"), ("accel", ">i2", (3,)), ("gyro", ">i2", (3,)), ("temp", "i1"), ("timestamp", ">u2")])
+
+# IBI sources that signal samples stored in the FIFO, which is then enabled and drained with every IBI.
+FIFO_IBI_SOURCES = [IMU14CLICK_IBI_SOURCE.FIFO_THRESHOLD, IMU14CLICK_IBI_SOURCE.FIFO_FULL]
+
+# Configuration of the sensor in the target devices table: its dynamic address is assigned with SETDASA
+# and its IBIs are accepted.
+IMU14CLICK_I3C_CONFIGURATION = {
+    "targetType": TargetType.I3C_DEVICE,
+    "IBIRequest": TargetInterruptRequest.ACCEPT_IBI,
+    "CRRequest": ControllerRoleRequest.REJECT_CRR,
+    "daaUseSETDASA": SetdasaConfiguration.USE_SETDASA,
+    "daaUseSETAASA": SetaasaConfiguration.DO_NOT_USE_SETAASA,
+    "daaUseENTDAA": EntdaaConfiguration.DO_NOT_USE_ENTDAA,
+    "ibiTimestampEnable": IBiTimestamp.DISABLE_IBIT,
+    "pendingReadCapability": PendingReadCapability.DISABLE_AUTOMATIC_READ
+}
+
+class IMU14CLICKI3C:
+    """
+    Driver of the Mikroe IMU 14 Click, an ICM-42605, connected to the I3C bus of a Supernova. The sensor
+    signals the new data with In-Band Interrupts, either every sample with the data ready interrupt or
+    every fifo_watermark bytes with the FIFO threshold interrupt, so it is only read when there is data.
+    """
+
+    # Sensor resolutions
+    a_scale = IMU14CLICK_ACCEL_FS.FS_2g.value # 2g full scale
+    g_scale = IMU14CLICK_GYRO_FS.FS_250dps.value # 250 dps full scale
+    a_res = IMU14CLICK_ACCEL_FS_VALUES[a_scale] / IMU14CLICK_ACCEL_RESOLUTION # 2 g full scale
+    g_res = IMU14CLICK_GYRO_FS_VALUES[g_scale] / IMU14CLICK_GYRO_RESOLUTION # 250 dps full scale
+    a_odr = IMU14CLICK_ACCEL_ODR.ODR_1kHz.value #AODR_1000Hz
+    g_odr = IMU14CLICK_GYRO_ODR.ODR_1kHz.value #GODR_1000Hz
+
+    # Calibration biases, in g and dps
+    accel_bias = None
+    gyro_bias = None
+
+    def __init__(self, supernova_blocking_api, dynamic_address = IMU14CLICK_I3C_DYNAMIC_ADDRESS, static_address = IMU14CLICK_I3C_STATIC_ADDRESS):
+        self.supernova = supernova_blocking_api
+        self.dynamic_address = dynamic_address
+        self.static_address = static_address
+
+        self.ibi_source = None
+        self.period = 1.0 / max(IMU14CLICK_ODR_VALUES[self.a_odr], IMU14CLICK_ODR_VALUES[self.g_odr])
+
+    def init_bus(self):
+        """
+        Initializes the I3C bus with the sensor in the target devices table, which assigns its dynamic
+        address with SETDASA.
+        """
+        table = {0: {"staticAddress": self.static_address,
+                     "dynamicAddress": self.dynamic_address,
+                     "bcr": 0x00,
+                     "dcr": 0x00,
+                     "pid": [0x00, 0x00, 0x00, 0x00, 0x00, 0x00],
+                     "configuration": IMU14CLICK_I3C_CONFIGURATION}}
+
+        response = self.supernova.i3c_controller_init_bus(targetDeviceTable=table)
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            print("Error: Could not initialize the I3C bus: ", response)
+            exit(1)
+
+        self.__check_device_connection()
+        print("Device found")
+
+    def __check_device_connection(self):
+        response = self.supernova.i3c_controller_read(targetAddress=self.dynamic_address,
+                                                      mode=TransferMode.I3C_SDR,
+                                                      registerAddress=[WHO_AM_I_register],
+                                                      length=WHO_AM_I_length)
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name or response["payload"][0] != WHO_AM_I_value:
+            print("Error: Device not found")
+            exit(1)
+
+    def __write_registers(self, writes):
+        """
+        Writes a list of (register, value) pairs with all the writes in flight at once, in order. Returns
+        False if any write failed.
+        """
+        futures = [self.supernova.i3c_controller_write.submit(targetAddress=self.dynamic_address,
+                                                              mode=TransferMode.I3C_SDR,
+                                                              registerAddress=[register],
+                                                              data=value if isinstance(value, list) else [value])
+                   for register, value in writes]
+
+        responses = [self.supernova.wait_for_response(future) for future in futures]
+        return all(response is not None and response["result"] == CommonResultCodes.SUCCESS.name for response in responses)
+
+    def init_device(self, ibi_source = IMU14CLICK_IBI_SOURCE.DATA_READY, fifo_watermark = 16 * FIFO_PACKET_LENGTH):
+        """
+        Configures the sensor and routes ibi_source to the In-Band Interrupts. With the FIFO threshold
+        source, the FIFO is enabled and the IBI is raised once it holds fifo_watermark bytes, and with the
+        FIFO full source once it is full. The IBIs are only sent by the sensor after enable_ibi().
+        """
+        self.ibi_source = ibi_source
+        fifo_watermark = min(fifo_watermark, FIFO_MAX_WATERMARK)
+
+        self.disable_ibi()
+
+        writes = [(REG_BANK_SEL_register, IMU14CLICK_REGISTER_BANK.BANK_0.value),
+                  (GYRO_CONFIG0_register, self.g_scale | self.g_odr),
+                  (ACCEL_CONFIG0_register, self.a_scale | self.a_odr),
+                  (GYRO_CONFIG1_register, TEMP_FILT_BW_5Hz)]
+
+        if ibi_source in FIFO_IBI_SOURCES:
+            writes += [(FIFO_CONFIG1_register, FIFO_ACCEL_EN | FIFO_GYRO_EN | FIFO_TEMP_EN | FIFO_WM_GT_TH),
+                       (FIFO_CONFIG2_register, [fifo_watermark & 0xFF, fifo_watermark >> 8]),
+                       (FIFO_CONFIG_register, IMU14CLICK_FIFO_MODE.STREAM_TO_FIFO.value)]
+
+        # Enable the IBIs in the I3C interface and route the interrupt to them.
+        writes += [(REG_BANK_SEL_register, IMU14CLICK_REGISTER_BANK.BANK_1.value),
+                   (INTF_CONFIG4_register, I3C_BUS_MODE),
+                   (INTF_CONFIG6_register, I3C_IBI_EN),
+                   (REG_BANK_SEL_register, IMU14CLICK_REGISTER_BANK.BANK_4.value),
+                   (INT_SOURCE8_register, ibi_source.value),
+                   (REG_BANK_SEL_register, IMU14CLICK_REGISTER_BANK.BANK_0.value)]
+
+        # The sensors are turned on last, since no register must be written during the 200 us after turning them on.
+        writes += [(SIGNAL_PATH_RESET_register, FIFO_FLUSH),
+                   (PWR_MGMT0_register, IMU14CLICK_ACCEL_MODE.LOW_NOISE.value | IMU14CLICK_GYRO_MODE.LOW_NOISE.value)]
+
+        if not self.__write_registers(writes):
+            print("Error: Could not initialize the device")
+            exit(1)
+
+    def enable_ibi(self):
+        response = self.supernova.i3c_direct_enec(targetAddress=self.dynamic_address, events=[ENEC.ENINT])
+        return response is not None and response["result"] == CommonResultCodes.SUCCESS.name
+
+    def disable_ibi(self):
+        response = self.supernova.i3c_direct_disec(targetAddress=self.dynamic_address, events=[DISEC.DISINT])
+        return response is not None and response["result"] == CommonResultCodes.SUCCESS.name
+
+    def _read_data(self):
+        response = self.supernova.i3c_controller_read(targetAddress=self.dynamic_address,
+                                                      mode=TransferMode.I3C_SDR,
+                                                      registerAddress=[TEMP_DATA1_register],
+                                                      length=READ_LENGTH)
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            print("Error: Could not read data: ", response)
+            return None
+
+        # Convert data to signed 16-bit integers
+        return np.frombuffer(bytes(response["payload"][:READ_LENGTH]), dtype=">i2").tolist()
+
+    def _read_fifo_data(self):
+        response = self.supernova.i3c_controller_read(targetAddress=self.dynamic_address,
+                                                      mode=TransferMode.I3C_SDR,
+                                                      registerAddress=[FIFO_COUNTH_register],
+                                                      length=FIFO_COUNT_length)
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            print("Error: Could not read the FIFO count: ", response)
+            return bytes()
+
+        fifo_count = (response["payload"][0] << 8) | response["payload"][1]
+        fifo_count -= fifo_count % FIFO_PACKET_LENGTH
+
+        # Drain the whole FIFO at once, using as many maximum length reads as needed.
+        read_lengths = [min(FIFO_MAX_READ_LENGTH, fifo_count - offset) for offset in range(0, fifo_count, FIFO_MAX_READ_LENGTH)]
+        futures = [self.supernova.i3c_controller_read.submit(targetAddress=self.dynamic_address,
+                                                             mode=TransferMode.I3C_SDR,
+                                                             registerAddress=[FIFO_DATA_register],
+                                                             length=read_length)
+                   for read_length in read_lengths]
+
+        fifo_data = bytearray()
+        for future in futures:
+            response = self.supernova.wait_for_response(future)
+            if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+                print("Error: Could not read the FIFO data: ", response)
+                break
+            fifo_data += bytes(response["payload"])
+
+        return fifo_data
+
+    def _decode_fifo_data(self, fifo_data):
+        """
+        Converts the FIFO content into a list of raw samples [temp, ax, ay, az, gx, gy, gz], skipping the
+        empty FIFO markers and the packets whose sensor data is not valid yet.
+        """
+        packets = np.frombuffer(bytes(fifo_data), dtype=FIFO_PACKET_DTYPE, count=len(fifo_data) // FIFO_PACKET_LENGTH)
+
+        valid = (packets["header"] & FIFO_HEADER_EMPTY) == 0
+        valid &= (packets["accel"][:, 0] != FIFO_INVALID_SAMPLE) & (packets["gyro"][:, 0] != FIFO_INVALID_SAMPLE)
+        packets = packets[valid]
+
+        return np.hstack((packets["temp"][:, None], packets["accel"], packets["gyro"])).tolist()
+
+    def _scale_data(self, imu_data):
+        # Use a zero bias until the sensor is calibrated.
+        accel_bias = self.accel_bias if self.accel_bias is not None else [0, 0, 0]
+        gyro_bias = self.gyro_bias if self.gyro_bias is not None else [0, 0, 0]
+
+        raw_data = np.asarray(imu_data, dtype=np.float64)
+        accel = raw_data[1:4] * self.a_res - accel_bias
+        gyro = raw_data[4:7] * self.g_res - gyro_bias
+
+        return (tuple(accel.tolist()), tuple(gyro.tolist()))
+
+    def read_ibi_samples(self):
+        """
+        Reads the samples signaled by an IBI: the data registers with the data ready interrupt, or the
+        whole FIFO with the FIFO threshold and FIFO full interrupts. Returns a list of raw samples, from the
+        oldest to the newest.
+        """
+        if self.ibi_source in FIFO_IBI_SOURCES:
+            return self._decode_fifo_data(self._read_fifo_data())
+
+        imu_data = self._read_data()
+        return [imu_data] if imu_data is not None else []
+
+class IMU14CLICKIbiStream:
+    """
+    Continuous acquisition of the IMU14CLICK data driven by its In-Band Interrupts. A background thread
+    sleeps on the IBI notification queue of the sensor and reads the data as soon as an IBI arrives, so no
+    read is ever sent before the data is ready. The samples are pushed into a bounded ring buffer and are
+    consumed by iterating over the stream.
+
+    Each sample is a tuple (timestamp, (ax, ay, az), (gx, gy, gz)), where the timestamp is the
+    time.perf_counter() value at which the IBI was handled. The samples read from the FIFO are timestamped
+    back from the IBI at the sensor output data rate. When several IBIs arrive while the data is read, they
+    are handled with a single read, as the data registers only hold the newest sample and the FIFO read
+    takes all the stored ones, and counted in coalesced_ibis.
+    """
+
+    def __init__(self, imu, buffer_size = 4096, recorder = None):
+        self.imu = imu
+        self.recorder = recorder
+        self.period = imu.period
+
+        self.ibi_queue = imu.supernova.notification_queue(NotificationSource.IBI, imu.dynamic_address)
+
+        self.buffer = collections.deque(maxlen=buffer_size)
+        self.buffer_condition = threading.Condition()
+
+        # Statistics
+        self.produced_samples = 0
+        self.dropped_samples = 0
+        self.received_ibis = 0
+        self.coalesced_ibis = 0
+        self.failed_reads = 0
+
+        self.running = False
+        self.consumer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        return self.samples()
+
+    def start(self):
+        # The IBIs received before the stream started are stale.
+        self.ibi_queue.get_all()
+
+        self.running = True
+        self.consumer = threading.Thread(target=self._consume, daemon=True)
+        self.consumer.start()
+
+        if not self.imu.enable_ibi():
+            print("Error: Could not enable the IBIs")
+
+    def stop(self):
+        self.imu.disable_ibi()
+
+        self.running = False
+        if self.consumer is not None:
+            self.consumer.join()
+            self.consumer = None
+
+        with self.buffer_condition:
+            self.buffer_condition.notify_all()
+
+    def _consume(self):
+        while self.running:
+            # The timeout only bounds the time to notice that the stream was stopped.
+            ibi = self.ibi_queue.get(timeout=0.1)
+            if ibi is None:
+                continue
+
+            timestamp = time.perf_counter()
+            coalesced = len(self.ibi_queue.get_all())
+            self.received_ibis += 1 + coalesced
+            self.coalesced_ibis += coalesced
+
+            samples = self.imu.read_ibi_samples()
+            if len(samples) == 0:
+                self.failed_reads += 1
+                continue
+
+            for index, imu_data in enumerate(samples):
+                self._buffer_sample((timestamp - (len(samples) - 1 - index) * self.period,) + self.imu._scale_data(imu_data))
+
+    def _buffer_sample(self, sample):
+        if self.recorder is not None:
+            self.recorder.append(sample)
+
+        with self.buffer_condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped_samples += 1
+            self.buffer.append(sample)
+            self.produced_samples += 1
+            self.buffer_condition.notify()
+
+    def read_available(self):
+        """
+        Returns all the samples stored in the buffer without blocking.
+        """
+        with self.buffer_condition:
+            samples = list(self.buffer)
+            self.buffer.clear()
+        return samples
+
+    def samples(self, timeout = None):
+        """
+        Generator that yields the samples as they are acquired. It finishes when the stream is stopped
+        and the buffer is empty, or when no sample arrives within the timeout.
+        """
+        while True:
+            with self.buffer_condition:
+                self.buffer_condition.wait_for(lambda: len(self.buffer) > 0 or not self.running, timeout=timeout)
+
+                if len(self.buffer) == 0:
+                    return
+
+                sample = self.buffer.popleft()
+
+            yield sample
+
+    def statistics(self):
+        return {"produced_samples": self.produced_samples, "dropped_samples": self.dropped_samples, "received_ibis": self.received_ibis,
+                "coalesced_ibis": self.coalesced_ibis, "failed_reads": self.failed_reads}
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    response = supernova_device.set_i3c_voltage(voltage_mV=3300)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the I3C voltage")
+        exit(1)
+
+    response = supernova_device.i3c_controller_init(pushPullRate=I3cPushPullTransferRate.PUSH_PULL_3_125_MHZ_12_5_DC,
+                                                    i3cOpenDrainRate=I3cOpenDrainTransferRate.OPEN_DRAIN_1_MHZ,
+                                                    i2cOpenDrainRate=I2cTransferRate._400KHz)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the I3C controller")
+        exit(1)
+
+    imu = IMU14CLICKI3C(supernova_device)
+    imu.init_bus()
+
+    # Read the FIFO every 16 samples, signaled by the FIFO threshold IBI.
+    imu.init_device(ibi_source=IMU14CLICK_IBI_SOURCE.FIFO_THRESHOLD, fifo_watermark=16 * FIFO_PACKET_LENGTH)
+
+    with IMU14CLICKIbiStream(imu) as stream:
+        # Acquire for 5 seconds.
+        start_time = time.perf_counter()
+        sample = None
+
+        for sample in stream.samples(timeout=1.0):
+            if sample[0] - start_time > 5.0:
+                break
+
+        if sample is not None:
+            print(f"Last sample: accel {sample[1]} g, gyro {sample[2]} dps")
+
+    print(f"IBI stream statistics: {stream.statistics()}")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,203 @@
+from enum import Enum
+
+WHO_AM_I_register = 0x75
+WHO_AM_I_length = 1
+WHO_AM_I_value = 0x47
+
+PWR_MGMT0_register = 0x4E
+PWR_MGMT0_length = 1
+
+class IMU14CLICK_ACCEL_MODE(Enum):
+    OFF         = 0x00
+    _OFF        = 0x01
+    LOW_POWER   = 0x02
+    LOW_NOISE   = 0x03
+
+class IMU14CLICK_GYRO_MODE(Enum):
+    OFF         = 0x00
+    STANDBY     = 0x04
+    RESERVED    = 0x08
+    LOW_NOISE   = 0x0C
+
+GYRO_CONFIG0_register = 0x4F
+GYRO_CONFIG0_length = 1
+
+class IMU14CLICK_GYRO_FS(Enum):
+    """Gyroscope full scale values"""
+    FS_2000dps  = 0x00
+    FS_1000dps  = 0x20
+    FS_500dps   = 0x40
+    FS_250dps   = 0x60
+    FS_125dps   = 0x80
+    FS_62_5dps  = 0xA0
+    FS_31_25dps = 0xC0
+    FS_15_625dps= 0xE0
+
+# Gyroscope full scale values in dps
+IMU14CLICK_GYRO_FS_VALUES = {
+    IMU14CLICK_GYRO_FS.FS_15_625dps.value: 15.625,
+    IMU14CLICK_GYRO_FS.FS_31_25dps.value:  31.25,
+    IMU14CLICK_GYRO_FS.FS_62_5dps.value:   62.5,
+    IMU14CLICK_GYRO_FS.FS_125dps.value:  125.0,
+    IMU14CLICK_GYRO_FS.FS_250dps.value:  250.0,
+    IMU14CLICK_GYRO_FS.FS_500dps.value:  500.0,
+    IMU14CLICK_GYRO_FS.FS_1000dps.value: 1000.0,
+    IMU14CLICK_GYRO_FS.FS_2000dps.value: 2000.0
+}
+
+class IMU14CLICK_GYRO_ODR(Enum):
+    """Gyroscope output data rates"""
+    ODR_32kHz   = 0x01
+    ODR_16kHz   = 0x02
+    ODR_8kHz    = 0x03
+    ODR_4kHz    = 0x04
+    ODR_2kHz    = 0x05
+    ODR_1kHz    = 0x06
+    ODR_200Hz   = 0x07
+    ODR_100Hz   = 0x08
+    ODR_50Hz    = 0x09
+    ODR_25Hz    = 0x0A
+    ODR_12_5Hz  = 0x0B
+    ODR_500Hz   = 0x0F
+
+# Gyroscope 16 bits symmetric resolution
+IMU14CLICK_GYRO_RESOLUTION = 32768.0
+
+GYRO_CONFIG1_register = 0x51
+GYRO_CONFIG1_length = 1
+TEMP_FILT_BW_5Hz = 0xC0
+
+ACCEL_CONFIG0_register = 0x50
+ACCEL_CONFIG0_length = 1
+
+class IMU14CLICK_ACCEL_FS(Enum):
+    """Accelerometer full scale values"""
+    FS_16g  = 0x00
+    FS_8g   = 0x20
+    FS_4g   = 0x40
+    FS_2g   = 0x60
+
+# Accelerometer full scale values in g
+IMU14CLICK_ACCEL_FS_VALUES = {
+    IMU14CLICK_ACCEL_FS.FS_2g.value:   2.0,
+    IMU14CLICK_ACCEL_FS.FS_4g.value:   4.0,
+    IMU14CLICK_ACCEL_FS.FS_8g.value:   8.0,
+    IMU14CLICK_ACCEL_FS.FS_16g.value:  16.0
+}
+
+class IMU14CLICK_ACCEL_ODR(Enum):
+    """Accelerometer output data rates"""
+    ODR_32kHz   = 0x01
+    ODR_16kHz   = 0x02
+    ODR_8kHz    = 0x03
+    ODR_4kHz    = 0x04
+    ODR_2kHz    = 0x05
+    ODR_1kHz    = 0x06
+    ODR_200Hz   = 0x07
+    ODR_100Hz   = 0x08
+    ODR_50Hz    = 0x09
+    ODR_25Hz    = 0x0A
+    ODR_12_5Hz  = 0x0B
+    ODR_6_25Hz  = 0x0C
+    ODR_3_125Hz = 0x0D
+    ODR_1_5625Hz= 0x0E
+    ODR_500Hz   = 0x0F
+
+# Output data rates in Hz, valid for both the accelerometer and the gyroscope ODR values
+IMU14CLICK_ODR_VALUES = {
+    IMU14CLICK_ACCEL_ODR.ODR_32kHz.value:    32000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_16kHz.value:    16000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_8kHz.value:     8000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_4kHz.value:     4000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_2kHz.value:     2000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_1kHz.value:     1000.0,
+    IMU14CLICK_ACCEL_ODR.ODR_200Hz.value:    200.0,
+    IMU14CLICK_ACCEL_ODR.ODR_100Hz.value:    100.0,
+    IMU14CLICK_ACCEL_ODR.ODR_50Hz.value:     50.0,
+    IMU14CLICK_ACCEL_ODR.ODR_25Hz.value:     25.0,
+    IMU14CLICK_ACCEL_ODR.ODR_12_5Hz.value:   12.5,
+    IMU14CLICK_ACCEL_ODR.ODR_6_25Hz.value:   6.25,
+    IMU14CLICK_ACCEL_ODR.ODR_3_125Hz.value:  3.125,
+    IMU14CLICK_ACCEL_ODR.ODR_1_5625Hz.value: 1.5625,
+    IMU14CLICK_ACCEL_ODR.ODR_500Hz.value:    500.0
+}
+
+# Accelerometer 16 bits symmetric resolution
+IMU14CLICK_ACCEL_RESOLUTION = 32768.0
+
+TEMP_DATA1_register = 0x1D
+READ_LENGTH = 14 # 14 bytes to read all data (6 bytes for accelerometer, 6 bytes for gyroscope, 2 bytes for temperature)
+
+# Temperature in degrees Celsius = raw value / sensitivity + offset
+IMU14CLICK_TEMP_SENSITIVITY = 132.48
+IMU14CLICK_FIFO_TEMP_SENSITIVITY = 2.07 # The FIFO stores an 8-bit temperature value
+IMU14CLICK_TEMP_OFFSET = 25.0
+
+SIGNAL_PATH_RESET_register = 0x4B
+FIFO_FLUSH = 0x02
+
+FIFO_CONFIG_register = 0x16
+FIFO_CONFIG_length = 1
+
+class IMU14CLICK_FIFO_MODE(Enum):
+    """FIFO modes"""
+    BYPASS          = 0x00
+    STREAM_TO_FIFO  = 0x40
+    STOP_ON_FULL    = 0x80
+
+FIFO_CONFIG1_register = 0x5F
+FIFO_CONFIG1_length = 1
+FIFO_ACCEL_EN = 0x01
+FIFO_GYRO_EN = 0x02
+FIFO_TEMP_EN = 0x04
+
+FIFO_COUNTH_register = 0x2E
+FIFO_COUNT_length = 2 # FIFO count in bytes, big endian
+
+FIFO_DATA_register = 0x30
+
+# FIFO packet with accelerometer, gyroscope and temperature data: header (1 byte), accelerometer (6 bytes),
+# gyroscope (6 bytes), temperature (1 byte) and timestamp (2 bytes).
+FIFO_PACKET_LENGTH = 16
+FIFO_HEADER_EMPTY = 0x80 # Header bit set when the FIFO is empty
+FIFO_INVALID_SAMPLE = -32768
+
+# Maximum length of an I2C or I3C transfer, rounded down to a whole number of FIFO packets
+FIFO_MAX_READ_LENGTH = (1024 // FIFO_PACKET_LENGTH) * FIFO_PACKET_LENGTH
+
+# Maximum FIFO watermark, in bytes
+FIFO_MAX_WATERMARK = 2048
+
+FIFO_WM_GT_TH = 0x20 # Trigger the FIFO threshold interrupt on every ODR while the FIFO count is above the watermark
+
+FIFO_CONFIG2_register = 0x60
+FIFO_CONFIG2_length = 2 # FIFO watermark in bytes, little endian, in FIFO_CONFIG2 and FIFO_CONFIG3
+
+# I3C interface, the registers below are not in bank 0
+REG_BANK_SEL_register = 0x76
+
+class IMU14CLICK_REGISTER_BANK(Enum):
+    """Register banks"""
+    BANK_0 = 0x00
+    BANK_1 = 0x01
+    BANK_2 = 0x02
+    BANK_3 = 0x03
+    BANK_4 = 0x04
+
+INTF_CONFIG4_register = 0x7A # Bank 1
+I3C_BUS_MODE = 0x02
+
+INTF_CONFIG6_register = 0x7C # Bank 1
+I3C_IBI_EN = 0x1F # Enable the I3C interface, the IBIs and the IBI payload byte
+
+INT_SOURCE8_register = 0x4F # Bank 4
+
+class IMU14CLICK_IBI_SOURCE(Enum):
+    """Interrupts routed to the I3C In-Band Interrupts"""
+    DATA_READY      = 0x08
+    FIFO_THRESHOLD  = 0x04
+    FIFO_FULL       = 0x02
+
+# Dynamic and static addresses of the sensor in the I3C bus
+IMU14CLICK_I3C_STATIC_ADDRESS = 0x69
+IMU14CLICK_I3C_DYNAMIC_ADDRESS = 0x08
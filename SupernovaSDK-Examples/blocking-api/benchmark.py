@@ -0,0 +1,281 @@
+import argparse
+import collections
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i2c.definitions import *
+from binhosupernova.commands.i3c.definitions import *
+from binhosupernova.commands.spi.definitions import *
+from binhosupernova.commands.uart.definitions import *
+from binhosupernova.supernova import Supernova
+from supernova_blocking_api import SupernovaBlockingApi
+from supernova_simulator import SupernovaSimulator, SimulatedI2cTarget
+
+# ==================================================================================
+# region Benchmark
+# ==================================================================================
+
+# Payload sizes in bytes and number of requests in flight used by default.
+DEFAULT_PAYLOAD_SIZES = [1, 16, 256, 1024]
+DEFAULT_CONCURRENCY_LEVELS = [1, 4, 16]
+
+# Relative change of a metric from the baseline considered a regression.
+DEFAULT_TOLERANCE = 0.10
+
+I2C_TARGET_ADDRESS = 0x50
+I3C_TARGET_ADDRESS = 0x08
+
+def init_interfaces(device, paths):
+    """
+    Initializes the interfaces used by the benchmarked transactions. Returns False if any of them fails.
+    """
+    interfaces = {
+        "i2c_controller_read": lambda: [device.i2c_controller_init(frequency=1000000, pullUpResistorsValue=I2cPullUpResistorsValue.I2C_PULLUP_2_2kOhm)],
+        "spi_controller_transfer": lambda: [device.spi_controller_init(bitOrder=SpiControllerBitOrder.MSB,
+                                                                       mode=SpiControllerMode.MODE_0,
+                                                                       dataWidth=SpiControllerDataWidth._8_BITS_DATA,
+                                                                       chipSelect=SpiControllerChipSelect.CHIP_SELECT_0,
+                                                                       chipSelectPol=SpiControllerChipSelectPolarity.ACTIVE_LOW,
+                                                                       frequency=10000000)],
+        "i3c_controller_write": lambda: [device.set_i3c_voltage(voltage_mV=3300),
+                                         device.i3c_controller_init(pushPullRate=I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ_50_DC,
+                                                                    i3cOpenDrainRate=I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ,
+                                                                    i2cOpenDrainRate=I2cTransferRate._1MHz),
+                                         device.i3c_controller_init_bus()],
+        "uart_send_message": lambda: [device.uart_init(baudrate=UartBaudRate.UART_BAUD_115200,
+                                                       hardwareHandshake=False,
+                                                       parityMode=UartParity.UART_NO_PARITY,
+                                                       dataSize=UartDataSize.UART_8BIT_BYTE,
+                                                       stopBit=UartStopBit.UART_ONE_STOP_BIT)]
+    }
+
+    responses = [device.set_i2c_spi_uart_gpio_voltage(voltage_mV=3300)]
+    for path in paths:
+        responses += interfaces[path]()
+
+    # The interfaces already initialized are valid too.
+    valid_results = [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]
+    return all(response is not None and response["result"] in valid_results for response in responses)
+
+def benchmark_paths(device):
+    """
+    Returns the benchmarked transactions. Each one is a function that submits a request with a payload of
+    the given size and returns its Future.
+    """
+    return {
+        "i2c_controller_read": lambda size: device.i2c_controller_read.submit(targetAddress=I2C_TARGET_ADDRESS,
+                                                                              requestDataLength=size,
+                                                                              registerAddress=[0x00]),
+        "spi_controller_transfer": lambda size: device.spi_controller_transfer.submit(transferLength=size,
+                                                                                      payload=[i & 0xFF for i in range(size)]),
+        "i3c_controller_write": lambda size: device.i3c_controller_write.submit(targetAddress=I3C_TARGET_ADDRESS,
+                                                                               mode=TransferMode.I3C_SDR,
+                                                                               registerAddress=[0x00],
+                                                                               data=[i & 0xFF for i in range(size)]),
+        "uart_send_message": lambda size: device.uart_send_message.submit(data=[i & 0xFF for i in range(size)])
+    }
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def run_case(device, submit, payload_size, concurrency, requests):
+    """
+    Sends the requests keeping concurrency requests in flight, and returns the latency distribution,
+    throughput, error count and CPU usage of the host process.
+    """
+    latencies = []
+    errors = 0
+    in_flight = collections.deque()
+
+    def complete(future, send_time):
+        nonlocal errors
+        response = device.wait_for_response(future)
+        latencies.append(time.perf_counter() - send_time)
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            errors += 1
+
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+
+    for _ in range(requests):
+        if len(in_flight) == concurrency:
+            complete(*in_flight.popleft())
+
+        send_time = time.perf_counter()
+        in_flight.append((submit(payload_size), send_time))
+
+    while len(in_flight) > 0:
+        complete(*in_flight.popleft())
+
+    elapsed_time = time.perf_counter() - start_time
+    cpu_time = time.process_time() - start_cpu_time
+
+    # The latency of a request is measured when it is collected, so it includes the time spent waiting
+    # for the older requests when several requests are in flight.
+    latencies.sort()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_requests_per_second": requests / elapsed_time,
+        "throughput_bytes_per_second": requests * payload_size / elapsed_time,
+        "latency_ms": {
+            "mean": statistics.mean(latencies) * 1000,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000
+        },
+        "cpu_percent": 100 * cpu_time / elapsed_time
+    }
+
+def run_benchmark(device, paths, payload_sizes, concurrency_levels, requests):
+    results = []
+    available_paths = benchmark_paths(device)
+
+    for path in paths:
+        for payload_size in payload_sizes:
+            for concurrency in concurrency_levels:
+                result = run_case(device, available_paths[path], payload_size, concurrency, requests)
+                results.append(dict({"path": path, "payload_size": payload_size, "concurrency": concurrency}, **result))
+
+                print(f"{path:<24} {payload_size:>5} B  x{concurrency:<3} "
+                      f"{result['throughput_requests_per_second']:>9.0f} req/s  "
+                      f"p50 {result['latency_ms']['p50']:>7.3f} ms  p95 {result['latency_ms']['p95']:>7.3f} ms  "
+                      f"p99 {result['latency_ms']['p99']:>7.3f} ms  CPU {result['cpu_percent']:>5.1f}%  errors {result['errors']}")
+
+    return results
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Returns the list of regressions: the cases whose throughput decreased or whose p99 latency increased
+    more than the tolerance with respect to the same case in the baseline.
+    """
+    baseline_cases = {(case["path"], case["payload_size"], case["concurrency"]): case for case in baseline["results"]}
+    regressions = []
+
+    for case in results:
+        reference = baseline_cases.get((case["path"], case["payload_size"], case["concurrency"]))
+        if reference is None:
+            continue
+
+        if case["throughput_requests_per_second"] < reference["throughput_requests_per_second"] * (1 - tolerance):
+            regressions.append(f"{case['path']} {case['payload_size']} B x{case['concurrency']}: throughput "
+                               f"{reference['throughput_requests_per_second']:.0f} -> {case['throughput_requests_per_second']:.0f} req/s")
+
+        if case["latency_ms"]["p99"] > reference["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(f"{case['path']} {case['payload_size']} B x{case['concurrency']}: p99 latency "
+                               f"{reference['latency_ms']['p99']:.3f} -> {case['latency_ms']['p99']:.3f} ms")
+
+    return regressions
+
+def run_construction_benchmark(device_factory, count):
+    """
+    Measures the time to import the blocking API module, in a new interpreter, the time to create count
+    wrapper instances and the time of the first access to a wrapped method, when it is bound.
+    """
+    import_time = float(subprocess.check_output([sys.executable, "-c",
+        "import time; start = time.perf_counter(); import supernova_blocking_api; print(time.perf_counter() - start)"]))
+
+    devices = [device_factory() for _ in range(count)]
+
+    start_time = time.perf_counter()
+    wrappers = [SupernovaBlockingApi(device=device) for device in devices]
+    construction_time = (time.perf_counter() - start_time) / count
+
+    start_time = time.perf_counter()
+    for wrapper in wrappers:
+        wrapper.i2c_controller_read
+    first_access_time = (time.perf_counter() - start_time) / count
+
+    return {
+        "instances": count,
+        "import_ms": import_time * 1000,
+        "construction_us": construction_time * 1e6,
+        "first_method_access_us": first_access_time * 1e6
+    }
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    paths = list(benchmark_paths(None).keys())
+
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmark of the Supernova blocking API")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova instead of the hardware")
+    parser.add_argument("--latency", type=float, default=0.0005, help="response latency of the simulator in seconds")
+    parser.add_argument("--paths", nargs="+", choices=paths, default=paths, help="transactions to benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_PAYLOAD_SIZES, help="payload sizes in bytes")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY_LEVELS, help="number of requests in flight")
+    parser.add_argument("--requests", type=int, default=500, help="requests sent per case")
+    parser.add_argument("--output", help="JSON file where the results are saved")
+    parser.add_argument("--baseline", help="JSON file with previous results to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="relative change considered a regression")
+    parser.add_argument("--construction", type=int, metavar="INSTANCES", help="only measure the import time and the creation of this number of wrappers")
+    args = parser.parse_args()
+
+    if args.construction is not None:
+        result = run_construction_benchmark(SupernovaSimulator if args.simulate else Supernova, args.construction)
+        print(f"Import: {result['import_ms']:.1f} ms, construction: {result['construction_us']:.1f} us per instance, "
+              f"first method access: {result['first_method_access_us']:.1f} us")
+        return
+
+    if args.simulate:
+        simulator = SupernovaSimulator(latency=args.latency)
+        simulator.add_i2c_target(I2C_TARGET_ADDRESS, SimulatedI2cTarget())
+        supernova_device = SupernovaBlockingApi(device=simulator)
+    else:
+        supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    if not init_interfaces(supernova_device, args.paths):
+        print("Error initializing the interfaces")
+        exit(1)
+
+    results = run_benchmark(supernova_device, args.paths, args.sizes, args.concurrency, args.requests)
+
+    supernova_device.close()
+
+    report = {
+        "metadata": {
+            "device": "simulator" if args.simulate else "Supernova",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "results": results
+    }
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            regressions = compare_with_baseline(results, json.load(file), args.tolerance)
+
+        if len(regressions) > 0:
+            print("Regressions with respect to the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            exit(1)
+
+        print("No regressions with respect to the baseline")
+
+if __name__ == "__main__":
+    main()
+
+# endregion
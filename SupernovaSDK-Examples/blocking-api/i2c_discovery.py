@@ -0,0 +1,177 @@
+import json
+import threading
+import collections
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i2c.definitions import *
+from device_pool import SupernovaDevicePool
+
+# ==================================================================================
+# region I2C discovery
+# ==================================================================================
+
+# An I2C device is identified by the value of one of its registers, usually named WHO_AM_I or CHIP_ID.
+# The addresses are the ones the device can take, only the targets found at them are checked.
+I2cFingerprint = collections.namedtuple("I2cFingerprint", ["name", "addresses", "register", "value"])
+
+I2C_FINGERPRINTS = [
+    I2cFingerprint("ICM42605", [0x68, 0x69], 0x75, 0x47),
+    I2cFingerprint("MPU6050", [0x68, 0x69], 0x75, 0x68),
+    I2cFingerprint("BME280", [0x76, 0x77], 0xD0, 0x60),
+    I2cFingerprint("BMP280", [0x76, 0x77], 0xD0, 0x58),
+    I2cFingerprint("LIS3DH", [0x18, 0x19], 0x0F, 0x33)
+]
+
+def submit_identity_reads(device, addresses, fingerprints = I2C_FINGERPRINTS):
+    """
+    Sends the reads of the identity registers of the targets found at the addresses, all of them in flight
+    at once. The fingerprints that share an address and a register, like the ICM42605 and the MPU6050,
+    share the same read. Returns the Futures of the reads, indexed by (address, register).
+    """
+    reads = dict()
+
+    for address in addresses:
+        for fingerprint in fingerprints:
+            if address in fingerprint.addresses and (address, fingerprint.register) not in reads:
+                reads[(address, fingerprint.register)] = device.i2c_controller_read.submit(targetAddress=address,
+                                                                                           requestDataLength=1,
+                                                                                           registerAddress=[fingerprint.register])
+    return reads
+
+def match_fingerprints(device, addresses, reads, fingerprints = I2C_FINGERPRINTS):
+    """
+    Waits for the identity reads sent with submit_identity_reads() and returns a dictionary with the name of
+    the device found at each address, or None if it is unknown.
+    """
+    values = dict()
+
+    for key, future in reads.items():
+        response = device.wait_for_response(future)
+        if response is not None and response["result"] == CommonResultCodes.SUCCESS.name:
+            values[key] = response["payload"][0]
+
+    devices = {address: None for address in addresses}
+
+    for address in addresses:
+        for fingerprint in fingerprints:
+            if address in fingerprint.addresses and values.get((address, fingerprint.register)) == fingerprint.value:
+                devices[address] = fingerprint.name
+                break
+
+    return devices
+
+def identify_i2c_devices(device, fingerprints = I2C_FINGERPRINTS):
+    """
+    Scans the I2C bus of a device and identifies the targets found. The identity registers of all the
+    targets are read at once, with one request in flight per address and identity register, instead of
+    probing one target after the other.
+
+    Returns a dictionary with the name of the device found at each address, or None if it is unknown,
+    or None if the bus could not be scanned.
+    """
+    response = device.i2c_controller_scan_bus()
+
+    if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error: Could not scan the I2C bus: ", response)
+        return None
+
+    addresses = response["detected_7_bit_addresses"]
+    return match_fingerprints(device, addresses, submit_identity_reads(device, addresses, fingerprints), fingerprints)
+
+class I2cInventory:
+    """
+    Identifies the I2C devices connected to all the devices of a SupernovaDevicePool at the same time.
+    The inventory of every host adapter can be cached by its serial number, so the fixtures already known
+    are not scanned again.
+    """
+
+    # Default file where the inventories are stored when the cache is enabled.
+    cache_file = "i2c_inventory.json"
+
+    def __init__(self, pool, fingerprints = I2C_FINGERPRINTS, voltage_mV = 3300, frequency = 1000000, cache_file = None):
+        self.pool = pool
+        self.cache_file = cache_file if cache_file is not None else self.cache_file
+        self.fingerprints = fingerprints
+        self.voltage_mV = voltage_mV
+        self.frequency = frequency
+        self.cache_lock = threading.Lock()
+
+    def __load_cache(self):
+        try:
+            with open(self.cache_file, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return dict()
+
+    def __save_cache(self, inventories):
+        with self.cache_lock:
+            cache = self.__load_cache()
+            cache.update(inventories)
+
+            try:
+                with open(self.cache_file, "w") as file:
+                    json.dump(cache, file, indent=4)
+            except OSError as error:
+                print("Warning: Could not save the I2C inventory: ", error)
+
+    def __inventory(self, device):
+        response = device.set_i2c_spi_uart_gpio_voltage(voltage_mV=self.voltage_mV)
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            print("Error: Could not set the I2C voltage: ", response)
+            return None
+
+        response = device.i2c_controller_init(frequency=self.frequency, pullUpResistorsValue=I2cPullUpResistorsValue.I2C_PULLUP_2_2kOhm)
+
+        if response is None or response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+            print("Error: Could not initialize the I2C bus: ", response)
+            return None
+
+        return identify_i2c_devices(device, self.fingerprints)
+
+    def run(self, use_cache = False):
+        """
+        Returns the I2C devices found on every host adapter, indexed by its serial number, as a dictionary
+        of the device names indexed by address.
+
+        By default, every host adapter is scanned. When use_cache is True, the host adapters found in the
+        cache file are not scanned, and the inventories of the others are added to it. The cache is never
+        refreshed, so it must be deleted when the devices connected to a fixture change.
+        """
+        cache = self.__load_cache() if use_cache else dict()
+
+        # JSON keys are strings, the addresses are converted back to integers.
+        inventories = {serial_number: {int(address): name for address, name in cache[serial_number].items()}
+                       for serial_number in self.pool.serial_numbers() if serial_number in cache}
+
+        futures = {serial_number: self.pool.submit(serial_number, self.__inventory)
+                   for serial_number in self.pool.serial_numbers() if serial_number not in inventories}
+
+        scanned = {serial_number: future.result() for serial_number, future in futures.items()}
+        if use_cache:
+            self.__save_cache({serial_number: inventory for serial_number, inventory in scanned.items() if inventory is not None})
+
+        inventories.update(scanned)
+        return inventories
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    with SupernovaDevicePool() as pool:
+        inventories = I2cInventory(pool).run()
+
+        for serial_number, inventory in inventories.items():
+            if inventory is None:
+                print(f"{serial_number}: I2C scan failed")
+                continue
+
+            devices = ", ".join(f"0x{address:02X} {name or 'unknown'}" for address, name in inventory.items())
+            print(f"{serial_number}: {devices or 'no I2C devices found'}")
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,285 @@
+import threading
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i3c.definitions import *
+from supernova_blocking_api import SupernovaBlockingApi, NotificationSource
+
+# ==================================================================================
+# region I3C target memory mirror
+# ==================================================================================
+
+# Dirty ranges separated by up to this number of clean bytes are written back in one request, as sending a
+# few unchanged bytes costs less than another USB transfer.
+DEFAULT_COALESCE_GAP = 16
+
+# Command of the notifications sent by the Supernova acting as I3C target when the controller accesses it.
+BUS_EVENT_NOTIFICATION = "I3C TARGET BUS EVENT NOTIFICATION"
+
+class I3cTargetMemoryMirror:
+    """
+    Host-side copy of the memory of a Supernova acting as I3C target.
+
+    The mirror is modified with write() or by index and slice assignment, e.g. mirror[0x10:0x14] = b"\\x01\\x02\\x03\\x04",
+    and the modified ranges are tracked, so flush() only writes back the bytes that changed. Ranges close to
+    each other are coalesced into a single request, and every request is limited to the maximum transfer
+    length, with all the requests of a flush in flight at the same time.
+
+    The writes of the I3C controller are applied to the mirror from the bus event notifications, so it is
+    not necessary to read the memory back to see them. refresh() reads the memory from the adapter, for
+    instance after the mirror is created, without overwriting the bytes that are not written back yet.
+    """
+
+    def __init__(self, blocking_api, size = I3C_TARGET_MEMORY_SIZE, coalesce_gap = DEFAULT_COALESCE_GAP,
+                 max_transfer_length = I3C_TARGET_MEMORY_SIZE):
+        self.blocking_api = blocking_api
+        self.size = size
+        self.coalesce_gap = coalesce_gap
+        self.max_transfer_length = min(max_transfer_length, I3C_TARGET_MEMORY_SIZE)
+
+        self.data = bytearray(size)
+        self.dirty_ranges = []
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.write_requests = 0
+        self.written_bytes = 0
+        self.read_requests = 0
+        self.controller_writes = 0
+
+        self.blocking_api.notifications.set_listener(NotificationSource.OTHER, BUS_EVENT_NOTIFICATION, self.__on_bus_event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    # Dirty ranges ------------------------------------------------------------------
+
+    def __mark_dirty(self, start, end):
+        # The ranges are kept sorted and separated by more than coalesce_gap bytes.
+        ranges = []
+        for range_start, range_end in self.dirty_ranges:
+            if range_end + self.coalesce_gap < start or end + self.coalesce_gap < range_start:
+                ranges.append((range_start, range_end))
+            else:
+                start, end = min(start, range_start), max(end, range_end)
+
+        ranges.append((start, end))
+        self.dirty_ranges = sorted(ranges)
+
+    def __clear_dirty(self, start, end):
+        ranges = []
+        for range_start, range_end in self.dirty_ranges:
+            if range_start < start:
+                ranges.append((range_start, min(range_end, start)))
+            if range_end > end:
+                ranges.append((max(range_start, end), range_end))
+        self.dirty_ranges = ranges
+
+    def __clean_spans(self, start, end):
+        """
+        Returns the spans between start and end that are not dirty.
+        """
+        spans = []
+        for range_start, range_end in self.dirty_ranges:
+            if range_start > start:
+                spans.append((start, min(range_start, end)))
+            start = max(start, range_end)
+        if start < end:
+            spans.append((start, end))
+        return [(span_start, span_end) for span_start, span_end in spans if span_start < span_end]
+
+    def is_dirty(self):
+        with self.lock:
+            return len(self.dirty_ranges) > 0
+
+    # Host access -------------------------------------------------------------------
+
+    @property
+    def view(self):
+        """
+        Read-only memoryview of the mirror. The mirror is modified with write() or by assignment, so the
+        changes are tracked.
+        """
+        return memoryview(self.data).toreadonly()
+
+    def __check_range(self, address, length):
+        if address < 0 or address + length > self.size:
+            raise IndexError(f"The range 0x{address:04X}-0x{address + length:04X} is out of the target memory")
+
+    def read(self, address, length):
+        self.__check_range(address, length)
+        with self.lock:
+            return bytes(self.data[address:address + length])
+
+    def write(self, address, data):
+        data = bytes(data)
+        self.__check_range(address, len(data))
+
+        with self.lock:
+            if self.data[address:address + len(data)] == data:
+                return
+            self.data[address:address + len(data)] = data
+            self.__mark_dirty(address, address + len(data))
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.data[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step != 1 or len(value) != stop - start:
+                raise ValueError("Only contiguous slices of the same length can be assigned")
+            self.write(start, value)
+        else:
+            self.write(key % self.size if key < 0 else key, [value])
+
+    # Adapter access ----------------------------------------------------------------
+
+    def __chunks(self, start, end):
+        return [(address, min(self.max_transfer_length, end - address)) for address in range(start, end, self.max_transfer_length)]
+
+    def flush(self):
+        """
+        Writes the dirty ranges back to the target memory. Returns False if any request failed, the ranges
+        of the failed requests are kept dirty to be written by the next flush.
+        """
+        with self.lock:
+            requests = [(address, bytes(self.data[address:address + length]))
+                        for start, end in self.dirty_ranges for address, length in self.__chunks(start, end)]
+            self.dirty_ranges = []
+
+        futures = [(address, data, self.blocking_api.i3c_target_write_memory.submit(memoryAddress=address, data=list(data)))
+                   for address, data in requests]
+
+        success = True
+        for address, data, future in futures:
+            response = self.blocking_api.wait_for_response(future)
+            self.write_requests += 1
+
+            if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+                print("Error: Could not write the I3C target memory: ", response)
+                with self.lock:
+                    self.__mark_dirty(address, address + len(data))
+                success = False
+            else:
+                self.written_bytes += len(data)
+
+        return success
+
+    def refresh(self, address = 0, length = None):
+        """
+        Reads the given range of the target memory into the mirror, the whole memory by default. The dirty
+        bytes keep the value of the mirror. Returns False if any request failed.
+        """
+        length = self.size - address if length is None else length
+        self.__check_range(address, length)
+
+        futures = [(chunk_address, self.blocking_api.i3c_target_read_memory.submit(memoryAddress=chunk_address, length=chunk_length))
+                   for chunk_address, chunk_length in self.__chunks(address, address + length)]
+
+        success = True
+        for chunk_address, future in futures:
+            response = self.blocking_api.wait_for_response(future)
+            self.read_requests += 1
+
+            if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+                print("Error: Could not read the I3C target memory: ", response)
+                success = False
+                continue
+
+            with self.lock:
+                self.__apply(chunk_address, response["payload"], keep_dirty=True)
+
+        return success
+
+    def __apply(self, address, payload, keep_dirty):
+        end = min(self.size, address + len(payload))
+
+        if keep_dirty:
+            for start, span_end in self.__clean_spans(address, end):
+                self.data[start:span_end] = bytes(payload[start - address:span_end - address])
+        else:
+            self.data[address:end] = bytes(payload[:end - address])
+            self.__clear_dirty(address, end)
+
+    def __on_bus_event(self, message):
+        # The controller writes are newer than the changes of the mirror not written back yet.
+        if message.get("event") == I3cTargetBusEvent_t.I3C_WRITE_TRANSFER_EVENT.name:
+            with self.lock:
+                self.__apply(message["memory_address"], message["payload"], keep_dirty=False)
+                self.controller_writes += 1
+
+    def statistics(self):
+        return {"write_requests": self.write_requests, "written_bytes": self.written_bytes,
+                "read_requests": self.read_requests, "controller_writes": self.controller_writes}
+
+    def close(self):
+        """
+        Writes back the dirty ranges and gives the bus event notifications back to the notification queue.
+        """
+        self.flush()
+        self.blocking_api.notifications.set_listener(NotificationSource.OTHER, BUS_EVENT_NOTIFICATION, None)
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    response = supernova_device.set_i3c_voltage(voltage_mV=3300)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the I3C voltage")
+        exit(1)
+
+    bcr = I3cBcrDeviceRoleBits_t.I3C_TARGET.value | \
+          I3cBcrAdvancedCapabilitiesBit_t.NOT_SUPPORTED.value | \
+          I3cBcrVirtualSupportBit_t.NOT_SUPPORTED.value | \
+          I3cBcrOfflineCapBit_t.OFFLINE_UNCAPABLE.value | \
+          I3cBcrIbiPayloadBit_t.IBI_WITHOUT_PAYLOAD.value | \
+          I3cBcrIbiCapableBit_t.NOT_IBI_CAPABLE.value | \
+          I3cBcrMaxDataSpeedLimitBit_t.NO_DATA_SPEED_LIMIT.value
+
+    response = supernova_device.i3c_target_init(memoryLayout=I3cTargetMemoryLayout_t.MEMORY_1_BYTE_X_1024_REGS,
+                                                pid=[0x01, 0x02, 0x03, 0x04, 0x05, 0x06],
+                                                bcr=bcr,
+                                                dcr=I3cTargetDcr_t.I3C_TARGET_MEMORY,
+                                                staticAddress=0x21)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the I3C target")
+        exit(1)
+
+    with I3cTargetMemoryMirror(supernova_device) as mirror:
+        mirror.refresh()
+
+        # Emulate a register map: an identification block, a status register and a counter. The three
+        # registers are written back with a single request.
+        mirror[0x00:0x04] = b"SNVA"
+        mirror[0x08] = 0x01
+        mirror[0x0C:0x0E] = (1234).to_bytes(2, "little")
+        mirror.flush()
+
+        print(f"Registers: {mirror.view[0x00:0x10].hex(' ')}")
+        print(f"Mirror statistics: {mirror.statistics()}")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
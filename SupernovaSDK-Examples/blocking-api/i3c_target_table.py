@@ -0,0 +1,227 @@
+import threading
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i3c.definitions import *
+from supernova_blocking_api import SupernovaBlockingApi, NotificationSource
+
+# Command of the notifications sent by the Supernova when a target joins the bus with a hot-join request.
+HOT_JOIN_NOTIFICATION = "I3C CONTROLLER HJ REQUEST NOTIFICATION"
+
+# ==================================================================================
+# region I3C target table
+# ==================================================================================
+
+class I3cTargetTable:
+    """
+    Client-side copy of the target devices table of the I3C controller, indexed by dynamic address, static
+    address and PID, so the targets are looked up without asking the host adapter.
+
+    Once attached to a blocking API instance, the table follows the methods that change the addresses of
+    the targets: the responses of SETNEWDA and SETDASA update the table in place, while initializing or
+    resetting the bus, ENTDAA, SETAASA and RSTDAA invalidate it, since their responses do not say which
+    addresses were assigned. The hot-join notifications invalidate it too, as they lack the MWL, MRL and
+    configuration of the new target. An invalid table is fetched again from the host adapter with the first lookup.
+    """
+
+    # Methods of the blocking API whose successful response invalidates the table.
+    INVALIDATING_METHODS = ["i3c_controller_init_bus", "i3c_controller_reset_bus", "i3c_controller_set_target_device_configuration",
+                            "i3c_entdaa", "i3c_setaasa", "i3c_rstdaa"]
+
+    def __init__(self, blocking_api):
+        self.blocking_api = blocking_api
+        self.lock = threading.Lock()
+        self.valid = False
+
+        # Incremented when the table is invalidated, a table fetched meanwhile is not marked as valid.
+        self.generation = 0
+
+        self.by_dynamic_address = dict()
+        self.by_static_address = dict()
+        self.by_pid = dict()
+
+        # Statistics
+        self.syncs = 0
+        self.incremental_updates = 0
+
+        self.get_target_devices_table = blocking_api.i3c_controller_get_target_devices_table
+        self.__attach()
+
+    def __attach(self):
+        for method_name in self.INVALIDATING_METHODS:
+            self.__wrap(method_name, lambda response, **kwargs: self.__invalidate())
+
+        self.__wrap("i3c_setnewda", lambda response, oldAddress, newAddress: self.__move(self.by_dynamic_address.get(oldAddress), newAddress))
+        self.__wrap("i3c_setdasa", lambda response, staticAddress, dynamicAddress: self.__move(self.by_static_address.get(staticAddress), dynamicAddress))
+        self.__wrap("i3c_controller_get_target_devices_table", lambda response: self.__load(response["table"], self.generation))
+
+        self.blocking_api.notifications.set_listener(NotificationSource.OTHER, HOT_JOIN_NOTIFICATION, self.__on_hot_join)
+
+    def __wrap(self, method_name, update):
+        """
+        Replaces a method of the blocking API instance, and its submit(), with one that updates the table
+        when the response is successful. The arguments of the method are given to update by keyword.
+        """
+        method = getattr(self.blocking_api, method_name)
+
+        def submit(**kwargs):
+            future = method.submit(**kwargs)
+            future.add_done_callback(lambda future: self.__update(future, update, kwargs))
+            return future
+
+        def wrapper(**kwargs):
+            return self.blocking_api.wait_for_response(submit(**kwargs))
+
+        wrapper.submit = submit
+        setattr(self.blocking_api, method_name, wrapper)
+
+    def __update(self, future, update, kwargs):
+        response = None if future.cancelled() else future.result()
+
+        if response is not None and response.get("result") == CommonResultCodes.SUCCESS.name:
+            with self.lock:
+                update(response, **kwargs)
+
+    def __load(self, table, generation):
+        self.by_dynamic_address = {entry["dynamic_address"]: entry for entry in table}
+        self.by_static_address = {entry["static_address"]: entry for entry in table if entry["static_address"] != 0}
+        self.by_pid = {tuple(entry["pid"]): entry for entry in table}
+        self.valid = generation == self.generation
+        self.syncs += 1
+
+    def __move(self, entry, new_address):
+        # A target that is not in the table can only be found fetching the table again.
+        if entry is None or not self.valid:
+            self.__invalidate()
+            return
+
+        self.by_dynamic_address.pop(entry["dynamic_address"], None)
+        entry["dynamic_address"] = new_address
+        self.by_dynamic_address[new_address] = entry
+        self.incremental_updates += 1
+
+    def __invalidate(self):
+        self.valid = False
+        self.generation += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.__invalidate()
+
+    def sync(self):
+        """
+        Fetches the table from the host adapter. Returns False if it could not be fetched.
+        """
+        generation = self.generation
+        response = self.get_target_devices_table()
+
+        if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+            print("Error: Could not get the I3C target devices table: ", response)
+            return False
+
+        with self.lock:
+            self.__load(response["table"], generation)
+
+        return True
+
+    def __ensure_valid(self):
+        if not self.valid:
+            self.sync()
+
+    def __on_hot_join(self, notification):
+        # Called from the SDK receiving thread, the table is only fetched again with the next lookup.
+        self.invalidate()
+
+    def close(self):
+        """
+        Gives the hot-join notifications back to the notification queue.
+        """
+        self.blocking_api.notifications.set_listener(NotificationSource.OTHER, HOT_JOIN_NOTIFICATION, None)
+
+    # Lookups -----------------------------------------------------------------------
+
+    def target(self, dynamic_address):
+        """
+        Returns the entry of the target with the dynamic address, or None if there is no such target.
+        """
+        self.__ensure_valid()
+        with self.lock:
+            return self.by_dynamic_address.get(dynamic_address)
+
+    def find_by_static_address(self, static_address):
+        self.__ensure_valid()
+        with self.lock:
+            return self.by_static_address.get(static_address)
+
+    def find_by_pid(self, pid):
+        self.__ensure_valid()
+        with self.lock:
+            return self.by_pid.get(tuple(pid))
+
+    def dynamic_addresses(self):
+        self.__ensure_valid()
+        with self.lock:
+            return sorted(self.by_dynamic_address.keys())
+
+    def __len__(self):
+        self.__ensure_valid()
+        with self.lock:
+            return len(self.by_dynamic_address)
+
+    def __iter__(self):
+        self.__ensure_valid()
+        with self.lock:
+            return iter(list(self.by_dynamic_address.values()))
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    targets = I3cTargetTable(supernova_device)
+
+    response = supernova_device.set_i3c_voltage(voltage_mV=3300)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the I3C voltage")
+        exit(1)
+
+    response = supernova_device.i3c_controller_init(pushPullRate=I3cPushPullTransferRate.PUSH_PULL_3_75_MHZ,
+                                                    i3cOpenDrainRate=I3cOpenDrainTransferRate.OPEN_DRAIN_1_MHZ,
+                                                    i2cOpenDrainRate=I2cTransferRate._100KHz)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the I3C controller")
+        exit(1)
+
+    # Initializing the bus invalidates the table, it is fetched once with the first lookup.
+    supernova_device.i3c_controller_init_bus()
+
+    for entry in targets:
+        print(f"Target 0x{entry['dynamic_address']:02X}: PID {entry['pid']}, BCR 0x{entry['bcr']:02X}, DCR 0x{entry['dcr']:02X}")
+
+    # Move the first target to a new dynamic address, the table is updated without fetching it again.
+    addresses = targets.dynamic_addresses()
+
+    if len(addresses) > 0:
+        supernova_device.i3c_setnewda(oldAddress=addresses[0], newAddress=0x30)
+        print(f"Target 0x30: {targets.target(0x30)}")
+
+    print(f"Table fetched {targets.syncs} times, updated in place {targets.incremental_updates} times")
+
+    targets.close()
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
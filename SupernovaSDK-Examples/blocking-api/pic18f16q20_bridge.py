@@ -0,0 +1,362 @@
+import time
+import collections
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.i3c.definitions import *
+from supernova_blocking_api import SupernovaBlockingApi, NotificationSource
+
+# ==================================================================================
+# region PIC18F16Q20 translator bridge
+# ==================================================================================
+
+# Dynamic address assigned to the translator when it hot-joins the bus.
+TRANSLATOR_DYNAMIC_ADDRESS = 0x08
+
+# Commands of the translator firmware, in the first byte of every I3C private write. The chip select of the
+# SPI commands is given in the 3 lowest bits, 0 selects the I2C bus instead.
+I2C_WRITE_COMMAND = 0x40
+I2C_READ_COMMAND = 0x20
+SPI_WRITE_COMMAND = 0x40
+SPI_READ_COMMAND = 0x20
+SPI_WRITE_READ_COMMAND = 0x60 # Always on the chip select 1
+SPI_CHIP_SELECT_1 = 0x01
+
+# The translator stores at most 255 bytes per command, and sends the data read downstream in an IBI whose
+# payload starts with the mandatory data byte 0x00, so each read is limited by the IBI payload length.
+MAX_COMMAND_DATA_LENGTH = 255
+MAX_READ_LENGTH = MAX_I3C_IBI_PAYLOAD_LENGTH - 1
+READ_DATA_MDB = 0x00
+
+# Time the translator is given to execute a command before a not acknowledged private write is an error.
+DEFAULT_BUSY_TIMEOUT = 0.05
+
+# Time waited before sending again a not acknowledged private write, multiplied by 2 on every retry.
+DEFAULT_BUSY_BACKOFF = 0.0001
+
+class BridgeTransaction:
+    """
+    Batch of downstream I2C and SPI operations executed through the translator. The operations are turned
+    into as few translator commands as its protocol allows: an I2C register write is a single command,
+    consecutive I2C writes to the consecutive registers of a target are merged when merge_i2c_writes is
+    True, and an SPI transfer writes and then reads with one command while the chip select is held.
+
+    The translator executes one command per private write and only acknowledges the next one once it is
+    done, so the commands are sent in order, each one as soon as the previous one is acknowledged. The data
+    of the reads is not waited for before sending the next commands: their IBIs are collected at the end.
+    """
+
+    def __init__(self, bridge, merge_i2c_writes = False):
+        self.bridge = bridge
+        self.merge_i2c_writes = merge_i2c_writes
+
+        # Translator commands, as (data, read_length, indexes of the operations), and the next register of the
+        # last I2C write, to merge the following one.
+        self.commands = []
+        self.operations = 0
+        self.last_i2c_write = None
+
+    def __add_command(self, data, read_length = 0):
+        if len(data) - 1 > MAX_COMMAND_DATA_LENGTH:
+            raise ValueError(f"The translator commands are limited to {MAX_COMMAND_DATA_LENGTH} bytes of data")
+        self.commands.append((list(data), read_length, [self.operations]))
+
+    def __add_reads(self, command, length):
+        for offset in range(0, length, MAX_READ_LENGTH):
+            chunk_length = min(MAX_READ_LENGTH, length - offset)
+            self.__add_command(command + [chunk_length], chunk_length)
+
+    def __next_operation(self):
+        self.operations += 1
+        self.last_i2c_write = None
+        return self
+
+    def i2c_write(self, targetAddress, registerAddress, data):
+        register = int.from_bytes(bytes(registerAddress), "big")
+        last = self.last_i2c_write
+
+        if self.merge_i2c_writes and last is not None and last[0] == targetAddress and last[1] == len(registerAddress) \
+           and last[2] == register and len(self.commands[-1][0]) + len(data) - 1 <= MAX_COMMAND_DATA_LENGTH:
+            # The operation shares the command of the previous write, so it also shares its response.
+            self.commands[-1][0].extend(data)
+            self.commands[-1][2].append(self.operations)
+            self.bridge.merged_i2c_writes += 1
+        else:
+            self.__add_command([I2C_WRITE_COMMAND, targetAddress << 1] + list(registerAddress) + list(data))
+
+        self.__next_operation()
+        self.last_i2c_write = (targetAddress, len(registerAddress), register + len(data))
+        return self
+
+    def i2c_read(self, targetAddress, requestDataLength, registerAddress = []):
+        """
+        Reads requestDataLength bytes, from registerAddress if given. The reads longer than MAX_READ_LENGTH are
+        split into several reads, so the target must continue each read where the previous one ended.
+        """
+        if len(registerAddress) > 0:
+            self.__add_command([I2C_WRITE_COMMAND, targetAddress << 1] + list(registerAddress))
+
+        self.__add_reads([I2C_READ_COMMAND, targetAddress << 1], requestDataLength)
+        return self.__next_operation()
+
+    def spi_write(self, data, chipSelect = SPI_CHIP_SELECT_1):
+        self.__add_command([SPI_WRITE_COMMAND | chipSelect] + list(data))
+        return self.__next_operation()
+
+    def spi_read(self, length, chipSelect = SPI_CHIP_SELECT_1):
+        if length > MAX_READ_LENGTH:
+            raise ValueError(f"The SPI reads are limited to {MAX_READ_LENGTH} bytes by the IBI payload")
+
+        self.__add_command([SPI_READ_COMMAND | chipSelect, length], length)
+        return self.__next_operation()
+
+    def spi_transfer(self, data, readLength):
+        """
+        Writes data and then reads readLength bytes without releasing the chip select 1.
+        """
+        if readLength > MAX_READ_LENGTH:
+            raise ValueError(f"The SPI reads are limited to {MAX_READ_LENGTH} bytes by the IBI payload")
+
+        self.__add_command([SPI_WRITE_READ_COMMAND, readLength] + list(data), readLength)
+        return self.__next_operation()
+
+    def submit(self):
+        """
+        Executes the operations. Returns a list with one response per operation, a dictionary with the result
+        and the payload read, like the responses of the Supernova. When a command fails, its operation gets
+        the response of the failed private write, and the operations that were not executed get None, as
+        well as the reads whose data did not arrive.
+        """
+        responses = [None] * self.operations
+        payloads = [[] for _ in range(self.operations)]
+        reads = []
+
+        self.bridge._discard_stale_ibis()
+
+        for data, read_length, operations in self.commands:
+            response = self.bridge._send_command(data)
+
+            if response is None or response["result"] != CommonResultCodes.SUCCESS.name:
+                print("Error: The translator did not accept the command: ", response)
+                for operation in operations:
+                    responses[operation] = response
+                break
+
+            for operation in operations:
+                responses[operation] = {"result": CommonResultCodes.SUCCESS.name, "payload": payloads[operation]}
+            if read_length > 0:
+                reads.append((operations[0], read_length))
+
+        data_missing = False
+        for operation, read_length in reads:
+            ibi = None if data_missing else self.bridge._next_read_ibi()
+
+            if ibi is None:
+                # The data of the next reads can not be told apart from the data of the missing one.
+                if not data_missing:
+                    print("Error: The translator did not send the data read")
+                data_missing = True
+                responses[operation] = None
+                continue
+
+            payloads[operation].extend(ibi["payload"][1:1 + read_length])
+
+        self.commands = []
+        self.operations = 0
+        self.last_i2c_write = None
+        return responses
+
+class Pic18f16q20Bridge:
+    """
+    Host-side client of the PIC18F16Q20 I3C to SPI and I2C protocol translator. The devices connected
+    downstream of the translator are accessed with the same methods as the I2C and SPI controllers of the
+    Supernova, i2c_controller_write(), i2c_controller_read() and spi_controller_transfer(), and several
+    operations are executed together with a BridgeTransaction from transaction().
+
+    The translator must have joined the bus, and its IBIs must be enabled with enable_ibi(), since the data
+    read downstream is sent with them. The IBIs with another mandatory data byte signal the interrupt pins
+    of the downstream devices, and are stored in alerts.
+    """
+
+    def __init__(self, blocking_api, targetAddress = TRANSLATOR_DYNAMIC_ADDRESS, busy_timeout = DEFAULT_BUSY_TIMEOUT,
+                 busy_backoff = DEFAULT_BUSY_BACKOFF, busy_backoff_factor = 2.0, ibi_timeout = 0.5):
+        self.blocking_api = blocking_api
+        self.target_address = targetAddress
+        self.busy_timeout = busy_timeout
+        self.busy_backoff = busy_backoff
+        self.busy_backoff_factor = busy_backoff_factor
+        self.ibi_timeout = ibi_timeout
+
+        self.ibi_queue = blocking_api.notification_queue(NotificationSource.IBI, targetAddress)
+        self.alerts = collections.deque(maxlen=256)
+
+        # Statistics
+        self.commands = 0
+        self.busy_retries = 0
+        self.merged_i2c_writes = 0
+        self.stale_ibis = 0
+
+    def enable_ibi(self):
+        response = self.blocking_api.i3c_direct_enec(targetAddress=self.target_address, events=[ENEC.ENINT])
+        return response is not None and response["result"] == CommonResultCodes.SUCCESS.name
+
+    def disable_ibi(self):
+        response = self.blocking_api.i3c_direct_disec(targetAddress=self.target_address, events=[DISEC.DISINT])
+        return response is not None and response["result"] == CommonResultCodes.SUCCESS.name
+
+    def transaction(self, merge_i2c_writes = False):
+        return BridgeTransaction(self, merge_i2c_writes)
+
+    def _send_command(self, data):
+        """
+        Sends a command with a private write. The translator does not acknowledge it while it is executing
+        the previous command, so it is sent again until it is acknowledged or busy_timeout expires. The retries
+        back off exponentially, starting at busy_backoff, not to flood the bus with not acknowledged writes.
+        """
+        deadline = time.perf_counter() + self.busy_timeout
+        backoff = self.busy_backoff
+        self.commands += 1
+
+        while True:
+            response = self.blocking_api.i3c_controller_write(targetAddress=self.target_address,
+                                                              mode=TransferMode.I3C_SDR,
+                                                              registerAddress=[],
+                                                              data=data)
+
+            remaining = deadline - time.perf_counter()
+            if response is None or response["result"] != I3cResultCodes.I3C_NACK_ADDRESS.name or remaining <= 0:
+                return response
+
+            # The last retry is sent when busy_timeout expires.
+            time.sleep(min(backoff, remaining))
+            backoff *= self.busy_backoff_factor
+            self.busy_retries += 1
+
+    def __store_alert(self, ibi):
+        self.alerts.append(ibi["payload"][0] if len(ibi.get("payload", [])) > 0 else None)
+
+    def _discard_stale_ibis(self):
+        # The data of the reads of a failed transaction must not be taken by the next one.
+        for ibi in self.ibi_queue.get_all():
+            if len(ibi.get("payload", [])) > 0 and ibi["payload"][0] == READ_DATA_MDB:
+                self.stale_ibis += 1
+            else:
+                self.__store_alert(ibi)
+
+    def _next_read_ibi(self):
+        """
+        Returns the next IBI carrying read data, or None if it does not arrive within ibi_timeout.
+        """
+        deadline = time.perf_counter() + self.ibi_timeout
+
+        while True:
+            ibi = self.ibi_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+
+            if ibi is None or (len(ibi.get("payload", [])) > 0 and ibi["payload"][0] == READ_DATA_MDB):
+                return ibi
+
+            self.__store_alert(ibi)
+
+    # Supernova-like interface ---------------------------------------------------------
+
+    def i2c_controller_write(self, targetAddress, registerAddress, data):
+        return self.transaction().i2c_write(targetAddress, registerAddress, data).submit()[0]
+
+    def i2c_controller_read(self, targetAddress, requestDataLength, registerAddress = []):
+        return self.transaction().i2c_read(targetAddress, requestDataLength, registerAddress).submit()[0]
+
+    def spi_controller_transfer(self, transferLength, payload):
+        """
+        SPI transfer on the chip select 1. The translator only writes and then reads, so the bytes received
+        while writing the payload are returned as zeros, followed by the transferLength - len(payload) bytes
+        read after it.
+        """
+        read_length = transferLength - len(payload)
+
+        if read_length <= 0:
+            response = self.transaction().spi_write(payload).submit()[0]
+        else:
+            response = self.transaction().spi_transfer(payload, read_length).submit()[0]
+
+        if response is not None and response["result"] == CommonResultCodes.SUCCESS.name:
+            response["payload"] = ([0x00] * len(payload) + response["payload"])[:transferLength]
+
+        return response
+
+    def statistics(self):
+        return {"commands": self.commands, "busy_retries": self.busy_retries,
+                "merged_i2c_writes": self.merged_i2c_writes, "stale_ibis": self.stale_ibis, "alerts": len(self.alerts)}
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+# Devices of the translator board: an I2C FRAM and a W25Q64JV SPI flash on the chip select 1.
+FRAM_ADDRESS = 0x50
+FLASH_JEDEC_ID_COMMAND = 0x9F
+FLASH_WRITE_ENABLE_COMMAND = 0x06
+FLASH_WRITE_STATUS_1_COMMAND = 0x01
+FLASH_READ_STATUS_1_COMMAND = 0x05
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    response = supernova_device.i3c_controller_init(pushPullRate=I3cPushPullTransferRate.PUSH_PULL_3_125_MHZ_12_5_DC,
+                                                    i3cOpenDrainRate=I3cOpenDrainTransferRate.OPEN_DRAIN_1_MHZ,
+                                                    i2cOpenDrainRate=I2cTransferRate._400KHz)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the I3C controller")
+        exit(1)
+
+    # The secondary I3C bus of the PIC18F16Q20 works at 1.2 V.
+    response = supernova_device.set_i3c_voltage(voltage_mV=1200)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the I3C voltage")
+        exit(1)
+
+    # The translator hot-joins the bus once it is initialized.
+    supernova_device.i3c_controller_init_bus()
+    input("Connect the PIC18F16Q20 and press Enter once it joined the bus...")
+
+    bridge = Pic18f16q20Bridge(supernova_device)
+
+    if not bridge.enable_ibi():
+        print("Error enabling the IBIs of the translator")
+        exit(1)
+
+    # Write the FRAM and read it back, and read the JEDEC ID of the flash, as a single transaction.
+    responses = bridge.transaction().i2c_write(FRAM_ADDRESS, [0x00, 0x00], [0xF1, 0xF2, 0xF3, 0xF4, 0xF5]) \
+                                    .i2c_read(FRAM_ADDRESS, 5, [0x00, 0x00]) \
+                                    .spi_transfer([FLASH_JEDEC_ID_COMMAND], 3) \
+                                    .submit()
+
+    if None in responses or any(response["result"] != CommonResultCodes.SUCCESS.name for response in responses):
+        print("Error: The transaction failed: ", responses)
+        exit(1)
+
+    print(f"FRAM data: {responses[1]['payload']}")
+    print(f"Flash JEDEC ID: {responses[2]['payload']}")
+
+    # Configure the status register 1 of the flash through the Supernova-like interface.
+    bridge.spi_controller_transfer(transferLength=1, payload=[FLASH_WRITE_ENABLE_COMMAND])
+    bridge.spi_controller_transfer(transferLength=2, payload=[FLASH_WRITE_STATUS_1_COMMAND, 0x60])
+
+    response = bridge.spi_controller_transfer(transferLength=2, payload=[FLASH_READ_STATUS_1_COMMAND])
+    print(f"Flash status register 1: 0x{response['payload'][1]:02X}")
+
+    print(f"Bridge statistics: {bridge.statistics()}")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
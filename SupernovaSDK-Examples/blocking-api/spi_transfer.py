@@ -0,0 +1,166 @@
+import time
+import collections
+import numpy as np
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.spi.definitions import *
+from supernova_blocking_api import SupernovaBlockingApi
+
+# ==================================================================================
+# region SPI transfer engine
+# ==================================================================================
+
+# Number of chunks sent before waiting for the response of the oldest one.
+DEFAULT_CHUNKS_IN_FLIGHT = 8
+
+class SpiTransferEngine:
+    """
+    Transfers buffers of any length through the SPI controller of a blocking API instance. The buffers,
+    given as bytes, bytearray, memoryview or NumPy arrays, are split into chunks of at most chunk_size
+    bytes that are sliced without copying, and only converted into the list the SDK expects when they
+    are sent. Several chunks are kept in flight so that the host prepares the next chunks while the
+    adapter transfers the previous ones. The data read is written into a preallocated output buffer as
+    the responses arrive.
+
+    Every chunk is a separate SPI transfer, so the chip select is released between chunks. The chunk
+    size must match the boundaries the target accepts, e.g. the page size of a flash memory.
+    """
+
+    def __init__(self, blocking_api, chunk_size = MAX_SPI_TRANSFER_LENGTH, chunks_in_flight = DEFAULT_CHUNKS_IN_FLIGHT):
+        self.blocking_api = blocking_api
+        self.chunk_size = min(chunk_size, MAX_SPI_TRANSFER_LENGTH)
+        self.chunks_in_flight = chunks_in_flight
+
+    def __as_bytes_view(self, data):
+        # Arrays are sent as the bytes they hold, e.g. 2 bytes per uint16 value, in the byte order of the array.
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).view(np.uint8)
+        return memoryview(data).cast("B")
+
+    def __as_output_view(self, output):
+        # The data read is written in place, a copy of the output would leave the caller's buffer untouched.
+        view = memoryview(output)
+        if view.readonly or not view.c_contiguous:
+            raise ValueError("The output buffer must be writable and contiguous")
+        return view.cast("B")
+
+    def transfer(self, data, output = None, length = None):
+        """
+        Sends the data and returns the data received in the same transfer, into output if given, which
+        must be a writable contiguous buffer of at least the transfer length, or into a new bytearray
+        otherwise. When length is longer than the data, the rest of the transfer only reads. Returns None if
+        any chunk fails.
+        """
+        data = self.__as_bytes_view(data if data is not None else b"")
+        length = length if length is not None else len(data)
+
+        if output is None:
+            output = bytearray(length)
+        output_view = self.__as_output_view(output)
+
+        if len(output_view) < length:
+            print(f"Error: The output buffer is shorter than the transfer length {length}")
+            return None
+
+        in_flight = collections.deque()
+        failed_response = None
+
+        for offset in range(0, length, self.chunk_size):
+            chunk_length = min(self.chunk_size, length - offset)
+
+            if len(in_flight) == self.chunks_in_flight:
+                failed_response = self.__complete_chunk(in_flight.popleft(), output_view)
+                if failed_response is not None:
+                    break
+
+            future = self.blocking_api.spi_controller_transfer.submit(transferLength=chunk_length,
+                                                                      payload=data[offset:offset + chunk_length].tolist())
+            in_flight.append((future, offset, chunk_length))
+
+        while len(in_flight) > 0:
+            if failed_response is not None:
+                self.blocking_api.cancel(in_flight.popleft()[0])
+            else:
+                failed_response = self.__complete_chunk(in_flight.popleft(), output_view)
+
+        if failed_response is not None:
+            print("Error: SPI transfer failed: ", failed_response)
+            return None
+
+        return output
+
+    def __complete_chunk(self, chunk, output_view):
+        """
+        Waits for the response of a chunk and copies its data into the output. Returns the response if the
+        chunk failed, None otherwise.
+        """
+        future, offset, chunk_length = chunk
+        response = self.blocking_api.wait_for_response(future)
+
+        if response is None or response.get("result") != CommonResultCodes.SUCCESS.name:
+            return response if response is not None else {"result": "TIMEOUT", "offset": offset}
+
+        output_view[offset:offset + chunk_length] = bytes(response["payload"][:chunk_length])
+        return None
+
+    def write(self, data):
+        """
+        Sends the data, discarding the data received. Returns False if any chunk fails.
+        """
+        return self.transfer(data) is not None
+
+    def read(self, length, output = None):
+        """
+        Reads length bytes without sending data, into output if given. Returns None if any chunk fails.
+        """
+        return self.transfer(None, output, length)
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    response = supernova_device.set_i2c_spi_uart_gpio_voltage(voltage_mV=3300)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the SPI voltage")
+        exit(1)
+
+    response = supernova_device.spi_controller_init(bitOrder=SpiControllerBitOrder.MSB,
+                                                    mode=SpiControllerMode.MODE_0,
+                                                    dataWidth=SpiControllerDataWidth._8_BITS_DATA,
+                                                    chipSelect=SpiControllerChipSelect.CHIP_SELECT_0,
+                                                    chipSelectPol=SpiControllerChipSelectPolarity.ACTIVE_LOW,
+                                                    frequency=10000000)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the SPI controller")
+        exit(1)
+
+    # Transfer a 256 kB frame, e.g. to a display, and read back what is received on MISO.
+    engine = SpiTransferEngine(supernova_device)
+    frame = np.random.randint(0, 256, 256 * 1024, dtype=np.uint8)
+    received = np.empty_like(frame)
+
+    start_time = time.perf_counter()
+    result = engine.transfer(frame, output=received)
+    elapsed_time = time.perf_counter() - start_time
+
+    if result is not None:
+        print(f"Transferred {len(frame)} bytes in {elapsed_time:.3f} s: {len(frame) / elapsed_time / 1024:.1f} kB/s")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+import re
+import weakref
+from binhosupernova.supernova import Supernova
+from binhosupernova.commands.system.definitions import *
+from supernova_blocking_api import NotificationRouter, TimeoutPolicy, MAX_PENDING_REQUESTS
+
+# ==================================================================================
+# region Asyncio API
+# ==================================================================================
+
+MIN_TRANSFER_ID = 1
+MAX_TRANSFER_ID = 65535
+
+class AsyncSupernovaApi:
+
+    # Snake case names of the wrapped methods of each SDK class, mapped to the names of the SDK methods.
+    __sdk_methods = dict()
+
+    def __init__(self, device = None, timeout_policy = None):
+        """
+        By default, the wrapper drives a Supernova host adapter. Any object with the same methods, like a
+        SupernovaSimulator, can be given as device instead.
+
+        The timeout policy, see TimeoutPolicy in supernova_blocking_api.py, decides how long each request
+        waits for its response and how many times it is retried.
+        """
+        self.transfer_id = 0
+        self.timeout_policy = timeout_policy if timeout_policy is not None else TimeoutPolicy()
+
+        self.supernova = device if device is not None else Supernova()
+        self.supernova.onEvent(self.__on_receive_callback)
+
+        # Table of the requests waiting for a response, indexed by the transfer id. Each entry holds
+        # the event loop that sent the request and the asyncio future resolved with the response.
+        self.pending_requests = dict()
+        self.pending_requests_lock = threading.Lock()
+
+        # Bound of the requests waiting for a response, one semaphore per event loop since they can not be shared.
+        self.pending_requests_slots = weakref.WeakKeyDictionary()
+
+        self.notifications = NotificationRouter()
+
+        self.__set_common_methods()
+        self.__decorate_methods()
+
+    def __set_common_methods(self):
+        """
+        This private methods set the methods that do not return a response from the host adapter.
+        For this reason, they are not turned into coroutines.
+        """
+        self.open = self.supernova.open
+        self.close = self.supernova.close
+        self.reset_device = self.supernova.resetDevice
+        self.enter_boot_mode = self.supernova.enterBootMode
+
+    def __decorate_methods(self):
+        # The names of the SDK methods are only resolved once per SDK class, and every method is wrapped the
+        # first time it is used, see __getattr__(). So creating many wrapper instances is cheap.
+        sdk_class = type(self.supernova)
+
+        if sdk_class not in AsyncSupernovaApi.__sdk_methods:
+            # Generate a coroutine for all methods of the SDK class except the one listed below.
+            exclude_methods = ["open", "close", "resetDevice", "enterBootMode", "onEvent", "i3cControllerCccTransfer"] + getattr(sdk_class, "helper_methods", [])
+
+            method_names = [method_name for method_name in dir(sdk_class)
+                            if not method_name.startswith("_") and not method_name in exclude_methods and callable(getattr(sdk_class, method_name))]
+
+            AsyncSupernovaApi.__sdk_methods[sdk_class] = {self.__camel_to_snake(method_name): method_name for method_name in method_names}
+
+        self.sdk_methods = AsyncSupernovaApi.__sdk_methods[sdk_class]
+
+    def __getattr__(self, name):
+        # Only invoked when the attribute is not found, that is, the first time an SDK method is used.
+        # The wrapped method is then stored in the instance.
+        sdk_methods = self.__dict__.get("sdk_methods", dict())
+
+        if name not in sdk_methods:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        method = self.__async_call(getattr(self.supernova, sdk_methods[name]), name)
+        setattr(self, name, method)
+        return method
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self.sdk_methods.keys())
+
+    def __on_receive_callback(self, dut_message = None, system_message = None):
+        """
+        This callback is invoked from the SDK receiving thread, so the futures are resolved in the
+        thread of their event loop using call_soon_threadsafe().
+        """
+        if dut_message is not None:
+            if dut_message.get("id") == 0:
+                self.notifications.route(dut_message)
+            else:
+                with self.pending_requests_lock:
+                    request = self.pending_requests.pop(dut_message.get("id"), None)
+
+                # Discard the responses of the requests that are not pending anymore, e.g. timed out requests.
+                if request is not None:
+                    loop, future = request
+                    loop.call_soon_threadsafe(self.__resolve, future, dut_message)
+
+    def __resolve(self, future, message):
+        if not future.done():
+            future.set_result(message)
+
+    def __async_call(self, method, method_name):
+        async def wrapper(*args, **kwargs):
+            response = await send_request(*args, **kwargs)
+
+            for attempt in range(1, self.timeout_policy.retries_for(method_name) + 1):
+                if response is not None:
+                    break
+                await asyncio.sleep(self.timeout_policy.backoff_delay(attempt))
+                response = await send_request(*args, **kwargs)
+
+            return response
+
+        async def send_request(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+
+            # Wait until there is room for a new request in the pending requests table.
+            async with self.__pending_requests_slots(loop):
+                future = loop.create_future()
+
+                # Register the request before sending it, the response might arrive before the method returns.
+                with self.pending_requests_lock:
+                    id = self.__get_new_transfer_id()
+                    self.pending_requests[id] = (loop, future)
+
+                timeout = self.timeout_policy.timeout(method_name, kwargs)
+                send_time = time.perf_counter()
+
+                # The request is discarded however the wait ends, also when the SDK method raises or the caller
+                # cancels the task, so it never stays pending.
+                try:
+                    response = method(id=id, *args, **kwargs)
+
+                    # Wait for the response only when the request was successfully sent to the DUT.
+                    # Otherwise, return the result of the method immediately.
+                    if response["opcode"] != 0:
+                        return response
+
+                    response = await asyncio.wait_for(future, timeout=timeout)
+                except asyncio.TimeoutError:
+                    if self.timeout_policy.adaptive:
+                        self.timeout_policy.observe_timeout(method_name, timeout)
+                    return None
+                finally:
+                    self.__discard_request(id)
+
+            if self.timeout_policy.adaptive:
+                self.timeout_policy.observe(method_name, time.perf_counter() - send_time)
+
+            return response
+
+        return wrapper
+
+    def __pending_requests_slots(self, loop):
+        with self.pending_requests_lock:
+            slots = self.pending_requests_slots.get(loop)
+            if slots is None:
+                slots = asyncio.Semaphore(MAX_PENDING_REQUESTS)
+                self.pending_requests_slots[loop] = slots
+            return slots
+
+    def __discard_request(self, id):
+        with self.pending_requests_lock:
+            self.pending_requests.pop(id, None)
+
+    def __get_new_transfer_id(self):
+        # Skip the ids of the requests that are still waiting for a response.
+        while True:
+            self.transfer_id += MIN_TRANSFER_ID
+
+            if self.transfer_id == MAX_TRANSFER_ID:
+                self.transfer_id = MIN_TRANSFER_ID
+
+            if self.transfer_id not in self.pending_requests:
+                return self.transfer_id
+
+    def __camel_to_snake(self, name):
+        return re.sub(r'(?<!^)(?<![A-Z])([A-Z])', r'_\1', name).lower()
+
+    def notification_queue(self, source, key = None):
+        """
+        Returns the queue of the notifications of a source. The queue can be consumed with async_get()
+        or with an async for loop.
+        """
+        return self.notifications.queue(source, key)
+
+    async def wait_for_notification(self, source, key = None, timeout = None):
+        return await self.notifications.queue(source, key).async_get(timeout)
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+async def main():
+    supernova_device = AsyncSupernovaApi()
+
+    # Open the device.
+    supernova_device.open()
+
+    # Request all the USB strings at once and wait for the responses concurrently.
+    usb_strings = {
+        "Manufacturer": GetUsbStringSubCommand.MANUFACTURER,
+        "Product name": GetUsbStringSubCommand.PRODUCT_NAME,
+        "Firmware version": GetUsbStringSubCommand.FW_VERSION,
+        "Hardware version": GetUsbStringSubCommand.HW_VERSION,
+        "Serial number": GetUsbStringSubCommand.SERIAL_NUMBER
+    }
+
+    responses = await asyncio.gather(*[supernova_device.get_usb_string(subCommand=sub_command) for sub_command in usb_strings.values()])
+
+    for name, response in zip(usb_strings.keys(), responses):
+        if response is not None and response["result"] == CommonResultCodes.SUCCESS.name:
+            print(f"{name}: {response['payload']}")
+        else:
+            print(f"Error {response}")
+
+    # Close the device.
+    supernova_device.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+# endregion
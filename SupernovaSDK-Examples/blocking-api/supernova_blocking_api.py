@@ -1,4 +1,8 @@
 import threading
+import concurrent.futures
+import collections
+import asyncio
+import time
 import re
 from binhosupernova.supernova import Supernova
 from binhosupernova.commands.system.definitions import *
@@ -10,18 +14,355 @@ from binhosupernova.commands.system.definitions import *
 MIN_TRANSFER_ID = 1
 MAX_TRANSFER_ID = 65535
 
+# Maximum number of requests that can be waiting for a response at the same time.
+MAX_PENDING_REQUESTS = 32
+
+# Time in seconds to wait for the response of a request.
+RESPONSE_TIMEOUT = 5.0
+
+# Maximum number of notifications stored per notification queue.
+MAX_QUEUED_NOTIFICATIONS = 256
+
+class NotificationSource:
+    """Sources of the notifications, used to select a notification queue"""
+    IBI = "IBI"     # I3C In-Band Interrupts, by target address
+    GPIO = "GPIO"   # GPIO interrupts, by pin
+    UART = "UART"   # UART received messages
+    OTHER = "OTHER" # Any other notification, by command name
+
+class NotificationQueue:
+    """
+    Bounded FIFO of the notifications of one source. The notifications are kept until they are consumed,
+    either blocking with get(), iterating over the queue, or awaiting async_get() from an event loop. When
+    the queue is full, the oldest notification is dropped to make room for the new one.
+    """
+
+    def __init__(self, max_size = MAX_QUEUED_NOTIFICATIONS):
+        self.messages = collections.deque(maxlen=max_size)
+        self.condition = threading.Condition()
+        self.async_waiters = []
+
+        # Statistics
+        self.received = 0
+        self.dropped = 0
+        self.high_water_mark = 0
+
+    def put(self, message):
+        with self.condition:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append(message)
+            self.received += 1
+            self.high_water_mark = max(self.high_water_mark, len(self.messages))
+
+            self.condition.notify()
+            waiters = self.async_waiters
+            self.async_waiters = []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self.__wake_up, future)
+
+    def __wake_up(self, future):
+        if not future.done():
+            future.set_result(None)
+
+    def get(self, timeout = None):
+        """
+        Blocks until a notification is available and returns it, or returns None on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.messages) > 0, timeout=timeout):
+                return None
+            return self.messages.popleft()
+
+    def get_all(self):
+        """
+        Returns all the queued notifications without blocking.
+        """
+        with self.condition:
+            messages = list(self.messages)
+            self.messages.clear()
+        return messages
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return self.messages_iterator()
+
+    def messages_iterator(self, timeout = None):
+        """
+        Generator that yields the notifications as they arrive. It finishes when no notification arrives
+        within the timeout.
+        """
+        while True:
+            message = self.get(timeout)
+            if message is None:
+                return
+            yield message
+
+    async def async_get(self, timeout = None):
+        """
+        Coroutine version of get(), it waits for the notification without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self.condition:
+                if len(self.messages) > 0:
+                    return self.messages.popleft()
+                waiter = (loop, loop.create_future())
+                self.async_waiters.append(waiter)
+
+            try:
+                await asyncio.wait_for(waiter[1], timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                with self.condition:
+                    if waiter in self.async_waiters:
+                        self.async_waiters.remove(waiter)
+                    return self.messages.popleft() if len(self.messages) > 0 else None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.async_get()
+
+    def statistics(self):
+        return {"queued": len(self.messages), "received": self.received, "dropped": self.dropped, "high_water_mark": self.high_water_mark}
+
+class NotificationRouter:
+    """
+    Dispatches the notifications received from the host adapter to a queue per source: one queue per I3C
+    target address for the IBIs, one per pin for the GPIO interrupts, one for the UART and one per command
+    name for the rest of the notifications. The queues are created the first time they are requested or
+    a notification for them arrives.
+
+    A listener can be set for a source instead, to handle its notifications as soon as they arrive.
+    """
+
+    def __init__(self, max_size = MAX_QUEUED_NOTIFICATIONS):
+        self.max_size = max_size
+        self.queues = dict()
+        self.listeners = dict()
+        self.lock = threading.Lock()
+
+        # Notified every time a notification is queued, to wait for a notification of any source.
+        self.arrived = threading.Condition()
+
+    def queue(self, source, key = None):
+        # Enums, like the GPIO pin numbers, are identified by their names as in the notifications.
+        key = getattr(key, "name", key)
+
+        with self.lock:
+            if (source, key) not in self.queues:
+                self.queues[(source, key)] = NotificationQueue(self.max_size)
+            return self.queues[(source, key)]
+
+    def set_listener(self, source, key = None, listener = None):
+        """
+        Calls listener(message) for every notification of the source, from the SDK receiving thread, instead
+        of storing them in the queue. The listener must return quickly. Setting None stores them again.
+        """
+        key = getattr(key, "name", key)
+
+        with self.lock:
+            if listener is None:
+                self.listeners.pop((source, key), None)
+            else:
+                self.listeners[(source, key)] = listener
+
+    def route(self, message):
+        command = message.get("command", "")
+
+        if "IBI" in command:
+            source, key = NotificationSource.IBI, message.get("target_address")
+        elif "GPIO" in command:
+            source, key = NotificationSource.GPIO, message.get("pin_number")
+        elif "UART" in command:
+            source, key = NotificationSource.UART, None
+        else:
+            source, key = NotificationSource.OTHER, command
+
+        listener = self.listeners.get((source, key))
+
+        if listener is not None:
+            listener(message)
+        else:
+            self.queue(source, key).put(message)
+            with self.arrived:
+                self.arrived.notify_all()
+
+    def get_any(self, timeout = None):
+        """
+        Blocks until a notification of any source is queued and returns it, or returns None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.arrived:
+            while True:
+                with self.lock:
+                    queues = list(self.queues.values())
+
+                for notification_queue in queues:
+                    if len(notification_queue) > 0:
+                        message = notification_queue.get(0)
+                        if message is not None:
+                            return message
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.arrived.wait(remaining)
+
+    def statistics(self):
+        """
+        Returns the statistics of every queue, indexed by the (source, key) tuple of the queue.
+        """
+        with self.lock:
+            queues = dict(self.queues)
+        return {source_key: queue.statistics() for source_key, queue in queues.items()}
+
+# Methods that can be sent again without side effects when their response does not arrive.
+IDEMPOTENT_METHODS = ["get_usb_string", "i2c_controller_read", "i3c_controller_read", "gpio_digital_read",
+                      "i3c_target_read_memory", "i2c_controller_scan_bus"]
+
+class TimeoutPolicy:
+    """
+    Decides how long to wait for the response of each request and how many times the idempotent requests
+    are retried when their response does not arrive.
+
+    The timeout of a request is the timeout of its method, given in method_timeouts or the default timeout
+    otherwise, plus per_byte_timeout for each byte sent or requested. When adaptive is True, once a method has
+    min_samples responses, its timeout becomes adaptive_factor times the adaptive_percentile of its latest
+    latencies, never below min_timeout nor above the fixed timeout, so an unresponsive target fails in
+    milliseconds instead of seconds. Every timed out request doubles the adaptive timeout of its method,
+    so the timeout grows back after a slowdown instead of failing every following request.
+
+    The retried requests wait backoff seconds before the first retry, multiplied by backoff_factor for
+    each following retry.
+    """
+
+    # Keyword arguments of the SDK methods that give the length of the transfer.
+    LENGTH_ARGUMENTS = ["requestDataLength", "transferLength", "dataLength", "length"]
+    DATA_ARGUMENTS = ["data", "payload"]
+
+    def __init__(self, default_timeout = RESPONSE_TIMEOUT, method_timeouts = None, per_byte_timeout = 0.0,
+                 adaptive = False, adaptive_factor = 4.0, adaptive_percentile = 0.99, min_timeout = 0.05, min_samples = 32,
+                 retries = 0, retry_methods = IDEMPOTENT_METHODS, backoff = 0.01, backoff_factor = 2.0):
+        self.default_timeout = default_timeout
+        self.method_timeouts = method_timeouts or dict()
+        self.per_byte_timeout = per_byte_timeout
+
+        self.adaptive = adaptive
+        self.adaptive_factor = adaptive_factor
+        self.adaptive_percentile = adaptive_percentile
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+
+        self.retries = retries
+        self.retry_methods = list(retry_methods)
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+
+        # Latest latencies of each method, the number of latencies observed and the adaptive timeout derived from them.
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=256))
+        self.observations = collections.Counter()
+        self.adaptive_timeouts = dict()
+        self.lock = threading.Lock()
+
+    def __payload_length(self, kwargs):
+        # The length arguments and the data may describe the same bytes, e.g. the transferLength and the
+        # payload of an SPI transfer, so only the largest of them is counted.
+        length = 0
+        for name in self.LENGTH_ARGUMENTS:
+            length = max(length, kwargs.get(name, 0) or 0)
+        for name in self.DATA_ARGUMENTS:
+            data = kwargs.get(name)
+            if isinstance(data, (list, bytes, bytearray, str)):
+                length = max(length, len(data))
+        return length
+
+    def timeout(self, method_name, kwargs):
+        """
+        Returns the time in seconds to wait for the response of a request of the method with the given arguments.
+        """
+        payload_timeout = self.per_byte_timeout * self.__payload_length(kwargs) if self.per_byte_timeout > 0 else 0.0
+        fixed_timeout = self.method_timeouts.get(method_name, self.default_timeout) + payload_timeout
+
+        adaptive_timeout = self.adaptive_timeouts.get(method_name) if self.adaptive else None
+        if adaptive_timeout is None:
+            return fixed_timeout
+
+        return min(fixed_timeout, max(self.min_timeout, adaptive_timeout + payload_timeout))
+
+    def observe(self, method_name, latency):
+        """
+        Adds the latency of a response to the history of the method and updates its adaptive timeout.
+        """
+        with self.lock:
+            latencies = self.latencies[method_name]
+            latencies.append(latency)
+            self.observations[method_name] += 1
+
+            # The percentile is only computed again every few responses.
+            if len(latencies) >= self.min_samples and self.observations[method_name] % 8 == 0:
+                ordered = sorted(latencies)
+                percentile = ordered[min(len(ordered) - 1, int(self.adaptive_percentile * len(ordered)))]
+                self.adaptive_timeouts[method_name] = self.adaptive_factor * percentile
+
+    def observe_timeout(self, method_name, timeout):
+        """
+        Adds a request that timed out to the history of the method, as if its response had arrived at the
+        timeout, and doubles the adaptive timeout of the method. The timeout stays capped by the fixed timeout.
+        """
+        with self.lock:
+            self.latencies[method_name].append(timeout)
+            self.observations[method_name] += 1
+
+            if method_name in self.adaptive_timeouts:
+                self.adaptive_timeouts[method_name] *= 2
+
+    def retries_for(self, method_name):
+        return self.retries if method_name in self.retry_methods else 0
+
+    def backoff_delay(self, attempt):
+        """
+        Returns the time in seconds to wait before the given retry, starting at 1.
+        """
+        return self.backoff * self.backoff_factor ** (attempt - 1)
+
 class SupernovaBlockingApi:
 
-    def __init__(self):
+    # Snake case names of the wrapped methods of each SDK class, mapped to the names of the SDK methods.
+    __sdk_methods = dict()
+
+    def __init__(self, device = None, instrumentation = None, timeout_policy = None):
+        """
+        By default, the wrapper drives a Supernova host adapter. Any object with the same methods, like a
+        SupernovaSimulator, can be given as device instead.
+
+        The instrumentation, like the Instrumentation class of instrumentation.py, is notified of every
+        request sent, completed and timed out. It is disabled by default.
+
+        The timeout policy decides how long each request waits for its response and how many times it is
+        retried. By default, every request waits RESPONSE_TIMEOUT seconds and is never retried.
+        """
         self.transfer_id = 0
+        self.instrumentation = instrumentation
+        self.timeout_policy = timeout_policy if timeout_policy is not None else TimeoutPolicy()
 
-        self.supernova = Supernova()
+        self.supernova = device if device is not None else Supernova()
         self.supernova.onEvent(self.__on_receive_callback)
 
-        self.response_event = threading.Event()
-        self.notification_event = threading.Event()
-        self.response = dict()
-        self.notification = dict()
+        # Table of the requests waiting for a response, indexed by the transfer id.
+        self.pending_requests = dict()
+        self.pending_requests_lock = threading.Lock()
+        self.pending_requests_slots = threading.BoundedSemaphore(MAX_PENDING_REQUESTS)
+        self.send_lock = threading.Lock()
+
+        self.notifications = NotificationRouter()
 
         self.__set_common_methods()
         self.__decorate_methods()
@@ -29,7 +370,7 @@ class SupernovaBlockingApi:
     def __set_common_methods(self):
         """
         This private methods set the methods that do not return a response from the host adapter.
-        For this reason, they are not decorated with the sequential decorator.
+        For this reason, they are not decorated with the pipelined decorator.
         """
         self.open = self.supernova.open
         self.close = self.supernova.close
@@ -37,61 +378,208 @@ class SupernovaBlockingApi:
         self.enter_boot_mode = self.supernova.enterBootMode
 
     def __decorate_methods(self):
-        # Apply sequential decorator dynamically for all methods of the SDK instance except the one listed below.
-        exclude_methods = ["open", "close", "resetDevice", "enterBootMode", "onEvent", "i3cControllerCccTransfer"]
+        # The names of the SDK methods are only resolved once per SDK class, and every method is wrapped the
+        # first time it is used, see __getattr__(). So creating many wrapper instances is cheap.
+        sdk_class = type(self.supernova)
 
-        for method_name in dir(self.supernova):
-            if not method_name.startswith("_") and not method_name in exclude_methods and callable(getattr(self.supernova, method_name)):
-                method = getattr(self.supernova, method_name)
-                setattr(self, self.__camel_to_snake(method_name), self.__sequential_call(method))
+        if sdk_class not in SupernovaBlockingApi.__sdk_methods:
+            # Apply pipelined decorator for all methods of the SDK class except the one listed below.
+            exclude_methods = ["open", "close", "resetDevice", "enterBootMode", "onEvent", "i3cControllerCccTransfer"] + getattr(sdk_class, "helper_methods", [])
+
+            method_names = [method_name for method_name in dir(sdk_class)
+                            if not method_name.startswith("_") and not method_name in exclude_methods and callable(getattr(sdk_class, method_name))]
+
+            SupernovaBlockingApi.__sdk_methods[sdk_class] = {self.__camel_to_snake(method_name): method_name for method_name in method_names}
+
+        self.sdk_methods = SupernovaBlockingApi.__sdk_methods[sdk_class]
+
+    def __getattr__(self, name):
+        # Only invoked when the attribute is not found, that is, the first time an SDK method is used.
+        # The wrapped method is then stored in the instance.
+        sdk_methods = self.__dict__.get("sdk_methods", dict())
+
+        if name not in sdk_methods:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        method = self.__pipelined_call(getattr(self.supernova, sdk_methods[name]), name)
+        setattr(self, name, method)
+        return method
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self.sdk_methods.keys())
 
     def __on_receive_callback(self, dut_message = None, system_message = None):
         if dut_message is not None:
             if dut_message.get("id") == 0:
-                self.notification = dut_message
-                self.notification_event.set()
+                self.notifications.route(dut_message)
             else:
-                self.response = dut_message
-                self.response_event.set()
+                self.__complete_request(dut_message.get("id"), dut_message)
+
+    def __pipelined_call(self, method, method_name):
+        """
+        This private method generates the blocking version of an SDK method. The generated method also
+        exposes a submit() method that sends the request and returns a Future immediately, so that
+        several requests can be outstanding at once.
+
+        The blocking version retries the request when its response does not arrive, as many times as
+        the timeout policy allows for the method.
+        """
+        def submit(*args, **kwargs):
+            return self.__send_request(method, method_name, *args, **kwargs)
 
-    def __sequential_call(self, method):
         def wrapper(*args, **kwargs):
-            id = self.__get_new_transfer_id()
-            self.response_event.clear()
-            response = method(id=id, *args, **kwargs)
-
-            # Block until response is received only when the request was successfully sent to the DUT.
-            if response["opcode"] == 0:
-                # Check if the response is already received.
-                if self.response_event.is_set() == True:
-                    return self.response
-                else:
-                    is_set = self.response_event.wait(timeout=5.0)
-                    if is_set == True:
-                        return self.response
-                    else:
-                        return None
-
-            # Otherwise, return the response immediately.
+            response = self.wait_for_response(submit(*args, **kwargs))
+
+            for attempt in range(1, self.timeout_policy.retries_for(method_name) + 1):
+                if response is not None:
+                    break
+                time.sleep(self.timeout_policy.backoff_delay(attempt))
+                response = self.wait_for_response(submit(*args, **kwargs))
+
             return response
 
+        wrapper.submit = submit
         return wrapper
 
+    def __send_request(self, method, method_name, *args, **kwargs):
+        # Wait until there is room for a new request in the pending requests table.
+        self.pending_requests_slots.acquire()
+
+        future = concurrent.futures.Future()
+        with self.pending_requests_lock:
+            id = self.__get_new_transfer_id()
+            future.transfer_id = id
+            self.pending_requests[id] = future
+            in_flight = len(self.pending_requests)
+
+        future.method_name = method_name
+        future.timeout = self.timeout_policy.timeout(method_name, kwargs)
+        future.deadline = time.perf_counter() + future.timeout
+
+        if self.instrumentation is not None or self.timeout_policy.adaptive:
+            future.send_time = time.perf_counter()
+
+        if self.instrumentation is not None:
+            self.instrumentation.request_sent(method_name, in_flight)
+
+        # Register the request before sending it, the response might arrive before the method returns.
+        try:
+            with self.send_lock:
+                response = method(id=id, *args, **kwargs)
+        except Exception:
+            self.__discard_request(id)
+            raise
+
+        # The response only arrives when the request was successfully sent to the DUT.
+        # Otherwise, resolve the request immediately with the result of the method.
+        if response["opcode"] != 0:
+            self.__complete_request(id, response)
+
+        return future
+
+    def __complete_request(self, id, response):
+        with self.pending_requests_lock:
+            future = self.pending_requests.pop(id, None)
+
+        # Discard the responses of the requests that are not pending anymore, e.g. timed out requests.
+        if future is not None:
+            self.pending_requests_slots.release()
+
+            if self.instrumentation is not None or self.timeout_policy.adaptive:
+                latency = time.perf_counter() - future.send_time
+
+                if self.timeout_policy.adaptive:
+                    self.timeout_policy.observe(future.method_name, latency)
+
+                if self.instrumentation is not None:
+                    # The requests that could not be sent have no result, only the error message of the SDK.
+                    result = response.get("result", response.get("message"))
+                    self.instrumentation.request_completed(future.method_name, latency, result)
+
+            future.set_result(response)
+
+    def __discard_request(self, id):
+        with self.pending_requests_lock:
+            future = self.pending_requests.pop(id, None)
+
+        if future is not None:
+            self.pending_requests_slots.release()
+            future.cancel()
+
     def __get_new_transfer_id(self):
-        self.transfer_id += MIN_TRANSFER_ID
+        # Skip the ids of the requests that are still waiting for a response.
+        while True:
+            self.transfer_id += MIN_TRANSFER_ID
 
-        if self.transfer_id == MAX_TRANSFER_ID:
-            self.transfer_id = MIN_TRANSFER_ID
+            if self.transfer_id == MAX_TRANSFER_ID:
+                self.transfer_id = MIN_TRANSFER_ID
 
-        return self.transfer_id
+            if self.transfer_id not in self.pending_requests:
+                return self.transfer_id
 
     def __camel_to_snake(self, name):
         return re.sub(r'(?<!^)(?<![A-Z])([A-Z])', r'_\1', name).lower()
 
-    def wait_for_notification(self, timeout = None):
-        self.notification_event.clear()
-        self.notification_event.wait(timeout=timeout)
-        return self.notification
+    def wait_for_response(self, future, timeout = None):
+        """
+        Blocks until the response of a submitted request is received and returns it, or returns None if it
+        does not arrive within the timeout. By default, the timeout is the one given by the timeout policy
+        when the request was sent, and the request is then discarded. A shorter timeout, e.g. to poll the
+        request, leaves it pending until the deadline of the timeout policy has passed.
+        """
+        if timeout is None:
+            timeout = future.timeout
+
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            if timeout < future.timeout and time.perf_counter() < future.deadline:
+                return None
+
+            if not future.done():
+                if self.instrumentation is not None:
+                    self.instrumentation.request_timed_out(future.method_name)
+                if self.timeout_policy.adaptive:
+                    self.timeout_policy.observe_timeout(future.method_name, future.timeout)
+            self.__discard_request(future.transfer_id)
+            return None
+        except concurrent.futures.CancelledError:
+            self.__discard_request(future.transfer_id)
+            return None
+
+    def cancel(self, future):
+        """
+        Cancels a submitted request. Whoever is waiting for its response gets None, and the response is
+        discarded if it arrives later.
+        """
+        self.__discard_request(future.transfer_id)
+
+    def cancel_all(self):
+        """
+        Cancels all the requests waiting for a response, e.g. after the target stopped responding.
+        """
+        with self.pending_requests_lock:
+            ids = list(self.pending_requests.keys())
+
+        for id in ids:
+            self.__discard_request(id)
+
+    def notification_queue(self, source, key = None):
+        """
+        Returns the queue of the notifications of a source, for instance notification_queue(NotificationSource.IBI, 0x08)
+        for the IBIs of the target with dynamic address 0x08, or notification_queue(NotificationSource.GPIO, GpioPinNumber.GPIO_5).
+        """
+        return self.notifications.queue(source, key)
+
+    def wait_for_notification(self, timeout = None, source = None, key = None):
+        """
+        Blocks until a notification is available and returns it, or returns None on timeout. By default,
+        the notification of any source is returned, otherwise only the notifications of the given source
+        and key, as in notification_queue().
+        """
+        if source is None:
+            return self.notifications.get_any(timeout)
+        return self.notifications.queue(source, key).get(timeout)
 
 # endregion
 
@@ -99,52 +587,56 @@ class SupernovaBlockingApi:
 # region Main code
 # ==================================================================================
 
-supernova_device = SupernovaBlockingApi()
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    # Open the device.
+    supernova_device.open()
 
-# Open the device.
-supernova_device.open()
+    # Get device manufacturer.
+    response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.MANUFACTURER)
 
-# Get device manufacturer.
-response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.MANUFACTURER)
+    if response["result"] == CommonResultCodes.SUCCESS.name:
+        print(f"Manufacturer: {response['payload']}")
+    else:
+        print(f"Error {response['result']}")
 
-if response["result"] == CommonResultCodes.SUCCESS.name:
-    print(f"Manufacturer: {response['payload']}")
-else:
-    print(f"Error {response['result']}")
+    # Get product name.
+    response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.PRODUCT_NAME)
 
-# Get product name.
-response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.PRODUCT_NAME)
+    if response["result"] == CommonResultCodes.SUCCESS.name:
+        print(f"Product name: {response['payload']}")
+    else:
+        print(f"Error {response['result']}")
 
-if response["result"] == CommonResultCodes.SUCCESS.name:
-    print(f"Product name: {response['payload']}")
-else:
-    print(f"Error {response['result']}")
+    # Get firmware version
+    response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.FW_VERSION)
 
-# Get firmware version
-response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.FW_VERSION)
+    if response["result"] == CommonResultCodes.SUCCESS.name:
+        print(f"Firmware version: {response['payload']}")
+    else:
+        print(f"Error {response['result']}")
 
-if response["result"] == CommonResultCodes.SUCCESS.name:
-    print(f"Firmware version: {response['payload']}")
-else:
-    print(f"Error {response['result']}")
+    # Get hardware version
+    response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.HW_VERSION)
 
-# Get hardware version
-response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.HW_VERSION)
+    if response["result"] == CommonResultCodes.SUCCESS.name:
+        print(f"Hardware version: {response['payload']}")
+    else:
+        print(f"Error {response['result']}")
 
-if response["result"] == CommonResultCodes.SUCCESS.name:
-    print(f"Hardware version: {response['payload']}")
-else:
-    print(f"Error {response['result']}")
+    # Get Serial Number
+    response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.SERIAL_NUMBER)
 
-# Get Serial Number
-response = supernova_device.get_usb_string(subCommand=GetUsbStringSubCommand.SERIAL_NUMBER)
+    if response["result"] == CommonResultCodes.SUCCESS.name:
+        print(f"Serial number: {response['payload']}")
+    else:
+        print(f"Error {response['result']}")
 
-if response["result"] == CommonResultCodes.SUCCESS.name:
-    print(f"Serial number: {response['payload']}")
-else:
-    print(f"Error {response['result']}")
+    # Close the device.
+    supernova_device.close()
 
-# Close the device.
-supernova_device.close()
+if __name__ == "__main__":
+    main()
 
 # endregion
\ No newline at end of file
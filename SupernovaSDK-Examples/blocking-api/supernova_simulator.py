@@ -0,0 +1,1003 @@
+import threading
+import collections
+import heapq
+import random
+import time
+from supernova_blocking_api import SupernovaBlockingApi
+
+# ==================================================================================
+# region Simulated targets
+# ==================================================================================
+
+class SimulatedI2cTarget:
+    """
+    I2C target with 256 8-bit registers. The register address is auto-incremented on reads and writes.
+    """
+
+    def __init__(self):
+        self.registers = bytearray(256)
+
+    def read(self, register_address, length):
+        return [self.read_register((register_address + i) & 0xFF) for i in range(length)]
+
+    def write(self, register_address, data):
+        for i, value in enumerate(data):
+            self.write_register((register_address + i) & 0xFF, value)
+
+    def read_register(self, register):
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        self.registers[register] = value & 0xFF
+
+class SimulatedICM42605(SimulatedI2cTarget):
+    """
+    Register map of the TDK InvenSense ICM-42605 6-axis IMU. The sensor data registers return the gravity
+    along the Z axis plus gaussian noise, scaled to the configured full scale ranges, once the sensors are
+    turned on. The FIFO is filled with packets at the accelerometer output data rate while it is in
+    stream mode.
+    """
+
+    WHO_AM_I_REGISTER = 0x75
+    WHO_AM_I_VALUE = 0x47
+    REG_BANK_SEL_REGISTER = 0x76
+    TEMP_DATA1_REGISTER = 0x1D
+    DATA_REGISTERS_LENGTH = 14
+    FIFO_CONFIG_REGISTER = 0x16
+    FIFO_COUNTH_REGISTER = 0x2E
+    FIFO_COUNTL_REGISTER = 0x2F
+    FIFO_DATA_REGISTER = 0x30
+    SIGNAL_PATH_RESET_REGISTER = 0x4B
+    PWR_MGMT0_REGISTER = 0x4E
+    GYRO_CONFIG0_REGISTER = 0x4F
+    ACCEL_CONFIG0_REGISTER = 0x50
+    FIFO_CONFIG2_REGISTER = 0x60
+    FIFO_CONFIG3_REGISTER = 0x61
+    INT_SOURCE0_REGISTER = 0x65
+    INT_SOURCE8_REGISTER = 0x4F # Bank 4
+
+    FIFO_STREAM_MODE = 0x40
+    FIFO_SIZE = 2048
+    FIFO_PACKET_LENGTH = 16
+    FIFO_PACKET_HEADER = 0x68
+    INVALID_SAMPLE = -32768
+
+    # Interrupts routed to the INT1 pin in the INT_SOURCE0 register, and to the IBIs in the INT_SOURCE8 register.
+    DATA_READY_INTERRUPT = 0x08
+    FIFO_THRESHOLD_INTERRUPT = 0x04
+    FIFO_FULL_INTERRUPT = 0x02
+
+    # Output data rates in Hz indexed by the ODR field of the ACCEL_CONFIG0 register.
+    ODR_VALUES = {0x01: 32000.0, 0x02: 16000.0, 0x03: 8000.0, 0x04: 4000.0, 0x05: 2000.0, 0x06: 1000.0, 0x07: 200.0,
+                  0x08: 100.0, 0x09: 50.0, 0x0A: 25.0, 0x0B: 12.5, 0x0C: 6.25, 0x0D: 3.125, 0x0E: 1.5625, 0x0F: 500.0}
+
+    def __init__(self, accel_noise = 0.002, gyro_noise = 0.05, seed = None):
+        self.banks = [bytearray(256) for _ in range(5)]
+        self.accel_noise = accel_noise
+        self.gyro_noise = gyro_noise
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.banks[0][self.WHO_AM_I_REGISTER] = self.WHO_AM_I_VALUE
+        self.banks[0][self.GYRO_CONFIG0_REGISTER] = 0x06
+        self.banks[0][self.ACCEL_CONFIG0_REGISTER] = 0x06
+
+        self.fifo = bytearray()
+        self.fifo_time = time.perf_counter()
+        self.sample_bytes = bytes()
+        self.interrupt_times = dict()
+
+    @property
+    def registers(self):
+        return self.banks[self.bank]
+
+    @property
+    def bank(self):
+        return self.banks[0][self.REG_BANK_SEL_REGISTER] & 0x07
+
+    def read(self, register_address, length):
+        with self.lock:
+            # The FIFO data register is not auto-incremented, every read byte is taken from the FIFO.
+            if self.bank == 0 and register_address == self.FIFO_DATA_REGISTER:
+                return self.__read_fifo(length)
+
+            # A burst read of the data registers returns the values of a single sample.
+            if self.bank == 0 and register_address < self.TEMP_DATA1_REGISTER + self.DATA_REGISTERS_LENGTH and register_address + length > self.TEMP_DATA1_REGISTER:
+                self.sample_bytes = self.__sample()
+
+            return super().read(register_address, length)
+
+    def write(self, register_address, data):
+        with self.lock:
+            super().write(register_address, data)
+
+    def read_register(self, register):
+        if self.bank == 0:
+            data_offset = register - self.TEMP_DATA1_REGISTER
+            if 0 <= data_offset < self.DATA_REGISTERS_LENGTH:
+                return self.sample_bytes[data_offset]
+            # The FIFO count is latched when its high byte is read.
+            if register == self.FIFO_COUNTH_REGISTER:
+                self.__fill_fifo()
+                return (len(self.fifo) >> 8) & 0xFF
+            if register == self.FIFO_COUNTL_REGISTER:
+                return len(self.fifo) & 0xFF
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        if register == self.REG_BANK_SEL_REGISTER:
+            self.banks[0][register] = value & 0x07
+            return
+
+        if self.bank == 0 and register == self.SIGNAL_PATH_RESET_REGISTER:
+            # The FIFO flush bit clears itself.
+            if value & 0x02:
+                self.fifo.clear()
+                self.fifo_time = time.perf_counter()
+            return
+
+        if self.bank == 0 and register == self.FIFO_CONFIG_REGISTER:
+            self.fifo_time = time.perf_counter()
+
+        self.registers[register] = value & 0xFF
+
+    def __full_scale(self):
+        accel_full_scale = 16.0 / (1 << (self.banks[0][self.ACCEL_CONFIG0_REGISTER] >> 5))
+        gyro_full_scale = 2000.0 / (1 << (self.banks[0][self.GYRO_CONFIG0_REGISTER] >> 5))
+        return accel_full_scale, gyro_full_scale
+
+    def __to_int16(self, value, full_scale):
+        return max(-32767, min(32767, int(round(value / full_scale * 32768.0))))
+
+    def __sample_values(self):
+        accel_full_scale, gyro_full_scale = self.__full_scale()
+        power = self.banks[0][self.PWR_MGMT0_REGISTER]
+
+        if power & 0x03:
+            accel = [self.__to_int16(self.random.gauss(gravity, self.accel_noise), accel_full_scale) for gravity in (0.0, 0.0, 1.0)]
+        else:
+            accel = [self.INVALID_SAMPLE] * 3
+
+        if power & 0x0C:
+            gyro = [self.__to_int16(self.random.gauss(0.0, self.gyro_noise), gyro_full_scale) for _ in range(3)]
+        else:
+            gyro = [self.INVALID_SAMPLE] * 3
+
+        return accel, gyro
+
+    def __sample(self):
+        accel, gyro = self.__sample_values()
+
+        # Temperature of 25 degrees Celsius.
+        return bytes([0, 0]) + b"".join(value.to_bytes(2, "big", signed=True) for value in accel + gyro)
+
+    def __fill_fifo(self):
+        now = time.perf_counter()
+
+        if self.banks[0][self.FIFO_CONFIG_REGISTER] & 0xC0 != self.FIFO_STREAM_MODE:
+            self.fifo_time = now
+            return
+
+        period = self.__period()
+        packets = int((now - self.fifo_time) / period)
+        self.fifo_time += packets * period
+
+        # Only the packets that fit in the FIFO are generated, the stream mode keeps the newest ones.
+        for _ in range(min(packets, self.FIFO_SIZE // self.FIFO_PACKET_LENGTH)):
+            accel, gyro = self.__sample_values()
+            self.fifo += bytes([self.FIFO_PACKET_HEADER])
+            self.fifo += b"".join(value.to_bytes(2, "big", signed=True) for value in accel + gyro)
+            self.fifo += bytes([0, 0, 0])
+
+        del self.fifo[:max(0, len(self.fifo) - self.FIFO_SIZE)]
+
+    def __read_fifo(self, length):
+        self.__fill_fifo()
+        data = self.fifo[:length]
+        del self.fifo[:length]
+
+        # Reading an empty FIFO returns the empty FIFO marker.
+        return list(data) + [0xFF] * (length - len(data))
+
+    def __period(self):
+        return 1.0 / self.ODR_VALUES.get(self.banks[0][self.ACCEL_CONFIG0_REGISTER] & 0x0F, 1000.0)
+
+    def __interrupt_due(self, output, sources):
+        """
+        Returns True when one of the interrupt sources is raised on the output: the data ready interrupt once
+        per output data rate period while the accelerometer is on, and the FIFO threshold and FIFO full interrupts
+        once per period while the FIFO holds at least the watermark, or is full.
+        """
+        with self.lock:
+            now = time.perf_counter()
+            if now - self.interrupt_times.get(output, 0.0) < self.__period():
+                return False
+            self.interrupt_times[output] = now
+
+            if sources & self.DATA_READY_INTERRUPT and self.banks[0][self.PWR_MGMT0_REGISTER] & 0x03:
+                return True
+
+            if sources & self.FIFO_THRESHOLD_INTERRUPT:
+                self.__fill_fifo()
+                watermark = self.banks[0][self.FIFO_CONFIG2_REGISTER] | (self.banks[0][self.FIFO_CONFIG3_REGISTER] << 8)
+                return len(self.fifo) >= max(1, watermark)
+
+            if sources & self.FIFO_FULL_INTERRUPT:
+                self.__fill_fifo()
+                return len(self.fifo) >= self.FIFO_SIZE
+
+            return False
+
+    def interrupt_due(self):
+        """
+        Returns True when the INT1 pin raises an interrupt.
+        """
+        return self.__interrupt_due("INT1", self.banks[0][self.INT_SOURCE0_REGISTER])
+
+    def ibi_due(self):
+        """
+        Returns True when an IBI is raised.
+        """
+        return self.__interrupt_due("IBI", self.banks[4][self.INT_SOURCE8_REGISTER])
+
+class SimulatedI3cTargetMemory:
+    """
+    Memory of the Supernova acting as I3C target.
+    """
+
+    def __init__(self, size = 1024):
+        self.memory = bytearray(size)
+
+    def read(self, address, length):
+        return list(self.memory[address:address + length])
+
+    def write(self, address, data):
+        data = bytes(data)[:max(0, len(self.memory) - address)]
+        self.memory[address:address + len(data)] = data
+
+class SimulatedFram:
+    """
+    I2C FRAM with 16-bit memory addresses, like the MB85RC256V. A write starts with the memory address,
+    and the reads continue from the address following the last byte accessed.
+    """
+
+    def __init__(self, size = 32 * 1024):
+        self.memory = bytearray(size)
+        self.address = 0
+
+    def write(self, data):
+        if len(data) >= 2:
+            self.address = ((data[0] << 8) | data[1]) % len(self.memory)
+        for value in data[2:]:
+            self.memory[self.address] = value
+            self.address = (self.address + 1) % len(self.memory)
+
+    def read(self, length):
+        data = [self.memory[(self.address + i) % len(self.memory)] for i in range(length)]
+        self.address = (self.address + length) % len(self.memory)
+        return data
+
+class SimulatedSpiFlash:
+    """
+    SPI NOR flash answering a subset of the W25Q64JV commands: JEDEC ID, read and write of the status
+    register 1, write enable and disable, read data and page program.
+    """
+
+    JEDEC_ID = [0xEF, 0x40, 0x17]
+
+    def __init__(self, size = 1024 * 1024):
+        self.memory = bytearray(b"\xFF" * size)
+        self.status = 0x00
+
+    def transfer(self, data, read_length):
+        """
+        Sends data with the chip select asserted, then reads read_length bytes before releasing it.
+        """
+        command = data[0] if len(data) > 0 else None
+        address = int.from_bytes(bytes(data[1:4]), "big") % len(self.memory) if len(data) >= 4 else 0
+        write_enabled = self.status & 0x02
+
+        if command == 0x9F:
+            return (self.JEDEC_ID + [0] * read_length)[:read_length]
+        if command == 0x05:
+            return [self.status] * read_length
+        if command == 0x06:
+            self.status |= 0x02
+        elif command == 0x04:
+            self.status &= ~0x02
+        elif command == 0x01 and write_enabled and len(data) >= 2:
+            self.status = data[1] & 0xFC
+        elif command == 0x02 and write_enabled:
+            # Programming only clears bits, and wraps around the 256 bytes page.
+            for i, value in enumerate(data[4:]):
+                position = (address & ~0xFF) | ((address + i) & 0xFF)
+                self.memory[position] &= value
+            self.status &= ~0x02
+        elif command == 0x03:
+            return [self.memory[(address + i) % len(self.memory)] for i in range(read_length)]
+
+        return [0xFF] * read_length
+
+class SimulatedPic18f16q20Translator:
+    """
+    PIC18F16Q20 I3C to SPI and I2C protocol translator, running the firmware of the translator notebook.
+    Every I3C private write carries one command, executed on the downstream I2C targets, indexed by their
+    7-bit address, or on the SPI flash selected with the chip select 1. The data read downstream is sent
+    back with an IBI, whose payload starts with the mandatory data byte 0x00.
+
+    After a command, the translator does not acknowledge private writes for busy_time seconds, the time
+    it takes to execute the command and to be ready to receive the next one.
+    """
+
+    I2C_WRITE_COMMAND = 0x40
+    I2C_READ_COMMAND = 0x20
+    SPI_WRITE_READ_COMMAND = 0x60
+    COMMAND_MASK = 0x60
+    CHIP_SELECT_MASK = 0x07
+
+    def __init__(self, busy_time = 0.0002):
+        self.i2c_targets = {0x50: SimulatedFram()}
+        self.spi_flash = SimulatedSpiFlash()
+        self.busy_time = busy_time
+        self.busy_until = 0.0
+        self.ibis = collections.deque()
+        self.error_status = [0x00]
+
+    def is_busy(self):
+        return time.perf_counter() < self.busy_until
+
+    def write(self, register_address, data):
+        if len(data) == 0:
+            return
+
+        command = data[0] & self.COMMAND_MASK
+        chip_select = data[0] & self.CHIP_SELECT_MASK
+        self.busy_until = time.perf_counter() + self.busy_time
+
+        if command == self.SPI_WRITE_READ_COMMAND and len(data) >= 2:
+            self.ibis.append([0x00] + self.spi_flash.transfer(data[2:], data[1]))
+        elif chip_select != 0:
+            # The chip select 1 is the only one connected to a device.
+            if command == self.I2C_WRITE_COMMAND:
+                self.spi_flash.transfer(data[1:], 0)
+            elif command == self.I2C_READ_COMMAND and len(data) >= 2:
+                self.ibis.append([0x00] + self.spi_flash.transfer([], data[1]))
+        elif len(data) >= 2:
+            target = self.i2c_targets.get(data[1] >> 1)
+
+            if target is None:
+                self.error_status = [0x03] # Address NACK
+            elif command == self.I2C_WRITE_COMMAND:
+                target.write(data[2:])
+            elif command == self.I2C_READ_COMMAND and len(data) >= 3:
+                self.ibis.append([0x00] + target.read(data[2]))
+
+    def read(self, register_address, length):
+        return (self.error_status + [0] * length)[:length]
+
+    def ibi_due(self):
+        return len(self.ibis) > 0
+
+    def ibi_payload(self):
+        return self.ibis.popleft()
+
+# endregion
+
+# ==================================================================================
+# region Simulator
+# ==================================================================================
+
+class SupernovaSimulator:
+    """
+    In-process replacement of the Supernova class, for running the host-side code without a host adapter.
+    It implements the same methods, and the responses and notifications are delivered to the onEvent
+    callback from a separate thread, like the SDK does.
+
+    The delivery of the responses can be tuned to stress the host-side code: every response is delayed by
+    latency plus a random jitter, out_of_order allows the responses to overtake each other when their
+    delays differ, and drop_rate is the probability of a response never being delivered.
+
+    Simulated targets: I2C targets added with add_i2c_target(), an ICM-42605 at the address 0x68 by default,
+    I3C targets in self.i3c_targets indexed by dynamic address, a register map at 0x08 by default, the I3C
+    target memory, a UART loopback and a SPI loopback. GPIO interrupts are raised with
+    trigger_gpio_interrupt(), and the I3C targets with an ibi_due() method raise IBIs once enabled with ENEC.
+    """
+
+    # Public methods of the simulator that are not SDK requests, and must not be wrapped as such by the APIs.
+    helper_methods = ["add_i2c_target", "add_i3c_target", "connect_interrupt", "trigger_gpio_interrupt", "controller_write_target_memory"]
+
+    def __init__(self, latency = 0.0005, jitter = 0.0, out_of_order = False, drop_rate = 0.0, seed = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.out_of_order = out_of_order
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+        self.callback = None
+        self.is_open = False
+
+        # Responses waiting to be delivered, ordered by delivery time.
+        self.deliveries = []
+        self.deliveries_condition = threading.Condition()
+        self.delivery_sequence = 0
+        self.last_delivery_time = 0.0
+        self.delivery_thread = None
+
+        # Statistics
+        self.requests = 0
+        self.dropped_responses = 0
+
+        self.i2c_targets = {0x68: SimulatedICM42605(seed=seed)}
+        self.i3c_targets = {0x08: SimulatedI2cTarget()}
+        self.i3c_target_memory = SimulatedI3cTargetMemory()
+        self.gpio_levels = dict()
+        self.gpio_interrupts = set()
+
+        # Dynamic addresses of the I3C targets allowed to send IBIs, targets connected to the GPIO pins, and
+        # the thread that raises their interrupts.
+        self.i3c_ibi_enabled = set()
+        self.gpio_interrupt_sources = dict()
+        self.interrupt_thread = None
+
+    def add_i2c_target(self, address, target):
+        self.i2c_targets[address] = target
+
+    def add_i3c_target(self, dynamic_address, target):
+        self.i3c_targets[dynamic_address] = target
+
+    # Connection ------------------------------------------------------------------------
+
+    def __system_message(self, opcode = 0, message = "Success"):
+        return {"module": 0, "opcode": opcode, "message": message}
+
+    def open(self, serial = None, path = None):
+        if not self.is_open:
+            self.is_open = True
+            self.delivery_thread = threading.Thread(target=self.__deliver, daemon=True)
+            self.delivery_thread.start()
+        return self.__system_message(message="Connection with Supernova simulator opened successfully.")
+
+    def close(self):
+        if not self.is_open:
+            return self.__system_message(2, "It is required to open connection with a Supernova first. Invoke open() method.")
+
+        with self.deliveries_condition:
+            self.is_open = False
+            self.deliveries_condition.notify()
+        self.delivery_thread.join()
+
+        return self.__system_message(message="Communication with Supernova simulator closed successfully.")
+
+    def onEvent(self, callback_func):
+        self.callback = callback_func
+        return self.__system_message(message="On event callback function registered successfully.")
+
+    # Delivery --------------------------------------------------------------------------
+
+    def __deliver(self):
+        while True:
+            with self.deliveries_condition:
+                while self.is_open and (len(self.deliveries) == 0 or self.deliveries[0][0] > time.perf_counter()):
+                    timeout = None if len(self.deliveries) == 0 else self.deliveries[0][0] - time.perf_counter()
+                    self.deliveries_condition.wait(timeout)
+
+                if not self.is_open:
+                    return
+
+                _, _, message = heapq.heappop(self.deliveries)
+
+            if self.callback is not None:
+                self.callback(message, None)
+
+    def __schedule(self, message):
+        delay = self.latency + (self.random.uniform(0.0, self.jitter) if self.jitter > 0 else 0.0)
+
+        with self.deliveries_condition:
+            delivery_time = time.perf_counter() + delay
+
+            # Unless out of order responses are allowed, a response never overtakes the previous one.
+            if not self.out_of_order:
+                delivery_time = max(delivery_time, self.last_delivery_time)
+            self.last_delivery_time = delivery_time
+
+            heapq.heappush(self.deliveries, (delivery_time, self.delivery_sequence, message))
+            self.delivery_sequence += 1
+            self.deliveries_condition.notify()
+
+    def __respond(self, id, command, result = "SUCCESS", **fields):
+        if not self.is_open or self.callback is None:
+            return self.__system_message(1, "Supernova not configured appropriately, please check if connection is open and callback is set")
+
+        self.requests += 1
+
+        if self.drop_rate > 0 and self.random.random() < self.drop_rate:
+            self.dropped_responses += 1
+        else:
+            self.__schedule(dict({"id": id, "command": command, "result": result}, **fields))
+
+        return self.__system_message()
+
+    def __notify(self, command, result = "SUCCESS", **fields):
+        self.__schedule(dict({"id": 0, "command": command, "result": result}, **fields))
+
+    def __name(self, value):
+        return getattr(value, "name", value)
+
+    # System ----------------------------------------------------------------------------
+
+    def getUsbString(self, id, subCommand):
+        strings = {"MANUFACTURER": "MN-Binho LLC", "PRODUCT_NAME": "PR-Supernova Simulator", "SERIAL_NUMBER": "SN-SIMULATOR",
+                   "FW_VERSION": "FW-0.0.0", "HW_VERSION": "HW-SIM", "BL_VERSION": "BL-0.0.0"}
+        payload = strings.get(self.__name(subCommand), "")
+        return self.__respond(id, "SYS GET USB STRING", payload_length=len(payload), payload=payload)
+
+    def setI2cSpiUartGpioVoltage(self, id, voltage_mV):
+        return self.__respond(id, "SYS SET I2C SPI UART GPIO VOLTAGE")
+
+    def setI3cVoltage(self, id, voltage_mV):
+        return self.__respond(id, "SYS SET I3C VOLTAGE")
+
+    def resetDevice(self, id):
+        return self.__system_message()
+
+    def enterBootMode(self, id):
+        return self.__system_message()
+
+    def enterIspMode(self, id):
+        return self.__system_message()
+
+    def getDeviceInfo(self, id):
+        return self.__respond(id, "SYS GET DEVICE INFO", manufacturer="Binho LLC", product_name="Supernova Simulator",
+                              serial_number="SIMULATOR", hardware_version="SIM", firmware_version="0.0.0",
+                              capabilities={"supported_groups": ["SYS", "I2C", "I3C", "SPI", "UART", "GPIO"]})
+
+    def getAnalogMeasurements(self, id):
+        return self.__respond(id, "SYS GET ANALOG MEASUREMENTS",
+                              i2c_spi_uart_gpio_vtarg={"internal_mV": 3300, "external_mV": 0},
+                              i3c_low_voltage_vtarg={"internal_mV": 1200, "external_mV": 0},
+                              i3c_high_voltage_vtarg={"internal_mV": 3300, "external_mV": 0})
+
+    def getI3cConnectorsStatus(self, id):
+        return self.__respond(id, "SYS GET I3C CONNECTOR STATUS",
+                              i3c_low_voltage_port={"state": "I3C_CONNECTOR_UNPLUGGED", "connector_type": "NO_CONNECTOR"},
+                              i3c_high_voltage_port={"state": "I3C_CONNECTOR_UNPLUGGED", "connector_type": "NO_CONNECTOR"})
+
+    def useExternalI3cVoltage(self, id):
+        return self.__respond(id, "SYS USE EXTERNAL I3C VOLTAGE")
+
+    def useExternalI2cSpiUartGpioVoltage(self, id):
+        return self.__respond(id, "SYS USE EXTERNAL I2C SPI UART GPIO VOLTAGE")
+
+    # I2C -------------------------------------------------------------------------------
+
+    def i2cControllerInit(self, id, frequency, pullUpResistorsValue):
+        return self.__respond(id, "I2C CONTROLLER INIT")
+
+    def i2cControllerSetParameters(self, id, frequency, pullUpResistorsValue):
+        return self.__respond(id, "I2C CONTROLLER SET PARAMETERS")
+
+    def i2cSetPullUpResistors(self, id, pullUpResistorsValue):
+        return self.__respond(id, "I2C SET PULLUP RESISTORS")
+
+    def i2cControllerWrite(self, id, targetAddress, registerAddress, data, isNonStop = False, is10BitTargetAddress = False):
+        target = self.i2c_targets.get(targetAddress)
+        if target is None:
+            return self.__respond(id, "I2C CONTROLLER WRITE", "I2C_NACK_ADDRESS", payload_length=0)
+
+        target.write(registerAddress[0] if len(registerAddress) > 0 else 0, data)
+        return self.__respond(id, "I2C CONTROLLER WRITE", payload_length=len(registerAddress) + len(data))
+
+    def i2cControllerRead(self, id, targetAddress, requestDataLength, registerAddress = [], is10BitTargetAddress = False):
+        target = self.i2c_targets.get(targetAddress)
+        if target is None:
+            return self.__respond(id, "I2C CONTROLLER READ", "I2C_NACK_ADDRESS", payload_length=0, payload=[])
+
+        payload = target.read(registerAddress[0] if len(registerAddress) > 0 else 0, requestDataLength)
+        return self.__respond(id, "I2C CONTROLLER READ", payload_length=len(payload), payload=payload)
+
+    def i2cControllerScanBus(self, id, include10BitAddresses = False):
+        return self.__respond(id, "I2C CONTROLLER SCAN BUS", detected_7_bit_addresses=sorted(self.i2c_targets.keys()), detected_10_bit_addresses=[])
+
+    # I3C controller --------------------------------------------------------------------
+
+    def i3cControllerInit(self, id, *args, **kwargs):
+        return self.__respond(id, "I3C CONTROLLER INIT")
+
+    def i3cControllerInitBus(self, id, targetDeviceTable = None):
+        return self.__respond(id, "I3C CONTROLLER INIT BUS", invalid_addresses=[])
+
+    def i3cControllerSetParameters(self, id, pushPullRate, i3cOpenDrainRate, i2cOpenDrainRate, driveStrength = None):
+        return self.__respond(id, "I3C CONTROLLER SET PARAMETERS")
+
+    def i3cControllerResetBus(self, id):
+        return self.__respond(id, "I3C CONTROLLER RESET BUS")
+
+    def i3cControllerTriggerHdrExitPattern(self, id):
+        return self.__respond(id, "I3C CONTROLLER TRIGGER PATTERN", pattern="I3C_HDR_EXIT_PATTERN")
+
+    def i3cControllerTriggerTargetResetPattern(self, id):
+        return self.__respond(id, "I3C CONTROLLER TRIGGER PATTERN", pattern="I3C_TARGET_RESET_PATTERN")
+
+    def __i3c_table_entry(self, dynamic_address, target):
+        # The targets can define their static address, PID, BCR and DCR as attributes.
+        return {
+            "static_address": getattr(target, "static_address", 0),
+            "dynamic_address": dynamic_address,
+            "pid": list(getattr(target, "pid", [0] * 6)),
+            "bcr": getattr(target, "bcr", 0),
+            "dcr": getattr(target, "dcr", 0),
+            "mwl": getattr(target, "mwl", 1024),
+            "mrl": getattr(target, "mrl", 1024),
+            "max_ibi_payload_length": getattr(target, "max_ibi_payload_length", 0),
+            "configuration": dict()
+        }
+
+    def i3cControllerSetTargetDeviceConfiguration(self, id, targetAddress, configuration):
+        return self.__respond(id, "I3C CONTROLLER SET TARGET DEVICE CONFIG")
+
+    def i3cControllerGetTargetDevicesTable(self, id):
+        table = [self.__i3c_table_entry(address, target) for address, target in sorted(self.i3c_targets.items())]
+        return self.__respond(id, "I3C CONTROLLER GET TARGET DEVICES TABLE", number_of_targets=len(table), table=table)
+
+    def i3cControllerWrite(self, id, targetAddress, mode, registerAddress, data, startWith7E = True):
+        target = self.i3c_targets.get(targetAddress)
+        if target is None or (hasattr(target, "is_busy") and target.is_busy()):
+            return self.__respond(id, "I3C CONTROLLER PRIVATE TRANSFER", "I3C_NACK_ADDRESS", payload_length=0)
+
+        target.write(registerAddress[0] if len(registerAddress) > 0 else 0, data)
+        return self.__respond(id, "I3C CONTROLLER PRIVATE TRANSFER", payload_length=len(data))
+
+    def i3cControllerRead(self, id, targetAddress, mode, registerAddress, length, startWith7E = True):
+        target = self.i3c_targets.get(targetAddress)
+        if target is None:
+            return self.__respond(id, "I3C CONTROLLER PRIVATE TRANSFER", "I3C_NACK_ADDRESS", payload_length=0, payload=[])
+
+        payload = target.read(registerAddress[0] if len(registerAddress) > 0 else 0, length)
+        return self.__respond(id, "I3C CONTROLLER PRIVATE TRANSFER", payload_length=len(payload), payload=payload)
+
+    def i3cENTDAA(self, id, targetDeviceTable = None):
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="B_ENTDAA", payload_length=0)
+
+    def i3cRSTDAA(self, id):
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="B_RSTDAA", payload_length=0)
+
+    def i3cSETNEWDA(self, id, oldAddress, newAddress):
+        if oldAddress not in self.i3c_targets or newAddress in self.i3c_targets:
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", "I3C_NACK_ADDRESS", ccc="D_SETNEWDA", payload_length=0)
+
+        self.i3c_targets[newAddress] = self.i3c_targets.pop(oldAddress)
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="D_SETNEWDA", payload_length=0)
+
+    def i3cSETDASA(self, id, staticAddress, dynamicAddress):
+        # The target with the static address is moved to the dynamic address, wherever it was.
+        address = next((address for address, target in self.i3c_targets.items() if getattr(target, "static_address", 0) == staticAddress), None)
+        if address is None or (dynamicAddress in self.i3c_targets and dynamicAddress != address):
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", "I3C_NACK_ADDRESS", ccc="D_SETDASA", payload_length=0)
+
+        self.i3c_targets[dynamicAddress] = self.i3c_targets.pop(address)
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="D_SETDASA", payload_length=0)
+
+    def i3cSETAASA(self, id, staticAddresses):
+        # The targets with the static addresses take them as dynamic addresses.
+        for address, target in list(self.i3c_targets.items()):
+            static_address = getattr(target, "static_address", 0)
+            if static_address in staticAddresses and static_address not in self.i3c_targets:
+                self.i3c_targets[static_address] = self.i3c_targets.pop(address)
+
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="B_SETAASA", payload_length=0)
+
+    def i3cDirectENEC(self, id, targetAddress, events):
+        if targetAddress not in self.i3c_targets:
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", "I3C_NACK_ADDRESS", ccc="D_ENEC", payload_length=0)
+
+        if "ENINT" in [self.__name(event) for event in events]:
+            self.i3c_ibi_enabled.add(targetAddress)
+            self.__start_interrupts()
+
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="D_ENEC", payload_length=1)
+
+    def i3cDirectDISEC(self, id, targetAddress, events):
+        if targetAddress not in self.i3c_targets:
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", "I3C_NACK_ADDRESS", ccc="D_DISEC", payload_length=0)
+
+        if "DISINT" in [self.__name(event) for event in events]:
+            self.i3c_ibi_enabled.discard(targetAddress)
+
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc="D_DISEC", payload_length=1)
+
+    def __ccc(self, id, ccc, targetAddress = None, payload = None, payload_length = 0):
+        # Generic CCC: the direct ones are not acknowledged by a missing target, and the reads return the payload.
+        if targetAddress is not None and targetAddress not in self.i3c_targets:
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", "I3C_NACK_ADDRESS", ccc=ccc, payload_length=0)
+
+        if payload is None:
+            return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc=ccc, payload_length=payload_length)
+        return self.__respond(id, "I3C CONTROLLER CCC TRANSFER", ccc=ccc, payload_length=len(payload), payload=list(payload))
+
+    def i3cControllerCccTransfer(self, id, cmdType, direction, targetAddress, mode, defByte, ccc, length, data):
+        # The direct CCCs are the ones with codes from 0x80 on.
+        ccc = self.__name(ccc)
+        direct = ccc.startswith("D_") if isinstance(ccc, str) else ccc >= 0x80
+        targetAddress = targetAddress if direct else None
+        if self.__name(direction) == "READ":
+            return self.__ccc(id, ccc, targetAddress, [0x00] * length)
+        return self.__ccc(id, ccc, targetAddress, payload_length=len(data))
+
+    def i3cBroadcastENEC(self, id, events):
+        if "ENINT" in [self.__name(event) for event in events]:
+            self.i3c_ibi_enabled.update(self.i3c_targets.keys())
+            self.__start_interrupts()
+        return self.__ccc(id, "B_ENEC", payload_length=1)
+
+    def i3cBroadcastDISEC(self, id, events):
+        if "DISINT" in [self.__name(event) for event in events]:
+            self.i3c_ibi_enabled.clear()
+        return self.__ccc(id, "B_DISEC", payload_length=1)
+
+    def i3cBroadcastSETMWL(self, id, mwl):
+        for target in self.i3c_targets.values():
+            target.mwl = mwl
+        return self.__ccc(id, "B_SETMWL", payload_length=2)
+
+    def i3cBroadcastSETMRL(self, id, mrl, ibiPayloadSize = None):
+        for target in self.i3c_targets.values():
+            target.mrl = mrl
+            if ibiPayloadSize is not None:
+                target.max_ibi_payload_length = ibiPayloadSize
+        return self.__ccc(id, "B_SETMRL", payload_length=2 if ibiPayloadSize is None else 3)
+
+    def i3cDirectSETMWL(self, id, targetAddress, mwl):
+        if targetAddress in self.i3c_targets:
+            self.i3c_targets[targetAddress].mwl = mwl
+        return self.__ccc(id, "D_SETMWL", targetAddress, payload_length=2)
+
+    def i3cDirectSETMRL(self, id, targetAddress, mrl, ibiPayloadSize = None):
+        if targetAddress in self.i3c_targets:
+            self.i3c_targets[targetAddress].mrl = mrl
+            if ibiPayloadSize is not None:
+                self.i3c_targets[targetAddress].max_ibi_payload_length = ibiPayloadSize
+        return self.__ccc(id, "D_SETMRL", targetAddress, payload_length=2 if ibiPayloadSize is None else 3)
+
+    def i3cGETPID(self, id, targetAddress):
+        return self.__ccc(id, "D_GETPID", targetAddress, getattr(self.i3c_targets.get(targetAddress), "pid", [0] * 6))
+
+    def i3cGETBCR(self, id, targetAddress):
+        return self.__ccc(id, "D_GETBCR", targetAddress, [getattr(self.i3c_targets.get(targetAddress), "bcr", 0)])
+
+    def i3cGETDCR(self, id, targetAddress):
+        return self.__ccc(id, "D_GETDCR", targetAddress, [getattr(self.i3c_targets.get(targetAddress), "dcr", 0)])
+
+    def i3cGETMWL(self, id, targetAddress):
+        mwl = getattr(self.i3c_targets.get(targetAddress), "mwl", 1024)
+        return self.__ccc(id, "D_GETMWL", targetAddress, [mwl >> 8, mwl & 0xFF])
+
+    def i3cGETMRL(self, id, targetAddress):
+        target = self.i3c_targets.get(targetAddress)
+        mrl = getattr(target, "mrl", 1024)
+        return self.__ccc(id, "D_GETMRL", targetAddress, [mrl >> 8, mrl & 0xFF, getattr(target, "max_ibi_payload_length", 0)])
+
+    # The targets report no pending interrupt, activity state, timing or extended capability.
+
+    def i3cGETSTATUS(self, id, targetAddress, defByte = None):
+        return self.__ccc(id, "D_GETSTATUS", targetAddress, [0x00, 0x00])
+
+    def i3cGETACCCR(self, id, targetAddress):
+        return self.__ccc(id, "D_GETACCCR", targetAddress, [0x00])
+
+    def i3cGETMXDS(self, id, targetAddress):
+        return self.__ccc(id, "D_GETMXDS", targetAddress, [0x00, 0x00])
+
+    def i3cGETCAPS(self, id, targetAddress, defByte = None):
+        return self.__ccc(id, "D_GETCAPS", targetAddress, [0x01, 0x00])
+
+    def i3cGETXTIME(self, id, targetAddress):
+        return self.__ccc(id, "D_GETXTIME", targetAddress, [0x00] * 4)
+
+    def i3cBroadcastENTAS0(self, id):
+        return self.__ccc(id, "B_ENTAS0")
+
+    def i3cBroadcastENTAS1(self, id):
+        return self.__ccc(id, "B_ENTAS1")
+
+    def i3cBroadcastENTAS2(self, id):
+        return self.__ccc(id, "B_ENTAS2")
+
+    def i3cBroadcastENTAS3(self, id):
+        return self.__ccc(id, "B_ENTAS3")
+
+    def i3cBroadcastRSTGRPA(self, id):
+        return self.__ccc(id, "B_RSTGRPA")
+
+    def i3cBroadcastRSTACT(self, id, defByte):
+        return self.__ccc(id, "B_RSTACT")
+
+    def i3cBroadcastSETBUSCON(self, id, context, data = []):
+        return self.__ccc(id, "B_SETBUSCON", payload_length=1 + len(data))
+
+    def i3cBroadcastSETXTIME(self, id, subCMDByte, data = []):
+        return self.__ccc(id, "B_SETXTIME", payload_length=1 + len(data))
+
+    def i3cBroadcastENDXFER(self, id, definingByte, data = []):
+        return self.__ccc(id, "B_ENDXFER", payload_length=len(data))
+
+    def i3cDirectENTAS0(self, id, targetAddress):
+        return self.__ccc(id, "D_ENTAS0", targetAddress)
+
+    def i3cDirectENTAS1(self, id, targetAddress):
+        return self.__ccc(id, "D_ENTAS1", targetAddress)
+
+    def i3cDirectENTAS2(self, id, targetAddress):
+        return self.__ccc(id, "D_ENTAS2", targetAddress)
+
+    def i3cDirectENTAS3(self, id, targetAddress):
+        return self.__ccc(id, "D_ENTAS3", targetAddress)
+
+    def i3cDirectRSTGRPA(self, id, targetAddress):
+        return self.__ccc(id, "D_RSTGRPA", targetAddress)
+
+    def i3cDirectSETGRPA(self, id, targetAddress, grpa):
+        return self.__ccc(id, "D_SETGRPA", targetAddress, payload_length=1)
+
+    def i3cDirectRSTACT(self, id, targetAddress, defByte, direction):
+        if self.__name(direction) == "READ":
+            return self.__ccc(id, "D_RSTACT", targetAddress, [0x00])
+        return self.__ccc(id, "D_RSTACT", targetAddress)
+
+    def i3cDirectSETXTIME(self, id, targetAddress, subCMDByte, data = []):
+        return self.__ccc(id, "D_SETXTIME", targetAddress, payload_length=1 + len(data))
+
+    def i3cDirectENDXFER(self, id, targetAddress, definingByte, data = 0, direction = None):
+        if self.__name(direction) == "READ":
+            return self.__ccc(id, "D_ENDXFER", targetAddress, [0x00])
+        return self.__ccc(id, "D_ENDXFER", targetAddress, payload_length=1)
+
+    # I3C target ------------------------------------------------------------------------
+
+    def i3cTargetInit(self, id, *args, **kwargs):
+        return self.__respond(id, "I3C TARGET INIT")
+
+    def i3cTargetSetParameters(self, id, memoryLayout, pid, bcr, dcr, staticAddress, mwl = 1024, mrl = 1024):
+        return self.__respond(id, "I3C TARGET SET PARAMETERS")
+
+    def i3cTargetWriteMemory(self, id, memoryAddress, data):
+        self.i3c_target_memory.write(memoryAddress, data)
+        return self.__respond(id, "I3C TARGET WRITE MEMORY")
+
+    def i3cTargetReadMemory(self, id, memoryAddress, length):
+        payload = self.i3c_target_memory.read(memoryAddress, length)
+        return self.__respond(id, "I3C TARGET READ MEMORY", payload_length=len(payload), payload=payload)
+
+    def controller_write_target_memory(self, memoryAddress, data, targetAddress = 0x21):
+        """
+        Writes the I3C target memory as the I3C controller would, and sends the bus event notification.
+        """
+        self.i3c_target_memory.write(memoryAddress, data)
+        self.__notify("I3C TARGET BUS EVENT NOTIFICATION", event="I3C_WRITE_TRANSFER_EVENT", target_address=targetAddress,
+                      memory_address=memoryAddress, payload_length=len(data), payload=list(data))
+
+    # UART ------------------------------------------------------------------------------
+
+    def uartInit(self, id, baudrate, hardwareHandshake, parityMode, dataSize, stopBit):
+        return self.__respond(id, "UART INIT")
+
+    def uartSetParameters(self, id, baudrate, hardwareHandshake, parityMode, dataSize, stopBit):
+        return self.__respond(id, "UART SET PARAMETERS")
+
+    def uartSendMessage(self, id, data):
+        response = self.__respond(id, "UART SEND")
+
+        # The data sent is received back as in a TX to RX loopback.
+        if response["opcode"] == 0:
+            self.__notify("UART RECEIVE NOTIFICATION", payload_length=len(data), payload=list(data))
+
+        return response
+
+    # SPI -------------------------------------------------------------------------------
+
+    def spiControllerInit(self, id, *args, **kwargs):
+        return self.__respond(id, "SPI CONTROLLER INIT")
+
+    def spiControllerSetParameters(self, id, *args, **kwargs):
+        return self.__respond(id, "SPI CONTROLLER SET PARAMETERS")
+
+    def spiControllerTransfer(self, id, transferLength, payload):
+        # The data sent is received back as in a MOSI to MISO loopback.
+        data = (list(payload) + [0] * transferLength)[:transferLength]
+        return self.__respond(id, "SPI CONTROLLER TRANSFER", payload_length=len(data), payload=data)
+
+    # GPIO ------------------------------------------------------------------------------
+
+    def gpioConfigurePin(self, id, pinNumber, functionality, initialOutputLogicLevel = None):
+        self.gpio_levels[self.__name(pinNumber)] = self.__name(initialOutputLogicLevel) or "LOW"
+        return self.__respond(id, "GPIO CONFIGURE PIN")
+
+    def gpioDigitalWrite(self, id, pinNumber, logicLevel):
+        self.gpio_levels[self.__name(pinNumber)] = self.__name(logicLevel)
+        return self.__respond(id, "GPIO DIGITAL WRITE")
+
+    def gpioDigitalRead(self, id, pinNumber):
+        return self.__respond(id, "GPIO DIGITAL READ", logic_level=self.gpio_levels.get(self.__name(pinNumber), "LOW"))
+
+    def gpioSetInterrupt(self, id, pinNumber, trigger):
+        self.gpio_interrupts.add(self.__name(pinNumber))
+        if self.__name(pinNumber) in self.gpio_interrupt_sources:
+            self.__start_interrupts()
+        return self.__respond(id, "GPIO SET INTERRUPT")
+
+    def gpioDisableInterrupt(self, id, pinNumber):
+        self.gpio_interrupts.discard(self.__name(pinNumber))
+        return self.__respond(id, "GPIO DISABLE INTERRUPT")
+
+    def trigger_gpio_interrupt(self, pinNumber):
+        """
+        Sends a GPIO interrupt notification if the interrupt of the pin is enabled.
+        """
+        if self.__name(pinNumber) in self.gpio_interrupts:
+            self.__notify("GPIO INTERRUPT NOTIFICATION", pin_number=self.__name(pinNumber))
+
+    def connect_interrupt(self, pinNumber, target):
+        """
+        Connects the interrupt output of a simulated target, like the INT1 pin of the SimulatedICM42605, to a
+        GPIO pin. The target raises the GPIO interrupts when its interrupt_due() method returns True.
+        """
+        self.gpio_interrupt_sources[self.__name(pinNumber)] = target
+
+    # Interrupts ------------------------------------------------------------------------
+
+    def __start_interrupts(self):
+        # The interrupts of the targets are raised from their own thread, only started when they are first enabled.
+        if self.interrupt_thread is None:
+            self.interrupt_thread = threading.Thread(target=self.__raise_interrupts, daemon=True)
+            self.interrupt_thread.start()
+
+    def __raise_interrupts(self):
+        while self.is_open:
+            # The I3C targets that can raise IBIs, like the SimulatedICM42605, tell when one is due with ibi_due(),
+            # and give its payload with ibi_payload() if it is not only a mandatory data byte.
+            for address in list(self.i3c_ibi_enabled):
+                target = self.i3c_targets.get(address)
+                if target is not None and hasattr(target, "ibi_due") and target.ibi_due():
+                    payload = target.ibi_payload() if hasattr(target, "ibi_payload") else [0x02]
+                    self.__notify("I3C CONTROLLER IBI REQUEST NOTIFICATION", "IBI_REQUEST_ACCEPTED_WITH_PAYLOAD",
+                                  target_address=address, payload_length=len(payload), payload=payload)
+
+            for pin_number, target in list(self.gpio_interrupt_sources.items()):
+                if pin_number in self.gpio_interrupts and target.interrupt_due():
+                    self.__notify("GPIO INTERRUPT NOTIFICATION", pin_number=pin_number)
+
+            time.sleep(0.0001)
+
+        self.interrupt_thread = None
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    # Simulated host adapter with 1 ms +/- 0.5 ms response time.
+    supernova_device = SupernovaBlockingApi(device=SupernovaSimulator(latency=0.0005, jitter=0.001, out_of_order=True))
+
+    supernova_device.open()
+
+    # Read the ICM-42605 WHO_AM_I register 1000 times, first one request after the other and then pipelined.
+    start_time = time.perf_counter()
+    for _ in range(1000):
+        supernova_device.i2c_controller_read(targetAddress=0x68, requestDataLength=1, registerAddress=[0x75])
+    sequential_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    futures = [supernova_device.i2c_controller_read.submit(targetAddress=0x68, requestDataLength=1, registerAddress=[0x75]) for _ in range(1000)]
+    responses = [supernova_device.wait_for_response(future) for future in futures]
+    pipelined_time = time.perf_counter() - start_time
+
+    print(f"Sequential: {1000 / sequential_time:.0f} requests/s")
+    print(f"Pipelined: {1000 / pipelined_time:.0f} requests/s, {sum(response['payload'] == [0x47] for response in responses)} valid responses")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,290 @@
+import time
+import asyncio
+import threading
+import collections
+from binhosupernova.commands.system.definitions import *
+from binhosupernova.commands.uart.definitions import *
+from supernova_blocking_api import SupernovaBlockingApi, NotificationSource
+
+# ==================================================================================
+# region UART stream
+# ==================================================================================
+
+# Maximum number of received bytes kept until they are read. When the buffer is full, the oldest bytes are dropped.
+DEFAULT_RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Number of packets sent before waiting for the response of the oldest one.
+DEFAULT_PACKETS_IN_FLIGHT = 8
+
+class ReceiveBuffer:
+    """
+    Growable FIFO of the received bytes. The bytes are appended at the end of a bytearray and consumed from
+    a start offset, the consumed bytes are only released once they are half of the bytearray, so appending
+    and reading are amortized constant time per byte. The buffer grows as needed up to max_size bytes,
+    beyond that the oldest bytes are dropped and counted as overrun.
+    """
+
+    def __init__(self, max_size = DEFAULT_RECEIVE_BUFFER_SIZE):
+        self.max_size = max_size
+        self.data = bytearray()
+        self.start = 0
+        self.line_search_start = 0
+        self.condition = threading.Condition()
+        self.async_waiters = []
+
+        # Statistics
+        self.received_bytes = 0
+        self.overrun_bytes = 0
+        self.high_water_mark = 0
+
+    def __len__(self):
+        return len(self.data) - self.start
+
+    def write(self, data):
+        with self.condition:
+            self.data += data
+            self.received_bytes += len(data)
+
+            overrun = len(self) - self.max_size
+            if overrun > 0:
+                self.start += overrun
+                self.overrun_bytes += overrun
+
+            self.high_water_mark = max(self.high_water_mark, len(self))
+            self.__compact()
+
+            self.condition.notify_all()
+            waiters = self.async_waiters
+            self.async_waiters = []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self.__wake_up, future)
+
+    def __wake_up(self, future):
+        if not future.done():
+            future.set_result(None)
+
+    def __compact(self):
+        if self.start > 0 and self.start >= len(self.data) // 2:
+            del self.data[:self.start]
+            self.line_search_start = max(0, self.line_search_start - self.start)
+            self.start = 0
+
+    def __take(self, length):
+        data = bytes(self.data[self.start:self.start + length])
+        self.start += length
+        self.__compact()
+        return data
+
+    def __line_length(self):
+        # The bytes already searched are not searched again for the end of line.
+        index = self.data.find(b"\n", max(self.start, self.line_search_start))
+        if index < 0:
+            self.line_search_start = len(self.data)
+            return 0
+        return index + 1 - self.start
+
+    def read(self, length = None, timeout = None):
+        """
+        Blocks until length bytes are received or the timeout expires and returns the bytes available up to
+        length. Without length, returns all the bytes available without blocking.
+        """
+        with self.condition:
+            if length is None:
+                return self.__take(len(self))
+
+            self.condition.wait_for(lambda: len(self) >= length, timeout=timeout)
+            return self.__take(min(length, len(self)))
+
+    def readline(self, timeout = None):
+        """
+        Blocks until a whole line is received and returns it with the end of line, or returns None on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.__line_length() > 0, timeout=timeout):
+                return None
+            return self.__take(self.__line_length())
+
+    async def async_readline(self, timeout = None):
+        """
+        Coroutine version of readline(), it waits for the line without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self.condition:
+                line_length = self.__line_length()
+                if line_length > 0:
+                    return self.__take(line_length)
+                waiter = (loop, loop.create_future())
+                self.async_waiters.append(waiter)
+
+            try:
+                await asyncio.wait_for(waiter[1], timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                with self.condition:
+                    if waiter in self.async_waiters:
+                        self.async_waiters.remove(waiter)
+                return None
+
+    def statistics(self):
+        return {"buffered": len(self), "received_bytes": self.received_bytes, "overrun_bytes": self.overrun_bytes, "high_water_mark": self.high_water_mark}
+
+class UartStream:
+    """
+    Stream of bytes over the UART of a blocking API instance.
+
+    The writes are coalesced: the bytes written are accumulated and sent in packets of the maximum UART
+    transfer length, keeping several packets in flight, and flush() sends the remaining bytes. The bytes
+    received are appended to a ReceiveBuffer from the SDK receiving thread, without going through the UART
+    notification queue, and are consumed with read(), readline() or an async for loop over the lines.
+    """
+
+    def __init__(self, blocking_api, receive_buffer_size = DEFAULT_RECEIVE_BUFFER_SIZE,
+                 packet_size = MAX_UART_TRANSFER_LENGTH, packets_in_flight = DEFAULT_PACKETS_IN_FLIGHT):
+        self.blocking_api = blocking_api
+        self.packet_size = min(packet_size, MAX_UART_TRANSFER_LENGTH)
+        self.packets_in_flight = packets_in_flight
+
+        self.receive_buffer = ReceiveBuffer(receive_buffer_size)
+        self.blocking_api.notifications.set_listener(NotificationSource.UART, listener=self.__on_receive)
+
+        self.pending_data = bytearray()
+        self.in_flight = collections.deque()
+        self.write_lock = threading.Lock()
+
+        # Statistics
+        self.sent_bytes = 0
+        self.sent_packets = 0
+        self.send_errors = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __on_receive(self, message):
+        self.receive_buffer.write(bytes(message.get("payload", [])))
+
+    # Writer ------------------------------------------------------------------------
+
+    def write(self, data):
+        """
+        Queues the data to be sent. The full packets are sent right away, the rest waits for more data or flush().
+        """
+        with self.write_lock:
+            self.pending_data += data
+
+            while len(self.pending_data) >= self.packet_size:
+                self.__send_packet(self.packet_size)
+
+    def flush(self):
+        """
+        Sends the queued data and waits until all the packets are sent. Returns False if any packet failed
+        since the last flush.
+        """
+        with self.write_lock:
+            if len(self.pending_data) > 0:
+                self.__send_packet(len(self.pending_data))
+
+            errors = self.send_errors
+            while len(self.in_flight) > 0:
+                self.__complete_packet()
+
+            return self.send_errors == errors
+
+    def __send_packet(self, length):
+        if len(self.in_flight) == self.packets_in_flight:
+            self.__complete_packet()
+
+        packet = memoryview(self.pending_data)[:length].tolist()
+        del self.pending_data[:length]
+
+        self.in_flight.append(self.blocking_api.uart_send_message.submit(data=packet))
+        self.sent_bytes += length
+        self.sent_packets += 1
+
+    def __complete_packet(self):
+        response = self.blocking_api.wait_for_response(self.in_flight.popleft())
+        if response is None or response.get("result") != CommonResultCodes.SUCCESS.name:
+            self.send_errors += 1
+
+    # Reader ------------------------------------------------------------------------
+
+    def read(self, length = None, timeout = None):
+        return self.receive_buffer.read(length, timeout)
+
+    def readline(self, timeout = None):
+        return self.receive_buffer.readline(timeout)
+
+    async def async_readline(self, timeout = None):
+        return await self.receive_buffer.async_readline(timeout)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.receive_buffer.async_readline()
+
+    def statistics(self):
+        return dict(self.receive_buffer.statistics(), sent_bytes=self.sent_bytes, sent_packets=self.sent_packets, send_errors=self.send_errors)
+
+    def close(self):
+        """
+        Sends the queued data and gives the UART notifications back to the notification queue.
+        """
+        self.flush()
+        self.blocking_api.notifications.set_listener(NotificationSource.UART, listener=None)
+
+# endregion
+
+# ==================================================================================
+# region Main code
+# ==================================================================================
+
+def main():
+    supernova_device = SupernovaBlockingApi()
+
+    response = supernova_device.open()
+
+    if response["opcode"] != 0:
+        print("Error opening Supernova")
+        exit(1)
+
+    response = supernova_device.set_i2c_spi_uart_gpio_voltage(voltage_mV=3300)
+
+    if response["result"] != CommonResultCodes.SUCCESS.name:
+        print("Error setting the UART voltage")
+        exit(1)
+
+    response = supernova_device.uart_init(baudrate=UartBaudRate.UART_BAUD_115200,
+                                          hardwareHandshake=False,
+                                          parityMode=UartParity.UART_NO_PARITY,
+                                          dataSize=UartDataSize.UART_8BIT_BYTE,
+                                          stopBit=UartStopBit.UART_ONE_STOP_BIT)
+
+    if response["result"] not in [CommonResultCodes.SUCCESS.name, CommonResultCodes.INTERFACE_ALREADY_INITIALIZED.name]:
+        print("Error initializing the UART")
+        exit(1)
+
+    # Capture the log of the DUT to a file until no line is received for 10 seconds.
+    with UartStream(supernova_device) as stream, open("uart_log.txt", "wb") as log:
+        stream.write(b"help\r\n")
+        stream.flush()
+
+        while True:
+            line = stream.readline(timeout=10)
+            if line is None:
+                break
+            log.write(line)
+
+        print(f"UART statistics: {stream.statistics()}")
+
+    supernova_device.close()
+
+if __name__ == "__main__":
+    main()
+
+# endregion